@@ -27,10 +27,31 @@ def create_app(config_name='development'):
     # Activer CORS pour les requêtes cross-origin
     CORS(app)
     
+    # Accepter les corps de requête compressés (Content-Encoding)
+    from app.compression import DecompressRequestMiddleware
+    app.wsgi_app = DecompressRequestMiddleware(app.wsgi_app, app.config['MAX_CONTENT_LENGTH'])
+    
+    # Assets versionnés/précompressés et réponses conditionnelles (ETag)
+    from app.http_cache import init_http_cache
+    init_http_cache(app)
+    
     # Enregistrer les blueprints
     from app.routes import predict_bp
     app.register_blueprint(predict_bp)
     
+    # Contrôle d'admission devant l'inférence
+    if app.config.get('ADMISSION_ENABLED'):
+        from app.admission import AdmissionController
+        app.extensions['admission'] = AdmissionController.from_config(app.config)
+    
+    # Transmettre la configuration au service de prédiction
+    from app.services import configure_prediction_service
+    configure_prediction_service(app.config)
+    
+    # Charger le modèle et le préchauffer avant de recevoir du trafic
+    if app.config.get('EAGER_MODEL_LOADING'):
+        _load_and_warmup(app)
+    
     # Route de santé
     @app.route('/health', methods=['GET'])
     def health():
@@ -40,11 +61,68 @@ def create_app(config_name='development'):
             'message': 'API Network Quality Prediction is running'
         }, 200
     
+    # Route de disponibilité (readiness)
+    @app.route('/ready', methods=['GET'])
+    def ready():
+        """Endpoint de readiness: OK seulement une fois le warmup terminé"""
+        from app.services import PredictionService
+        service = PredictionService._instance
+        if service is None or not service._initialized or not service.is_ready:
+            return {
+                'status': 'not_ready',
+                'message': 'Modèle non chargé ou warmup en cours'
+            }, 503
+        return {
+            'status': 'ready',
+            'load_duration_ms': round(service.load_duration * 1000, 3),
+            'warmup_duration_ms': round(service.warmup_duration * 1000, 3),
+            'backend': service.backend.name if service.backend else None,
+            'backend_selection': service.backend_report
+        }, 200
+    
+    # Métriques du worker courant
+    @app.route('/metrics', methods=['GET'])
+    def metrics_endpoint():
+        """Endpoint exposant les compteurs du processus"""
+        from app.metrics import metrics
+        from app.services import PredictionService
+        body = {'pid': os.getpid(), **metrics.snapshot()}
+        service = PredictionService._instance
+        if service is not None and service._initialized and service.thread_budget is not None:
+            body['thread_budget'] = service.thread_budget.report()
+        return body, 200
+    
     # Route racine - Interface Web
     @app.route('/', methods=['GET'])
     def index():
         """Page d'accueil avec interface web"""
         from flask import render_template
-        return render_template('index.html')
+        from app.http_cache import conditional_response
+        
+        # La page ne dépend que des templates/assets: rendue une seule fois
+        # (sauf en debug, où les templates peuvent changer)
+        body = app.extensions.get('index_html')
+        if body is None:
+            body = render_template('index.html').encode('utf-8')
+            if not app.debug:
+                app.extensions['index_html'] = body
+        return conditional_response(body, 'text/html')
     
     return app
+
+
+def _load_and_warmup(app):
+    """Charger le service de prédiction et exécuter les prédictions de warmup"""
+    import logging
+    from app.services import get_prediction_service
+    
+    logger = logging.getLogger(__name__)
+    try:
+        service = get_prediction_service()
+        service.warmup(
+            iterations=app.config.get('WARMUP_ITERATIONS', 3),
+            batch_sizes=app.config.get('WARMUP_BATCH_SIZES', [1])
+        )
+    except Exception as e:
+        # L'application démarre quand même: /ready restera en 503
+        logger.error(f"Échec du chargement/warmup du modèle: {e}")
@@ -0,0 +1,182 @@
+"""
+Contrôle d'admission devant l'inférence (backpressure)
+
+Un nombre borné de requêtes s'exécute en parallèle; les suivantes attendent
+dans une file bornée. Dès que la file est pleine ou que l'attente estimée
+dépasse le seuil, la requête est refusée immédiatement (429 + Retry-After)
+plutôt que d'allonger la latence de tout le monde.
+
+Sous Gunicorn, un worker n'exécute jamais plus de requêtes que ses threads:
+les suivantes attendent dans sa propre file, hors de portée du contrôle.
+Les limites par défaut (limits_for_threads, exportées par gunicorn.conf.py)
+laissent donc en vol + file sous le nombre de threads, pour qu'un thread
+reste libre de répondre 429. Une réponse produite en flux occupe sa place
+jusqu'à la fin de son corps (itérateur épuisé ou fermé).
+"""
+import math
+import time
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Mapping, Tuple
+
+from flask import current_app, jsonify
+
+from app.lifecycle import register_after_fork
+from app.metrics import metrics
+
+# Poids de la dernière mesure dans la moyenne mobile du temps de service
+EWMA_ALPHA = 0.2
+
+
+def limits_for_threads(threads: int) -> Tuple[int, int]:
+    """
+    (max_in_flight, max_queue) pour un worker à threads threads de requête
+
+    La moitié des threads exécute, le reste attend en file sauf un, réservé
+    au refus immédiat des requêtes en trop.
+    """
+    threads = max(1, int(threads))
+    in_flight = max(1, threads // 2)
+    return in_flight, max(0, threads - in_flight - 1)
+
+
+class Overloaded(Exception):
+    """Requête refusée par le contrôle d'admission"""
+    
+    def __init__(self, retry_after: int):
+        super().__init__(f"Serveur surchargé, réessayer dans {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Limite les requêtes en vol et la file d'attente devant le modèle"""
+    
+    def __init__(self, max_in_flight: int = 4, max_queue: int = 16,
+                 max_wait: float = 2.0, initial_service_time: float = 0.01):
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.max_queue = max(0, int(max_queue))
+        self.max_wait = float(max_wait)
+        self.avg_service_time = float(initial_service_time)
+        self._reset()
+        register_after_fork(self._reset)
+    
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> 'AdmissionController':
+        """Construire le contrôleur depuis la configuration Flask"""
+        return cls(
+            max_in_flight=config.get('ADMISSION_MAX_IN_FLIGHT', 4),
+            max_queue=config.get('ADMISSION_MAX_QUEUE', 16),
+            max_wait=config.get('ADMISSION_MAX_WAIT_SECONDS', 2.0)
+        )
+    
+    def _reset(self):
+        """État initial (aussi après un fork: verrous hérités inutilisables)"""
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.queued = 0
+    
+    def estimated_wait(self) -> float:
+        """Attente estimée pour une nouvelle requête mise en file"""
+        return (self.queued + 1) * self.avg_service_time / self.max_in_flight
+    
+    def _shed(self, wait: float):
+        metrics.increment('requests_shed')
+        raise Overloaded(max(1, math.ceil(wait)))
+    
+    @contextmanager
+    def admit(self):
+        """Occuper une place d'exécution ou lever Overloaded"""
+        start = self.acquire()
+        try:
+            yield
+        finally:
+            self.release(start)
+    
+    def acquire(self) -> float:
+        """Occuper une place (ou lever Overloaded); renvoie l'instant d'entrée pour release"""
+        with self._cond:
+            if self.in_flight >= self.max_in_flight:
+                wait = self.estimated_wait()
+                if self.queued >= self.max_queue or wait > self.max_wait:
+                    self._shed(wait)
+                
+                self.queued += 1
+                metrics.set_gauge('admission_queue_depth', self.queued)
+                deadline = time.monotonic() + self.max_wait
+                try:
+                    while self.in_flight >= self.max_in_flight:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._shed(self.estimated_wait())
+                        self._cond.wait(remaining)
+                finally:
+                    self.queued -= 1
+                    metrics.set_gauge('admission_queue_depth', self.queued)
+            
+            self.in_flight += 1
+            metrics.set_gauge('admission_in_flight', self.in_flight)
+        return time.perf_counter()
+    
+    def release(self, start: float):
+        """Libérer la place occupée depuis start (temps de service mesuré)"""
+        elapsed = time.perf_counter() - start
+        with self._cond:
+            self.in_flight -= 1
+            self.avg_service_time += EWMA_ALPHA * (elapsed - self.avg_service_time)
+            metrics.set_gauge('admission_in_flight', self.in_flight)
+            self._cond.notify()
+
+
+def admission_controlled(view):
+    """Décorateur de route: applique le contrôle d'admission de l'application"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        controller = current_app.extensions.get('admission')
+        if controller is None:
+            return view(*args, **kwargs)
+        try:
+            start = controller.acquire()
+        except Overloaded as e:
+            response = jsonify({
+                'error': 'Trop de requêtes',
+                'message': str(e),
+                'retry_after': e.retry_after
+            })
+            response.status_code = 429
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response
+        
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except BaseException:
+            controller.release(start)
+            raise
+        if response.is_streamed:
+            # Génération et compression du corps: la place reste occupée
+            # jusqu'à la fin du corps ou la fermeture de la réponse
+            release = _release_once(controller, start)
+            response.response = _releasing(response.response, release)
+            response.call_on_close(release)
+        else:
+            controller.release(start)
+        return response
+    return wrapper
+
+
+def _release_once(controller: AdmissionController, start: float):
+    released = []
+    
+    def release():
+        if not released:
+            released.append(True)
+            controller.release(start)
+    return release
+
+
+def _releasing(body, release):
+    """Itérer sur le corps de la réponse, puis libérer la place"""
+    try:
+        yield from body
+    finally:
+        release()
@@ -0,0 +1,108 @@
+"""
+Inférence du réseau de neurones (ANN) sans TensorFlow
+
+train_ann.py exporte les poids du meilleur modèle Keras dans un fichier .npz:
+
+    layer{i}_kernel, layer{i}_bias   poids de chaque couche Dense
+    architecture                     JSON: activations, classes, colonnes
+
+Le passage avant est une suite de produits matriciels NumPy. ANNModel expose
+l'interface predict_proba / classes_ de sklearn: il peut servir de version
+routée (MODEL_VERSIONS) ou de modèle shadow.
+"""
+import json
+from typing import Any, Dict, List
+
+import joblib
+import numpy as np
+
+ANN_EXTENSION = '.npz'
+
+
+def _relu(x):
+    return np.maximum(x, 0.0)
+
+
+def _softmax(x):
+    shifted = x - x.max(axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': _relu,
+    'sigmoid': lambda x: 1.0 / (1.0 + np.exp(-x)),
+    'tanh': np.tanh,
+    'softmax': _softmax
+}
+
+
+class ANNModel:
+    """Réseau Dense exporté, évalué en NumPy"""
+
+    def __init__(self, kernels: List[np.ndarray], biases: List[np.ndarray],
+                 activations: List[str], classes: List[int],
+                 metadata: Dict[str, Any] = None):
+        unknown = [name for name in activations if name not in ACTIVATIONS]
+        if unknown:
+            raise ValueError(f"Activations non supportées: {', '.join(unknown)}")
+        self.kernels = [np.asarray(k, dtype='float32') for k in kernels]
+        self.biases = [np.asarray(b, dtype='float32') for b in biases]
+        self.activations = list(activations)
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = self.kernels[0].shape[0]
+        self.metadata = metadata or {}
+
+    @classmethod
+    def load(cls, path: str) -> 'ANNModel':
+        """Charger un export .npz de train_ann.py"""
+        with np.load(path, allow_pickle=False) as data:
+            architecture = json.loads(str(data['architecture']))
+            n_layers = len(architecture['activations'])
+            kernels = [data[f'layer{i}_kernel'] for i in range(n_layers)]
+            biases = [data[f'layer{i}_bias'] for i in range(n_layers)]
+        return cls(kernels, biases, architecture['activations'],
+                   architecture['classes'], architecture)
+
+    def save(self, path: str):
+        """Écrire l'export .npz (même format que train_ann.py)"""
+        architecture = dict(self.metadata, activations=self.activations,
+                            classes=self.classes_.tolist())
+        arrays = {'architecture': np.array(json.dumps(architecture, ensure_ascii=False))}
+        for i, (kernel, bias) in enumerate(zip(self.kernels, self.biases)):
+            arrays[f'layer{i}_kernel'] = kernel
+            arrays[f'layer{i}_bias'] = bias
+        np.savez(path, **arrays)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Probabilités par classe (passage avant float32)"""
+        output = np.asarray(X, dtype='float32')
+        for kernel, bias, activation in zip(self.kernels, self.biases, self.activations):
+            output = ACTIVATIONS[activation](output @ kernel + bias)
+        return output.astype('float64')
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    def fold_scaling(self, scale: np.ndarray, offset: np.ndarray) -> 'ANNModel':
+        """
+        Réseau équivalent sur les entrées brutes x, sachant X = x * scale + offset
+
+        (x * s + m) @ W + b = x @ (diag(s) W) + (m @ W + b): seule la
+        première couche change, calculée en float64 avant l'arrondi float32.
+        """
+        kernel = self.kernels[0].astype('float64')
+        scale = np.asarray(scale, dtype='float64')
+        offset = np.asarray(offset, dtype='float64')
+        kernels = [scale[:, None] * kernel] + self.kernels[1:]
+        biases = [offset @ kernel + self.biases[0]] + self.biases[1:]
+        return ANNModel(kernels, biases, self.activations, self.classes_.tolist(),
+                        dict(self.metadata, scaling_folded=True))
+
+
+def load_model_file(path: str):
+    """Charger un modèle: export ANN .npz, sinon fichier joblib (forêt sklearn)"""
+    if path.lower().endswith(ANN_EXTENSION):
+        return ANNModel.load(path)
+    return joblib.load(path)
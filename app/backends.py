@@ -0,0 +1,254 @@
+"""
+Backends d'inférence interchangeables
+
+Un backend expose un seul appel, predict_proba(entrées) -> probabilités
+(n, classes), dont dérivent la classe prédite et les probabilités, et
+déclare ses capacités:
+
+- batching: accepte un lot de n lignes en un appel (sinon ligne à ligne);
+- thread_safe: appels concurrents sans verrou (sinon sérialisés);
+- raw_inputs: entrées brutes, normalisation intégrée (sinon prétraitées).
+
+Les backends sont enregistrés par nom (register_backend) et choisis par
+PREDICTION_BACKEND. En mode 'auto', select_backend() mesure chaque backend
+disponible sur des lignes synthétiques et retient le plus rapide dont les
+probabilités concordent avec sklearn (BACKEND_PARITY_TOLERANCE).
+"""
+import os
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+AUTO = 'auto'
+REFERENCE_BACKEND = 'sklearn'
+
+_factories: Dict[str, Callable[..., 'InferenceBackend']] = {}
+
+
+class InferenceBackend:
+    """Interface commune des backends d'inférence"""
+
+    name = None
+    batching = True
+    thread_safe = True
+    raw_inputs = False
+
+    classes_: np.ndarray
+
+    def predict_proba(self, inputs: np.ndarray) -> np.ndarray:
+        """Probabilités par classe (float64) pour chaque ligne"""
+        raise NotImplementedError
+
+    def infer(self, X: np.ndarray, raw: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Probabilités selon les capacités déclarées
+
+        Args:
+            X: Entrées prétraitées (n, 8)
+            raw: Mêmes entrées avant normalisation (backends raw_inputs)
+        """
+        inputs = raw if self.raw_inputs else X
+        if inputs is None:
+            raise ValueError(f"Le backend {self.name} attend les entrées brutes")
+        if not self.thread_safe:
+            with self._serial_lock():
+                return self._run(inputs)
+        return self._run(inputs)
+
+    def predict(self, X: np.ndarray, raw: Optional[np.ndarray] = None
+                ) -> Tuple[np.ndarray, np.ndarray]:
+        """Classes prédites et probabilités, en un seul passage sur le modèle"""
+        probabilities = self.infer(X, raw)
+        return self.classes_[probabilities.argmax(axis=1)], probabilities
+
+    def after_fork(self):
+        """Recréer les ressources non héritables (sessions, pools de threads)"""
+        if '_lock' in self.__dict__:
+            self._lock = threading.Lock()
+
+    def capabilities(self) -> Dict[str, bool]:
+        return {
+            'batching': self.batching,
+            'thread_safe': self.thread_safe,
+            'raw_inputs': self.raw_inputs
+        }
+
+    def _run(self, inputs: np.ndarray) -> np.ndarray:
+        if self.batching or len(inputs) <= 1:
+            return self.predict_proba(inputs)
+        return np.vstack([self.predict_proba(inputs[i:i + 1]) for i in range(len(inputs))])
+
+    def _serial_lock(self) -> threading.Lock:
+        lock = self.__dict__.get('_lock')
+        if lock is None:
+            lock = self.__dict__.setdefault('_lock', threading.Lock())
+        return lock
+
+
+class SklearnBackend(InferenceBackend):
+    """predict_proba du modèle chargé (forêt sklearn ou ANNModel)"""
+
+    name = 'sklearn'
+
+    def __init__(self, model):
+        self.model = model
+        self.classes_ = model.classes_
+
+    def predict_proba(self, inputs: np.ndarray) -> np.ndarray:
+        return self.model.predict_proba(inputs)
+
+
+def register_backend(name: str):
+    """
+    Enregistrer une fabrique de backend: factory(service, settings) -> backend
+
+    La fabrique lève une exception si le backend n'est pas utilisable
+    (dépendance absente, export manquant...). Utilisable comme décorateur.
+    """
+    def decorator(factory):
+        _factories[name] = factory
+        return factory
+    return decorator
+
+
+def available_backends():
+    """Noms des backends enregistrés"""
+    return list(_factories)
+
+
+def create_backend(name: str, service, settings: Mapping[str, Any]) -> InferenceBackend:
+    """Instancier le backend name pour le modèle du service"""
+    if name not in _factories:
+        raise ValueError(
+            f"Backend inconnu: {name} (disponibles: {', '.join(available_backends())})"
+        )
+    backend = _factories[name](service, settings)
+    backend.name = name
+    return backend
+
+
+@register_backend('sklearn')
+def _sklearn_backend(service, settings):
+    return SklearnBackend(service.model)
+
+
+@register_backend('onnx')
+def _onnx_backend(service, settings):
+    from app.onnx_backend import OnnxBackend
+    path = settings.get('ONNX_MODEL_PATH') or os.path.join(
+        os.path.dirname(__file__), '../model/model.onnx'
+    )
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Export ONNX non trouvé: {path} (lancer export_onnx.py)")
+    # 0 / absent: budget de threads du worker
+    budget = service.thread_budget.threads if service.thread_budget else 1
+    backend = OnnxBackend(
+        path,
+        intra_op_threads=int(settings.get('ONNX_INTRA_OP_THREADS') or budget),
+        inter_op_threads=int(settings.get('ONNX_INTER_OP_THREADS', 1))
+    )
+    # Un export d'un autre modèle que celui servi donnerait d'autres réponses
+    exported = backend.metadata.get('model_version')
+    if exported != service.model_version:
+        raise ValueError(
+            f"export de la version {exported}, modèle servi {service.model_version} "
+            f"(relancer export_onnx.py)"
+        )
+    return backend
+
+
+@register_backend('folded')
+def _folded_backend(service, settings):
+    from app.folding import FoldedBackend
+    backend = FoldedBackend(service.model, service.scaler, len(service.categorical_columns))
+    # Forêt: mêmes feuilles, donc probabilités identiques; ANN: arrondi float32
+    X, raw = service.preprocess_batch(synthetic_records(service, 256), return_raw=True)
+    max_diff = float(np.abs(backend.infer(X, raw) - service.model.predict_proba(X)).max())
+    tolerance = 0.0 if hasattr(service.model, 'estimators_') else float(
+        settings.get('BACKEND_PARITY_TOLERANCE', 1e-5)
+    )
+    if max_diff > tolerance:
+        raise ValueError(f"modèle replié différent du modèle servi (écart {max_diff:.2e})")
+    return backend
+
+
+def synthetic_records(service, n_rows: int, seed: int = 0):
+    """Entrées plausibles: vocabulaire connu, métriques dans la plage du scaler"""
+    rng = np.random.default_rng(seed)
+    scaler = service.scaler
+    numeric = rng.uniform(scaler.data_min_, scaler.data_max_,
+                          size=(n_rows, len(service.numeric_columns)))
+    records = []
+    for i in range(n_rows):
+        record = {col: values[rng.integers(len(values))]
+                  for col, values in service.categorical_vocabulary.items()}
+        record.update(zip(service.numeric_columns, numeric[i].tolist()))
+        records.append(record)
+    return records
+
+
+def select_backend(service, settings: Mapping[str, Any],
+                   candidates: Optional[Sequence[str]] = None,
+                   batch_sizes: Sequence[int] = (1, 256),
+                   repeat: int = 5) -> Tuple[InferenceBackend, Dict[str, Any]]:
+    """
+    Choisir le backend le plus rapide parmi ceux qui passent la parité
+
+    Chaque candidat est évalué sur les mêmes lignes synthétiques: écart
+    maximal avec le modèle sklearn et classes identiques, puis meilleur
+    temps sur repeat appels par taille de lot. Le score est la somme des
+    temps des différentes tailles de lot.
+
+    Returns:
+        Tuple (backend retenu, rapport par candidat)
+    """
+    tolerance = float(settings.get('BACKEND_PARITY_TOLERANCE', 1e-5))
+    records = synthetic_records(service, max(batch_sizes))
+    X, raw = service.preprocess_batch(records, return_raw=True)
+    expected = service.model.predict_proba(X)
+
+    report = {}
+    best, best_score = None, None
+    for name in candidates or available_backends():
+        try:
+            backend = create_backend(name, service, settings)
+            probabilities = backend.infer(X, raw)
+        except Exception as e:
+            report[name] = {'available': False, 'error': str(e)}
+            continue
+        max_diff = float(np.abs(probabilities - expected).max())
+        passed = bool(max_diff <= tolerance and
+                      (probabilities.argmax(axis=1) == expected.argmax(axis=1)).all())
+        entry = report[name] = {
+            'available': True,
+            'capabilities': backend.capabilities(),
+            'parity_max_diff': max_diff,
+            'parity_passed': passed
+        }
+        if not passed:
+            continue
+
+        timings = {}
+        for batch_size in batch_sizes:
+            X_batch, raw_batch = X[:batch_size], raw[:batch_size]
+            durations = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                backend.infer(X_batch, raw_batch)
+                durations.append(time.perf_counter() - start)
+            timings[str(batch_size)] = round(min(durations) * 1000, 4)
+        entry['timings_ms'] = timings
+        score = sum(timings.values())
+        if best_score is None or score < best_score:
+            best, best_score = backend, score
+
+    if best is None:
+        # sklearn est la référence: il passe toujours la parité
+        raise RuntimeError(f"Aucun backend utilisable: {report}")
+    logger.info(f"Backend retenu: {best.name} ({report[best.name]['timings_ms']} ms)")
+    return best, report
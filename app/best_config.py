@@ -0,0 +1,80 @@
+"""
+Recherche de la meilleure combinaison catégorique pour des métriques données
+
+Pour les métriques mesurées sur un site, toutes les combinaisons connues
+(vocabulaire du service) des variables catégoriques choisies sont évaluées
+en un seul lot et classées par probabilité d'une classe cible.
+
+Les résultats sont mis en cache par version de modèle et par « case »
+d'entrée: chaque métrique est ramenée au centre de l'une des n cases qui
+découpent sa plage d'entraînement (data_min_, data_max_ du scaler). Deux
+sites aux métriques proches partagent donc le même classement, calculé sur
+les valeurs centrales (renvoyées avec le résultat).
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+import numpy as np
+
+from app.lifecycle import register_after_fork
+
+
+def bucketize(values: np.ndarray, data_min: np.ndarray, data_max: np.ndarray,
+              n_buckets: int) -> Tuple[Tuple[int, ...], np.ndarray]:
+    """
+    Case de chaque valeur et centre de la case
+
+    Les cases ont la largeur (data_max - data_min) / n_buckets et se
+    prolongent au-delà de la plage d'entraînement. n_buckets <= 0: pas de
+    regroupement (les valeurs exactes servent de clé).
+    """
+    values = np.asarray(values, dtype='float64')
+    if not np.isfinite(values).all():
+        raise ValueError("Les métriques doivent être des valeurs finies")
+    if n_buckets <= 0:
+        return tuple(values.tolist()), values
+    width = (np.asarray(data_max, dtype='float64') - data_min) / n_buckets
+    width = np.where(width > 0, width, 1.0)
+    index = np.floor((values - data_min) / width)
+    return tuple(int(i) for i in index), data_min + (index + 0.5) * width
+
+
+class ResultCache:
+    """Cache LRU borné, thread-safe, propre à chaque worker"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = int(max_entries)
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        register_after_fork(self._reset)
+
+    def _reset(self):
+        """Nouveau worker: verrou neuf, entrées du master abandonnées"""
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
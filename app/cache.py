@@ -0,0 +1,245 @@
+"""
+Cache de prédictions partagé entre les workers d'un même hôte
+
+Table de hachage de taille fixe dans un fichier mappé en mémoire (par défaut
+sous /dev/shm). Chaque entrée occupe 64 octets:
+
+    seq (uint32) | génération (uint16) | bit de référence (uint8) | occupé (uint8)
+    clé: vecteur encodé (8 x float32, 32 octets)
+    valeur: probabilités (3 x float64, 24 octets)
+
+Les lectures sont sans verrou (seqlock: un compteur impair signifie une
+écriture en cours). Les écritures sont sérialisées par un verrou POSIX sur le
+fichier. L'éviction suit l'algorithme CLOCK dans des ensembles de 4 entrées.
+Changer de version de modèle incrémente la génération de l'en-tête, ce qui
+invalide toutes les entrées d'un seul coup.
+
+Le nom du segment porte la version du format et le nombre d'entrées: une
+configuration différente (déploiement progressif avec un autre
+PREDICTION_CACHE_SLOTS) utilise un autre fichier. Un segment existant n'est
+jamais tronqué, car d'autres processus peuvent l'avoir mappé (SIGBUS); si sa
+taille ne convient pas, le processus se rabat sur un cache privé.
+"""
+import os
+import mmap
+import struct
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Optional
+
+import numpy as np
+
+from app.lifecycle import register_after_fork
+
+try:
+    import fcntl
+except ImportError:  # Windows: pas de cache partagé
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'NQCACHE1'
+# Version du format des entrées (à incrémenter si la disposition change)
+LAYOUT_VERSION = 1
+# magic | nombre d'entrées | génération | version du modèle
+HEADER = struct.Struct('<8sQQ32s')
+HEADER_SIZE = 64
+SLOT_SIZE = 64
+SLOT_META = struct.Struct('<IHBB')
+KEY_SIZE = 32
+VALUE_SIZE = 24
+WAYS = 4
+
+
+def default_cache_path() -> str:
+    """Chemin par défaut du fichier de cache (mémoire partagée si possible)"""
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(directory, 'nq_prediction_cache.bin')
+
+
+def segment_path(path: str, n_slots: int) -> str:
+    """Fichier effectif: version du format et nombre d'entrées dans le nom"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.v{LAYOUT_VERSION}-{n_slots}{ext}"
+
+
+class SharedPredictionCache:
+    """Cache vecteur encodé -> probabilités, partagé via un fichier mappé"""
+
+    def __init__(self, path: str, n_slots: int, model_version: str):
+        if fcntl is None:
+            raise RuntimeError("Le cache partagé nécessite fcntl (POSIX)")
+
+        self.n_sets = max(1, n_slots // WAYS)
+        self.n_slots = self.n_sets * WAYS
+        self.path = segment_path(path, self.n_slots)
+        self.model_version = model_version.encode('utf-8')[:32].ljust(32, b'\0')
+        self.size = HEADER_SIZE + self.n_slots * SLOT_SIZE
+        self.private = False
+
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._lock = threading.Lock()
+        with self._write_lock():
+            self._attach()
+        register_after_fork(self._reset_lock)
+
+    def _attach(self):
+        """Mapper le fichier et (ré)initialiser l'en-tête si nécessaire"""
+        current_size = os.fstat(self._fd).st_size
+        if current_size == 0:
+            # Fichier créé à l'instant (verrou d'écriture tenu): personne ne l'a mappé
+            os.ftruncate(self._fd, self.size)
+        elif current_size != self.size:
+            logger.warning(
+                f"Segment {self.path} de taille inattendue ({current_size} octets): "
+                f"cache privé à ce processus"
+            )
+            self.private = True
+            self._mm = mmap.mmap(-1, self.size)
+            HEADER.pack_into(self._mm, 0, MAGIC, self.n_slots, 1, self.model_version)
+            self._generation = 1
+            return
+        self._mm = mmap.mmap(self._fd, self.size)
+
+        magic, n_slots, generation, version = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or n_slots != self.n_slots:
+            HEADER.pack_into(self._mm, 0, MAGIC, self.n_slots, 1, self.model_version)
+        elif version != self.model_version:
+            # Nouveau modèle: invalider toutes les entrées en une écriture
+            HEADER.pack_into(self._mm, 0, MAGIC, self.n_slots, generation + 1,
+                             self.model_version)
+            logger.info("Cache de prédictions invalidé (nouvelle version du modèle)")
+        self._generation = HEADER.unpack_from(self._mm, 0)[2]
+
+    def _reset_lock(self):
+        """Recréer le verrou de threads dans un worker fraîchement forké"""
+        self._lock = threading.Lock()
+
+    def _write_lock(self):
+        return _FileLock(self._fd, self._lock)
+
+    def _is_current(self) -> bool:
+        """Vérifier que l'en-tête correspond encore à notre modèle"""
+        _, _, generation, version = HEADER.unpack_from(self._mm, 0)
+        if version != self.model_version:
+            return False
+        # Suivre les invalidations faites par les autres workers
+        self._generation = generation
+        return True
+
+    def _set_offset(self, key: bytes) -> int:
+        digest = hashlib.blake2b(key, digest_size=8).digest()
+        index = int.from_bytes(digest, 'little') % self.n_sets
+        return HEADER_SIZE + index * WAYS * SLOT_SIZE
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        """Lire les probabilités associées à la clé (None si absente)"""
+        if not self._is_current():
+            return None
+        generation = self._generation & 0xFFFF
+        mm = self._mm
+        base = self._set_offset(key)
+        for way in range(WAYS):
+            offset = base + way * SLOT_SIZE
+            seq, slot_generation, _, used = SLOT_META.unpack_from(mm, offset)
+            if seq & 1 or not used or slot_generation != generation:
+                continue
+            start = offset + SLOT_META.size
+            if mm[start:start + KEY_SIZE] != key:
+                continue
+            value = np.frombuffer(
+                mm[start + KEY_SIZE:start + KEY_SIZE + VALUE_SIZE], dtype='<f8'
+            ).copy()
+            if SLOT_META.unpack_from(mm, offset)[0] != seq:
+                return None  # écriture concurrente: traiter comme absent
+            mm[offset + 6] = 1  # bit de référence pour CLOCK
+            return value
+        return None
+
+    def put(self, key: bytes, probabilities: np.ndarray):
+        """Enregistrer les probabilités pour la clé"""
+        if len(key) != KEY_SIZE:
+            return
+        value = np.asarray(probabilities, dtype='<f8').tobytes()
+        if len(value) != VALUE_SIZE:
+            return
+
+        with self._write_lock():
+            if not self._is_current():
+                return
+            generation = self._generation & 0xFFFF
+            mm = self._mm
+            base = self._set_offset(key)
+            offset = self._choose_victim(base, key, generation)
+
+            seq = SLOT_META.unpack_from(mm, offset)[0]
+            SLOT_META.pack_into(mm, offset, (seq + 1) & 0xFFFFFFFF, generation, 0, 0)
+            start = offset + SLOT_META.size
+            mm[start:start + KEY_SIZE] = key
+            mm[start + KEY_SIZE:start + KEY_SIZE + VALUE_SIZE] = value
+            SLOT_META.pack_into(mm, offset, (seq + 2) & 0xFFFFFFFF, generation, 1, 1)
+
+    def _choose_victim(self, base: int, key: bytes, generation: int) -> int:
+        """Choisir l'entrée à remplacer: même clé, libre, périmée, puis CLOCK"""
+        mm = self._mm
+        for way in range(WAYS):
+            offset = base + way * SLOT_SIZE
+            _, slot_generation, _, used = SLOT_META.unpack_from(mm, offset)
+            start = offset + SLOT_META.size
+            if not used or slot_generation != generation or mm[start:start + KEY_SIZE] == key:
+                return offset
+        # Seconde chance: effacer les bits de référence jusqu'à trouver une victime
+        for _ in range(2):
+            for way in range(WAYS):
+                offset = base + way * SLOT_SIZE
+                if mm[offset + 6] == 0:
+                    return offset
+                mm[offset + 6] = 0
+        return base
+
+    def invalidate(self):
+        """Invalider toutes les entrées (incrément atomique de la génération)"""
+        with self._write_lock():
+            _, _, generation, _ = HEADER.unpack_from(self._mm, 0)
+            HEADER.pack_into(self._mm, 0, MAGIC, self.n_slots, generation + 1,
+                             self.model_version)
+            self._generation = generation + 1
+
+    def stats(self):
+        """Occupation courante du cache"""
+        self._is_current()
+        generation = self._generation & 0xFFFF
+        used = 0
+        for slot in range(self.n_slots):
+            _, slot_generation, _, occupied = SLOT_META.unpack_from(
+                self._mm, HEADER_SIZE + slot * SLOT_SIZE
+            )
+            if occupied and slot_generation == generation:
+                used += 1
+        return {
+            'path': self.path,
+            'slots': self.n_slots,
+            'used': used,
+            'size_bytes': self.size,
+            'private': self.private,
+            'generation': self._generation
+        }
+
+
+class _FileLock:
+    """Verrou d'écriture: verrou de threads + verrou POSIX inter-processus"""
+
+    def __init__(self, fd: int, thread_lock: threading.Lock):
+        self.fd = fd
+        self.thread_lock = thread_lock
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        fcntl.lockf(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.lockf(self.fd, fcntl.LOCK_UN)
+        self.thread_lock.release()
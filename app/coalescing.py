@@ -0,0 +1,67 @@
+"""
+Regroupement des requêtes identiques en vol (singleflight)
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from app.lifecycle import register_after_fork
+
+
+class _Call:
+    """Calcul en cours, partagé par les requêtes identiques"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Exécuter une seule fois un calcul pour des appels concurrents de même clé
+    
+    Le premier appelant calcule le résultat; les appels identiques arrivés
+    pendant le calcul attendent et reçoivent le même résultat (ou la même
+    exception).
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        register_after_fork(self._reset)
+    
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Exécuter fn() ou attendre le calcul en vol pour la même clé
+        
+        Returns:
+            Tuple (résultat, partagé) où partagé indique un résultat coalescé
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+        
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+    
+    def _reset(self):
+        """Oublier les calculs hérités du processus parent après un fork"""
+        self._lock = threading.Lock()
+        self._calls = {}
@@ -0,0 +1,191 @@
+"""
+Compression HTTP négociée pour les réponses volumineuses
+
+- Réponses: gzip, ou zstd si le client l'accepte et que le module zstandard
+  est installé. La sérialisation et la compression se font en flux (chaque
+  morceau est compressé à la volée); les éléments eux-mêmes sont fournis
+  par l'appelant, /predict/batch les calcule tous en mémoire au préalable.
+- Requêtes: corps compressés acceptés (Content-Encoding gzip/deflate/zstd);
+  deflate accepte le format zlib (RFC 1950) et le deflate brut (RFC 1951)
+  qu'envoient certains clients.
+"""
+import io
+import json
+import zlib
+from typing import Any, Callable, Iterable, Iterator, Mapping, Optional
+
+from flask import Response, current_app, request
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.wsgi import get_input_stream
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# wbits: 16 + 15 -> en-tête gzip; 32 + 15 -> détection automatique gzip/zlib;
+# -15 -> deflate brut, sans en-tête
+GZIP_WBITS = 31
+AUTO_WBITS = 47
+RAW_WBITS = -zlib.MAX_WBITS
+
+
+def negotiate_encoding() -> Optional[str]:
+    """
+    Choisir l'encodage de la réponse d'après Accept-Encoding
+    
+    L'encodage de plus haute qualité (q) l'emporte; zstd ne départage
+    qu'en cas d'égalité.
+    """
+    accept = request.accept_encodings
+    gzip_q = accept.quality('gzip')
+    zstd_q = accept.quality('zstd') if zstandard is not None else 0
+    if zstd_q > 0 and zstd_q >= gzip_q:
+        return 'zstd'
+    if gzip_q > 0:
+        return 'gzip'
+    return None
+
+
+def make_compressor(encoding: str, config: Mapping[str, Any]):
+    """Compresseur incrémental (méthodes compress() et flush())"""
+    if encoding == 'zstd':
+        level = config.get('COMPRESSION_ZSTD_LEVEL', 3)
+        return zstandard.ZstdCompressor(level=level).compressobj()
+    level = config.get('COMPRESSION_GZIP_LEVEL', 6)
+    return zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+
+
+def compress_stream(chunks: Iterable[bytes], compressor) -> Iterator[bytes]:
+    """Compresser un flux de morceaux au fil de l'eau"""
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def streaming_json_response(head: bytes, items: Iterable[Any], tail: bytes,
+                            estimated_size: int, dumps: Callable[[Any], str],
+                            chunk_items: int = 256) -> Response:
+    """
+    Réponse JSON produite en flux et compressée si négociée
+    
+    Args:
+        head: Début du document JSON, jusqu'à l'ouverture du tableau
+        items: Éléments du tableau, sérialisés un par un
+        tail: Fin du document JSON après le tableau
+        estimated_size: Taille estimée du corps, comparée à COMPRESSION_MIN_SIZE
+        dumps: Fonction de sérialisation JSON
+        chunk_items: Nombre d'éléments regroupés par morceau émis
+    """
+    config = current_app.config
+    
+    def generate() -> Iterator[bytes]:
+        yield head
+        buffer = []
+        for index, item in enumerate(items):
+            buffer.append(('' if index == 0 else ',') + dumps(item))
+            if len(buffer) >= chunk_items:
+                yield ''.join(buffer).encode('utf-8')
+                buffer = []
+        if buffer:
+            yield ''.join(buffer).encode('utf-8')
+        yield tail
+    
+    encoding = None
+    if estimated_size >= config.get('COMPRESSION_MIN_SIZE', 1024):
+        encoding = negotiate_encoding()
+    
+    body = generate()
+    if encoding is not None:
+        body = compress_stream(body, make_compressor(encoding, config))
+    
+    response = Response(body, mimetype='application/json')
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+class DecompressRequestMiddleware:
+    """
+    Middleware WSGI: décompresse les corps de requête encodés
+    
+    La taille décompressée est bornée par max_size (protection contre les
+    bombes de décompression).
+    """
+    
+    SUPPORTED = ('gzip', 'x-gzip', 'deflate', 'zstd')
+    
+    def __init__(self, wsgi_app, max_size: int):
+        self.wsgi_app = wsgi_app
+        self.max_size = max_size
+    
+    def __call__(self, environ, start_response):
+        encoding = environ.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if not encoding or encoding == 'identity':
+            return self.wsgi_app(environ, start_response)
+        
+        if encoding not in self.SUPPORTED or (encoding == 'zstd' and zstandard is None):
+            return self._error(415, 'Content-Encoding non supporté',
+                               f"Encodage '{encoding}' non supporté")(environ, start_response)
+        
+        try:
+            compressed = get_input_stream(environ, max_content_length=self.max_size).read()
+            data = self._decompress(encoding, compressed)
+        except RequestEntityTooLarge:
+            return self._error(413, 'Requête trop volumineuse',
+                               'Le corps décompressé dépasse la taille maximale')(environ, start_response)
+        except (zlib.error, ValueError, EOFError) as e:
+            return self._error(400, 'Corps compressé invalide', str(e))(environ, start_response)
+        except Exception as e:
+            if zstandard is not None and isinstance(e, zstandard.ZstdError):
+                return self._error(400, 'Corps compressé invalide', str(e))(environ, start_response)
+            raise
+        
+        environ['wsgi.input'] = io.BytesIO(data)
+        environ['CONTENT_LENGTH'] = str(len(data))
+        environ.pop('HTTP_CONTENT_ENCODING', None)
+        environ.pop('HTTP_TRANSFER_ENCODING', None)
+        return self.wsgi_app(environ, start_response)
+    
+    def _decompress(self, encoding: str, compressed: bytes) -> bytes:
+        """Décompresser en refusant de dépasser max_size"""
+        if encoding == 'zstd':
+            reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(compressed))
+            parts, size = [], 0
+            while size <= self.max_size:
+                part = reader.read(65536)
+                if not part:
+                    break
+                parts.append(part)
+                size += len(part)
+            data = b''.join(parts)
+        else:
+            try:
+                data = self._inflate(compressed, AUTO_WBITS)
+            except zlib.error:
+                # 'deflate' est souvent envoyé sans l'en-tête zlib
+                if encoding != 'deflate':
+                    raise
+                data = self._inflate(compressed, RAW_WBITS)
+        if len(data) > self.max_size:
+            raise RequestEntityTooLarge()
+        return data
+    
+    def _inflate(self, compressed: bytes, wbits: int) -> bytes:
+        """Décompresser au plus max_size + 1 octets (zlib)"""
+        decompressor = zlib.decompressobj(wbits)
+        data = decompressor.decompress(compressed, self.max_size + 1)
+        if len(data) <= self.max_size and not decompressor.eof:
+            raise ValueError("Flux compressé tronqué")
+        return data
+    
+    @staticmethod
+    def _error(status: int, error: str, message: str) -> Response:
+        return Response(
+            json.dumps({'error': error, 'message': message}),
+            status=status,
+            mimetype='application/json'
+        )
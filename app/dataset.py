@@ -0,0 +1,216 @@
+"""
+Cache colonnes typé des jeux de mesures (Excel/CSV)
+
+La lecture de dataset_tp_ml.xlsx par pd.read_excel domine le temps d'une
+itération d'entraînement. Le fichier source est converti une fois pour
+toutes en un dossier de colonnes typées:
+
+    <cache>/<nom>-<empreinte>-v<format>/
+        meta.json           schéma, catégories, nombre de lignes
+        Opérateur.npy       codes (int8/int16) d'une colonne catégorique
+        Latence (ms).npy    float32
+        ...
+
+L'empreinte est le SHA-256 du contenu source: tout changement du fichier
+produit un nouveau dossier. Pour éviter de relire la source à chaque
+chargement, son empreinte est mémorisée avec sa taille et sa date de
+modification. Le chargement ne lit que les colonnes demandées, par
+mappage mémoire (np.load mmap_mode='r').
+
+Les codes sont enregistrés dans le type entier que pandas retient pour
+leurs catégories: pd.Categorical.from_codes et le DataFrame de
+load_dataset (un bloc par colonne) réutilisent alors les tableaux mappés
+sans les copier, et les pages restent partagées entre processus.
+"""
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Colonnes et classes d'entraînement (mêmes que PredictionService)
+CATEGORICAL_COLUMNS = ["Opérateur", "Quartier", "Type réseau"]
+NUMERIC_COLUMNS = [
+    "Download (Mbps)",
+    "Upload (Mbps)",
+    "Latence (ms)",
+    "Jitter (ms)",
+    "Loss (%)"
+]
+TARGET_COLUMN = "Qualite"
+CLASS_BY_LABEL = {"bonne": 0, "moyenne": 1, "mauvaise": 2}
+
+CACHE_FORMAT = 2
+INDEX_FILE = 'index.json'
+META_FILE = 'meta.json'
+
+
+def default_cache_dir(source: str) -> str:
+    """Dossier de cache par défaut (DATASET_CACHE_DIR, sinon à côté de la source)"""
+    return os.environ.get('DATASET_CACHE_DIR') or os.path.join(
+        os.path.dirname(os.path.abspath(source)), '.nq_cache'
+    )
+
+
+def content_hash(path: str) -> str:
+    """SHA-256 du fichier, lu par blocs"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_hash(source: str, cache_dir: str) -> str:
+    """Empreinte de la source, recalculée seulement si taille ou date changent"""
+    stat = os.stat(source)
+    key = os.path.abspath(source)
+    index_path = os.path.join(cache_dir, INDEX_FILE)
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+
+    known = index.get(key)
+    if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+        return known['sha256']
+
+    digest = content_hash(source)
+    index[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=cache_dir)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp, index_path)
+    return digest
+
+
+def _read_source(source: str):
+    import pandas as pd
+    if source.lower().endswith('.csv'):
+        return pd.read_csv(source)
+    return pd.read_excel(source)
+
+
+def ingest(source: str, target: str,
+           categorical_columns: Sequence[str] = tuple(CATEGORICAL_COLUMNS) + (TARGET_COLUMN,),
+           numeric_columns: Sequence[str] = NUMERIC_COLUMNS) -> Dict[str, Any]:
+    """
+    Convertir la source en colonnes typées dans le dossier target
+
+    Les lignes incomplètes ou dont une métrique n'est pas numérique sont
+    écartées (leur nombre est noté dans meta.json).
+    """
+    import pandas as pd
+
+    df = _read_source(source)
+    required = list(categorical_columns) + list(numeric_columns)
+    missing = [col for col in required if col not in df.columns]
+    if missing:
+        raise ValueError(f"Colonnes manquantes dans {source}: {', '.join(missing)}")
+
+    df = df[required].copy()
+    for col in numeric_columns:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    for col in categorical_columns:
+        df[col] = df[col].astype('string').str.strip()
+    total = len(df)
+    df = df.dropna().reset_index(drop=True)
+
+    parent = os.path.dirname(target)
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.staging-', dir=parent)
+    columns = {}
+    for col in categorical_columns:
+        categorical = pd.Categorical(df[col])
+        # Type choisi par pandas (int8 sous 128 catégories): relu sans conversion
+        codes = categorical.codes
+        np.save(os.path.join(staging, f"{col}.npy"), codes)
+        columns[col] = {'kind': 'category', 'dtype': codes.dtype.str,
+                        'categories': [str(c) for c in categorical.categories]}
+    for col in numeric_columns:
+        np.save(os.path.join(staging, f"{col}.npy"), df[col].to_numpy(dtype='float32'))
+        columns[col] = {'kind': 'numeric', 'dtype': '<f4'}
+
+    meta = {
+        'format': CACHE_FORMAT,
+        'source': os.path.basename(source),
+        'rows': int(len(df)),
+        'dropped_rows': int(total - len(df)),
+        'columns': columns
+    }
+    with open(os.path.join(staging, META_FILE), 'w') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    try:
+        os.rename(staging, target)
+    except OSError:
+        # Un autre processus a construit le même cache entre-temps
+        shutil.rmtree(staging, ignore_errors=True)
+    return meta
+
+
+def cache_path(source: str, cache_dir: Optional[str] = None) -> str:
+    """Dossier de cache de la source (construit à la demande)"""
+    cache_dir = cache_dir or default_cache_dir(source)
+    digest = _source_hash(source, cache_dir)
+    name = os.path.splitext(os.path.basename(source))[0]
+    target = os.path.join(cache_dir, f"{name}-{digest[:16]}-v{CACHE_FORMAT}")
+    if not os.path.exists(os.path.join(target, META_FILE)):
+        logger.info(f"Construction du cache colonnes de {source}")
+        ingest(source, target)
+    return target
+
+
+def load_columns(source: str, columns: Optional[Sequence[str]] = None,
+                 cache_dir: Optional[str] = None, mmap: bool = True) -> Dict[str, Any]:
+    """
+    Charger des colonnes typées depuis le cache
+
+    Args:
+        source: Fichier de mesures (Excel ou CSV)
+        columns: Colonnes à charger (toutes par défaut)
+        cache_dir: Dossier de cache (voir default_cache_dir)
+        mmap: Mapper les fichiers au lieu de les lire
+
+    Returns:
+        Colonne -> tableau NumPy (float32 mappé) ou pd.Categorical
+    """
+    import pandas as pd
+
+    target = cache_path(source, cache_dir)
+    with open(os.path.join(target, META_FILE)) as f:
+        meta = json.load(f)
+    wanted = list(columns) if columns is not None else list(meta['columns'])
+    unknown = [col for col in wanted if col not in meta['columns']]
+    if unknown:
+        raise ValueError(f"Colonnes inconnues: {', '.join(unknown)}")
+
+    result = {}
+    for col in wanted:
+        values = np.load(os.path.join(target, f"{col}.npy"), mmap_mode='r' if mmap else None)
+        spec = meta['columns'][col]
+        if spec['kind'] == 'category':
+            result[col] = pd.Categorical.from_codes(values, categories=spec['categories'])
+        else:
+            result[col] = values
+    return result
+
+
+def load_dataset(source: str, columns: Optional[Sequence[str]] = None,
+                 cache_dir: Optional[str] = None, mmap: bool = True):
+    """
+    DataFrame typé (catégories, float32) construit depuis le cache colonnes
+
+    copy=False: un bloc par colonne, sans regroupement des float32 en un
+    bloc 2D (qui les copierait). Avec mmap, les colonnes restent les
+    tableaux mappés de load_columns.
+    """
+    import pandas as pd
+    return pd.DataFrame(load_columns(source, columns, cache_dir, mmap), copy=False)
@@ -0,0 +1,236 @@
+"""
+Statistiques de dérive des entrées, en mémoire constante
+
+Chaque thread de requête ajoute le vecteur encodé à son tampon (un append
+de deque, atomique: ni verrou ni copie). Le tampon
+est fusionné dans les agrégats globaux en une opération vectorisée dès
+qu'il atteint buffer_rows lignes; un thread de fond fusionne en plus tous
+les tampons toutes les flush_interval secondes, et snapshot() fait de même:
+
+- numériques: histogramme à bornes fixes dans l'espace normalisé du
+  MinMaxScaler (0-1 = plage d'entraînement), d'où quantiles approchés et
+  compteurs hors plage (valeurs extrapolées silencieusement par le scaler);
+- catégoriques: compteurs de fréquence par code encodé.
+"""
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Sequence
+
+import numpy as np
+
+from app.lifecycle import register_after_fork
+
+logger = logging.getLogger(__name__)
+
+# Plage de l'histogramme dans l'espace normalisé (0-1 = plage d'entraînement)
+HIST_LOW = -0.5
+HIST_HIGH = 1.5
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+
+class DriftMonitor:
+    """Agrégats de dérive pour les entrées prétraitées d'un worker"""
+
+    def __init__(self, categorical_columns: Sequence[str], numeric_columns: Sequence[str],
+                 scaler, vocabulary: Dict[str, List[str]], encode,
+                 bins: int = 256, buffer_rows: int = 256, flush_interval: float = 1.0):
+        """
+        Args:
+            categorical_columns: Colonnes catégoriques (en tête du vecteur)
+            numeric_columns: Colonnes numériques normalisées (en fin de vecteur)
+            scaler: MinMaxScaler ajusté (pour revenir aux unités d'origine)
+            vocabulary: Valeurs connues par colonne catégorique
+            encode: Fonction d'encodage des catégories du service
+            bins: Nombre de classes de l'histogramme numérique
+            buffer_rows: Nombre de lignes en attente par thread avant fusion
+            flush_interval: Période de fusion de tous les tampons (secondes)
+        """
+        self.categorical_columns = list(categorical_columns)
+        self.numeric_columns = list(numeric_columns)
+        self.n_categorical = len(self.categorical_columns)
+        self.n_features = self.n_categorical + len(self.numeric_columns)
+        self.bins = bins
+        self.buffer_rows = buffer_rows
+        self.flush_interval = flush_interval
+
+        self.scale = np.asarray(scaler.scale_, dtype='float64')
+        self.min = np.asarray(scaler.min_, dtype='float64')
+        self.data_min = np.asarray(scaler.data_min_, dtype='float64')
+        self.data_max = np.asarray(scaler.data_max_, dtype='float64')
+
+        # Code encodé -> valeur connue, pour des fréquences lisibles
+        self.code_names = [
+            {int(encode(value)): value for value in vocabulary.get(col, [])}
+            for col in self.categorical_columns
+        ]
+
+        self._reset()
+        register_after_fork(self._reset)
+
+    def _reset(self):
+        """Agrégats vides (aussi dans chaque worker après un fork)"""
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Tampons de tous les threads, fusionnés par le thread de fond
+        self._buffers: List[_ThreadBuffer] = []
+        self._thread = None
+        self.count = 0
+        # Classes 0 et bins+1: sous/dépassement de la plage de l'histogramme
+        self.histograms = np.zeros((len(self.numeric_columns), self.bins + 2), dtype='int64')
+        self.below = np.zeros(len(self.numeric_columns), dtype='int64')
+        self.above = np.zeros(len(self.numeric_columns), dtype='int64')
+        self.categorical_counts = np.zeros((self.n_categorical, 1000), dtype='int64')
+
+    def observe(self, X: np.ndarray):
+        """
+        Enregistrer des lignes prétraitées (chemin de requête)
+        
+        Seule une référence au tableau est conservée: X n'est plus modifié
+        après le prétraitement. Le tampon du thread est fusionné dès qu'il
+        atteint buffer_rows lignes (un lot de /predict/batch l'est aussitôt).
+        """
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = self._register_buffer()
+        buffer.pending.append(X)
+        # Compteur écrit par ce seul thread: une fusion venue d'ailleurs le
+        # laisse au-dessus du contenu réel (fusion anticipée, sans effet)
+        buffer.rows += len(X)
+        if buffer.rows >= self.buffer_rows:
+            buffer.rows = 0
+            self._drain(buffer)
+
+    def _register_buffer(self) -> '_ThreadBuffer':
+        buffer = self._local.buffer = _ThreadBuffer()
+        with self._lock:
+            self._buffers.append(buffer)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='drift-merger', daemon=True
+                )
+                self._thread.start()
+        return buffer
+
+    def _drain(self, buffer: '_ThreadBuffer'):
+        """Fusionner le tampon d'un thread (appelable depuis tout thread)"""
+        pending, popleft = [], buffer.pending.popleft
+        while True:
+            try:
+                pending.append(popleft())
+            except IndexError:
+                break
+        if pending:
+            self._merge(np.concatenate(pending))
+
+    def flush(self):
+        """Fusionner les tampons de tous les threads; oublier ceux des threads terminés"""
+        with self._lock:
+            buffers = list(self._buffers)
+        for buffer in buffers:
+            self._drain(buffer)
+        with self._lock:
+            self._buffers = [b for b in self._buffers if b.owner.is_alive() or b.pending]
+
+    def _run(self):
+        """Boucle du thread de fond: fusion périodique, même sans trafic"""
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Erreur de fusion des statistiques de dérive: {e}")
+
+    def _merge(self, rows: np.ndarray):
+        """Fusion vectorisée d'un bloc de lignes dans les agrégats globaux"""
+        numeric = rows[:, self.n_categorical:].astype('float64')
+        codes = rows[:, :self.n_categorical].astype('int64') % 1000
+
+        position = (numeric - HIST_LOW) / (HIST_HIGH - HIST_LOW) * self.bins
+        indices = np.clip(np.floor(position).astype('int64') + 1, 0, self.bins + 1)
+        offsets = np.arange(len(self.numeric_columns)) * (self.bins + 2)
+        histogram_delta = np.bincount(
+            (indices + offsets).ravel(), minlength=self.histograms.size
+        ).reshape(self.histograms.shape)
+        category_offsets = np.arange(self.n_categorical) * 1000
+        category_delta = np.bincount(
+            (codes + category_offsets).ravel(), minlength=self.categorical_counts.size
+        ).reshape(self.categorical_counts.shape)
+
+        with self._lock:
+            self.count += rows.shape[0]
+            self.histograms += histogram_delta
+            self.below += (numeric < 0.0).sum(axis=0)
+            self.above += (numeric > 1.0).sum(axis=0)
+            self.categorical_counts += category_delta
+
+    def _quantiles(self, histogram: np.ndarray, feature: int) -> Dict[str, Any]:
+        """Quantiles approchés (centre de classe) en unités d'origine"""
+        total = histogram.sum()
+        if total == 0:
+            return {}
+        width = (HIST_HIGH - HIST_LOW) / self.bins
+        cumulative = np.cumsum(histogram)
+        result = {}
+        for q in QUANTILES:
+            index = int(np.searchsorted(cumulative, q * total, side='left'))
+            if index == 0:
+                label = f"< {self._to_raw(HIST_LOW, feature):.4g}"
+            elif index == self.bins + 1:
+                label = f"> {self._to_raw(HIST_HIGH, feature):.4g}"
+            else:
+                label = self._to_raw(HIST_LOW + (index - 0.5) * width, feature)
+            result[f"p{int(q * 100):02d}"] = label
+        return result
+
+    def _to_raw(self, scaled: float, feature: int) -> float:
+        """Inverse du MinMaxScaler pour une valeur normalisée"""
+        return float((scaled - self.min[feature]) / self.scale[feature])
+
+    def snapshot(self) -> Dict[str, Any]:
+        """État courant des agrégats (tampons de tous les threads fusionnés)"""
+        self.flush()
+        with self._lock:
+            count = self.count
+            histograms = self.histograms.copy()
+            below = self.below.copy()
+            above = self.above.copy()
+            categorical_counts = self.categorical_counts.copy()
+
+        numeric = {}
+        for j, col in enumerate(self.numeric_columns):
+            numeric[col] = {
+                'training_min': float(self.data_min[j]),
+                'training_max': float(self.data_max[j]),
+                'below_training_min': int(below[j]),
+                'above_training_max': int(above[j]),
+                'out_of_range_rate': float((below[j] + above[j]) / count) if count else 0.0,
+                'quantiles': self._quantiles(histograms[j], j)
+            }
+
+        categorical = {}
+        for i, col in enumerate(self.categorical_columns):
+            counts = categorical_counts[i]
+            known = sum(int(counts[code]) for code in self.code_names[i])
+            top = np.argsort(counts)[::-1][:10]
+            categorical[col] = {
+                'unknown_rate': float((count - known) / count) if count else 0.0,
+                'top': {
+                    self.code_names[i].get(int(code), f"code:{int(code)}"): int(counts[code])
+                    for code in top if counts[code] > 0
+                }
+            }
+
+        return {'count': int(count), 'numeric': numeric, 'categorical': categorical}
+
+
+class _ThreadBuffer:
+    """Observations en attente d'un thread de requête"""
+
+    __slots__ = ('pending', 'rows', 'owner')
+
+    def __init__(self):
+        self.pending: Deque[np.ndarray] = deque()
+        self.rows = 0
+        self.owner = threading.current_thread()
@@ -0,0 +1,77 @@
+"""
+Contributions par variable des prédictions de la forêt (méthode de Saabas)
+
+Dans un arbre, la probabilité d'une feuille est égale à celle de la racine plus
+la somme des écarts (enfant - parent) le long du chemin de décision. Chaque
+écart est attribué à la variable testée par le parent. Pour la forêt, on prend
+la moyenne sur les arbres: biais + somme des contributions = predict_proba.
+
+Comme le chemin ne dépend que de la feuille atteinte, la somme des écarts est
+précalculée une fois par nœud dans une table (nœuds de la forêt) x
+(variables x classes). Expliquer un lot revient à trouver les feuilles
+(model.apply, le même parcours que la prédiction) puis à sommer les lignes
+correspondantes de la table: un coût du même ordre que la prédiction.
+"""
+from typing import Tuple
+
+import numpy as np
+
+
+class ForestExplainer:
+    """Explications précalculées pour une forêt sklearn"""
+
+    def __init__(self, model):
+        """
+        Args:
+            model: RandomForestClassifier entraîné
+        """
+        estimators = getattr(model, 'estimators_', None)
+        if not estimators:
+            raise RuntimeError("Explications disponibles uniquement pour une forêt d'arbres")
+
+        self.model = model
+        self.n_features = int(model.n_features_in_)
+        self.n_classes = len(model.classes_)
+        self.n_trees = len(estimators)
+
+        blocks = []
+        offsets = []
+        bias = np.zeros(self.n_classes)
+        for estimator in estimators:
+            tree = estimator.tree_
+            value = tree.value[:, 0, :].astype('float64')
+            value = value / value.sum(axis=1, keepdims=True)
+            bias += value[0]
+
+            # Contributions cumulées de la racine à chaque nœud: celles du
+            # parent plus l'écart enfant - parent dans la colonne
+            # (variable testée par le parent, classe). Les enfants ont
+            # toujours un indice supérieur au parent.
+            block = np.zeros((tree.node_count, self.n_features * self.n_classes))
+            for parent in np.flatnonzero(tree.children_left >= 0):
+                feature = tree.feature[parent]
+                columns = slice(feature * self.n_classes, (feature + 1) * self.n_classes)
+                for child in (tree.children_left[parent], tree.children_right[parent]):
+                    block[child] = block[parent]
+                    block[child, columns] += value[child] - value[parent]
+            offsets.append(sum(len(b) for b in blocks))
+            blocks.append(block)
+
+        self.bias = bias / self.n_trees
+        self.offsets = np.array(offsets, dtype='int64')
+        # Moyenne sur les arbres intégrée à la table
+        self.table = np.vstack(blocks) / self.n_trees
+
+    def explain(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Contributions par variable et par classe
+
+        Args:
+            X: Entrées prétraitées (n, n_features)
+
+        Returns:
+            Tuple (biais (n_classes,), contributions (n, n_features, n_classes))
+        """
+        leaves = self.model.apply(X) + self.offsets
+        contributions = self.table[leaves].sum(axis=1)
+        return self.bias, contributions.reshape(X.shape[0], self.n_features, self.n_classes)
@@ -0,0 +1,72 @@
+"""
+Export du modèle pour l'inférence côté navigateur
+
+Le document produit contient tout ce qu'il faut pour reproduire exactement
+PredictionService.predict dans static/js/forest.js: encodage des catégories,
+paramètres du MinMaxScaler et arbres de la forêt (tableaux plats).
+"""
+from typing import Any, Dict
+
+import numpy as np
+
+EXPORT_FORMAT = 'nq-forest-v1'
+
+
+def _export_tree(estimator) -> Dict[str, list]:
+    """
+    Tableaux plats d'un arbre
+    
+    Pour un nœud interne: f = feature, t = seuil, l/r = enfants.
+    Pour une feuille: f = -1 et r = index de ses probabilités dans v.
+    """
+    tree = estimator.tree_
+    features, thresholds, lefts, rights, values = [], [], [], [], []
+    for node in range(tree.node_count):
+        if tree.children_left[node] == -1:
+            # Normalisation identique à DecisionTreeClassifier.predict_proba
+            value = tree.value[node, 0, :].astype('float64')
+            total = value.sum()
+            leaf = value / (total if total != 0.0 else 1.0)
+            features.append(-1)
+            thresholds.append(0)
+            lefts.append(-1)
+            rights.append(len(values))
+            values.append([float(p) for p in leaf])
+        else:
+            features.append(int(tree.feature[node]))
+            thresholds.append(float(tree.threshold[node]))
+            lefts.append(int(tree.children_left[node]))
+            rights.append(int(tree.children_right[node]))
+    return {'f': features, 't': thresholds, 'l': lefts, 'r': rights, 'v': values}
+
+
+def export_forest(service) -> Dict[str, Any]:
+    """
+    Exporter la forêt, le scaler et l'encodage du service
+    
+    Args:
+        service: PredictionService chargé (modèle RandomForestClassifier)
+        
+    Returns:
+        Document JSON-sérialisable
+    """
+    model = service.model
+    if not hasattr(model, 'estimators_'):
+        raise RuntimeError("Seuls les modèles de type forêt peuvent être exportés")
+    
+    return {
+        'format': EXPORT_FORMAT,
+        'model_version': service.model_version,
+        'categorical_columns': list(service.categorical_columns),
+        'numeric_columns': list(service.numeric_columns),
+        # Même encodage que PredictionService._encode_category
+        'encoding': {'type': 'crc32', 'modulo': 1000},
+        'vocabulary': {col: list(values) for col, values in service.categorical_vocabulary.items()},
+        'scaler': {
+            'scale': [float(x) for x in np.asarray(service.scaler.scale_)],
+            'min': [float(x) for x in np.asarray(service.scaler.min_)]
+        },
+        'classes': [int(c) for c in model.classes_],
+        'target_mapping': {str(k): v for k, v in service.target_mapping.items()},
+        'trees': [_export_tree(estimator) for estimator in model.estimators_]
+    }
@@ -0,0 +1,163 @@
+"""
+Normalisation MinMax repliée dans le modèle
+
+Le modèle est entraîné sur X = float32(x * scale + offset). Plutôt que de
+normaliser chaque requête, le modèle est transformé une fois au chargement
+pour prendre directement les entrées brutes x:
+
+- forêt: chaque seuil t d'une métrique est remplacé par le plus grand
+  float32 r tel que float32(r * scale + offset) <= t. La normalisation
+  étant croissante, x <= r équivaut alors à X <= t pour toute entrée
+  float32: mêmes feuilles, probabilités identiques au bit près. Une entrée
+  float64 non représentable en float32 (sklearn la convertit au plus
+  proche) ne peut changer de branche que si son arrondi float32 tombe sur
+  r ou sur le float32 suivant: ces lignes, rares, sont évaluées par le
+  modèle d'origine sur les entrées normalisées. Le résultat est donc
+  identique au chemin normalisé pour toute entrée;
+- ANN: la normalisation est repliée dans la première couche Dense
+  (ANNModel.fold_scaling), à l'arrondi float32 près.
+
+La forêt repliée est une copie: le modèle d'origine reste en mémoire.
+Backend 'folded' (voir app/backends.py), optionnel.
+"""
+import copy
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from app.backends import SklearnBackend
+
+# Ajustements d'un ulp au plus: l'estimation initiale est à quelques ulp près
+_MAX_ADJUSTMENTS = 64
+
+
+def affine_scaling(scaler, n_categorical: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vecteurs (scale, offset) de la normalisation sur toute la ligne d'entrée
+
+    Les variables catégoriques passent inchangées (échelle 1, décalage 0),
+    les numériques suivent scaler.transform: x * scale_ + min_.
+    """
+    scale = np.concatenate([np.ones(n_categorical), scaler.scale_]).astype('float64')
+    offset = np.concatenate([np.zeros(n_categorical), scaler.min_]).astype('float64')
+    return scale, offset
+
+
+def raw_thresholds(thresholds: np.ndarray, scale: np.ndarray, offset: np.ndarray) -> np.ndarray:
+    """
+    Seuils en unités brutes: plus grand float32 r avec float32(r * scale + offset) <= t
+
+    Args:
+        thresholds: Seuils t sur les entrées normalisées (float64)
+        scale, offset: Normalisation de la variable de chaque seuil (scale > 0)
+    """
+    thresholds = np.asarray(thresholds, dtype='float64')
+
+    def holds(r):
+        return (r.astype('float64') * scale + offset).astype('float32') <= thresholds
+
+    raw = ((thresholds - offset) / scale).astype('float32')
+    for _ in range(_MAX_ADJUSTMENTS):
+        below = ~holds(raw)
+        if not below.any():
+            break
+        raw[below] = np.nextafter(raw[below], np.float32(-np.inf))
+    for _ in range(_MAX_ADJUSTMENTS):
+        up = np.nextafter(raw, np.float32(np.inf))
+        grow = holds(up)
+        if not grow.any():
+            break
+        raw[grow] = up[grow]
+    if not holds(raw).all() or holds(np.nextafter(raw, np.float32(np.inf))).any():
+        raise ValueError("Seuils bruts non trouvés (normalisation non croissante ?)")
+    return raw.astype('float64')
+
+
+def fold_forest(forest, scale: np.ndarray, offset: np.ndarray):
+    """Copie de la forêt dont les seuils des métriques sont en unités brutes"""
+    folded = copy.deepcopy(forest)
+    # Variables catégoriques (échelle 1, décalage 0): seuils inchangés
+    scaled = (scale != 1.0) | (offset != 0.0)
+    for estimator in folded.estimators_:
+        tree = estimator.tree_
+        features = tree.feature
+        nodes = np.flatnonzero((features >= 0) & scaled[np.maximum(features, 0)])
+        if len(nodes):
+            feature = features[nodes]
+            # Vue sur les nœuds de l'arbre: modifiée en place
+            tree.threshold[nodes] = raw_thresholds(
+                tree.threshold[nodes], scale[feature], offset[feature]
+            )
+    return folded
+
+
+def fold_model(model, scaler, n_categorical: int):
+    """Modèle équivalent sur les entrées brutes (forêt sklearn ou ANNModel)"""
+    scale, offset = affine_scaling(scaler, n_categorical)
+    if (scale <= 0).any():
+        raise ValueError("Normalisation décroissante: repli impossible")
+    if hasattr(model, 'fold_scaling'):
+        return model.fold_scaling(scale, offset)
+    if getattr(model, 'estimators_', None) is None:
+        raise ValueError(f"Repli non pris en charge pour {type(model).__name__}")
+    return fold_forest(model, scale, offset)
+
+
+def boundary_values(forest) -> Dict[int, np.ndarray]:
+    """
+    Par variable, arrondis float32 ambigus: seuils r et float32 suivants
+
+    Une entrée float64 dont l'arrondi float32 n'est pas l'une de ces valeurs
+    prend la même branche que sur le chemin normalisé.
+    """
+    thresholds: Dict[int, list] = {}
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        for feature in np.unique(tree.feature[tree.feature >= 0]):
+            thresholds.setdefault(int(feature), []).append(
+                tree.threshold[tree.feature == feature].astype('float32')
+            )
+    boundaries = {}
+    for feature, values in thresholds.items():
+        values = np.concatenate(values)
+        boundaries[feature] = np.unique(
+            np.concatenate([values, np.nextafter(values, np.float32(np.inf))])
+        )
+    return boundaries
+
+
+class FoldedBackend(SklearnBackend):
+    """predict_proba du modèle replié, sur les entrées brutes (sans scaler)"""
+
+    name = 'folded'
+    raw_inputs = True
+
+    def __init__(self, model, scaler, n_categorical: int = 3):
+        super().__init__(fold_model(model, scaler, n_categorical))
+        # Forêt: lignes ambiguës renvoyées au modèle d'origine (résultat exact)
+        self.reference = None
+        self._boundaries = {}
+        if not hasattr(model, 'fold_scaling'):
+            self.reference = model
+            self._boundaries = {
+                feature: values for feature, values in boundary_values(self.model).items()
+                if feature >= n_categorical
+            }
+
+    def ambiguous_rows(self, raw: np.ndarray) -> np.ndarray:
+        """Lignes dont une métrique non float32 s'arrondit sur une frontière"""
+        ambiguous = np.zeros(len(raw), dtype=bool)
+        for feature, boundary in self._boundaries.items():
+            values = raw[:, feature]
+            rounded = values.astype('float32')
+            index = np.minimum(np.searchsorted(boundary, rounded), len(boundary) - 1)
+            ambiguous |= (boundary[index] == rounded) & (rounded != values)
+        return ambiguous
+
+    def infer(self, X: np.ndarray, raw: Optional[np.ndarray] = None) -> np.ndarray:
+        probabilities = super().infer(X, raw)
+        if self.reference is not None and X is not None:
+            ambiguous = self.ambiguous_rows(raw)
+            if ambiguous.any():
+                probabilities[ambiguous] = self.reference.predict_proba(X[ambiguous])
+        return probabilities
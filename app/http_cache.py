@@ -0,0 +1,97 @@
+"""
+Cache HTTP: assets statiques versionnés/précompressés et réponses avec ETag
+"""
+import os
+import json
+import hashlib
+import logging
+import mimetypes
+from typing import Dict, Optional
+
+from flask import Flask, current_app, make_response, request, send_from_directory, url_for
+
+logger = logging.getLogger(__name__)
+
+# Assets dont le nom contient l'empreinte du contenu: cache d'un an
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Réponses dynamiques: toujours revalider (If-None-Match -> 304)
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+# Encodages servis par ordre de préférence
+PRECOMPRESSED_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def load_asset_manifest(static_dir: str) -> Dict[str, Dict]:
+    """Lire static/dist/manifest.json (vide si build_static.py n'a pas tourné)"""
+    path = os.path.join(static_dir, 'dist', 'manifest.json')
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def asset_url(filename: str) -> str:
+    """URL versionnée d'un asset si le build existe, URL simple sinon"""
+    entry = current_app.extensions['asset_manifest'].get(filename)
+    if entry is None:
+        return url_for('static', filename=filename)
+    return url_for('static', filename=entry['path'])
+
+
+def serve_static(filename: str):
+    """
+    Servir un fichier statique
+    
+    Les assets versionnés (static/dist/) sont servis avec un cache long et,
+    si le client l'accepte, dans leur variante précompressée.
+    """
+    hashed = current_app.extensions['hashed_assets'].get(filename)
+    if hashed is None:
+        return current_app.send_static_file(filename)
+    
+    mimetype = mimetypes.guess_type(filename)[0]
+    for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+        if encoding in hashed and request.accept_encodings.quality(encoding) > 0:
+            response = send_from_directory(
+                current_app.static_folder, filename + suffix, mimetype=mimetype
+            )
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(current_app.static_folder, filename, mimetype=mimetype)
+    
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def conditional_response(body: bytes, mimetype: str, etag: Optional[str] = None,
+                         cache_control: str = REVALIDATE_CACHE_CONTROL):
+    """
+    Réponse avec ETag fort; 304 sans corps si If-None-Match correspond
+    
+    Args:
+        body: Corps déjà sérialisé
+        mimetype: Type MIME de la réponse
+        etag: ETag précalculé (empreinte du corps par défaut)
+        cache_control: Valeur de l'en-tête Cache-Control
+    """
+    if etag is None:
+        etag = hashlib.sha256(body).hexdigest()[:32]
+    response = make_response(body)
+    response.mimetype = mimetype
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    return response.make_conditional(request)
+
+
+def init_http_cache(app: Flask):
+    """Brancher le manifeste d'assets et la route statique sur l'application"""
+    manifest = load_asset_manifest(app.static_folder)
+    app.extensions['asset_manifest'] = manifest
+    app.extensions['hashed_assets'] = {
+        entry['path']: set(entry['encodings']) for entry in manifest.values()
+    }
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.view_functions['static'] = serve_static
+    if manifest:
+        logger.info(f"{len(manifest)} assets versionnés chargés depuis static/dist")
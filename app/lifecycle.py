@@ -0,0 +1,30 @@
+"""
+Hooks de cycle de vie des workers (réinitialisation après fork)
+"""
+import logging
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+_after_fork_hooks: List[Callable[[], None]] = []
+
+
+def register_after_fork(callback: Callable[[], None]) -> Callable[[], None]:
+    """
+    Enregistrer une fonction à exécuter dans chaque worker après le fork
+
+    Utilisable comme décorateur. Sert à recréer les verrous, pools de
+    threads et autres états qui ne survivent pas à un fork.
+    """
+    if callback not in _after_fork_hooks:
+        _after_fork_hooks.append(callback)
+    return callback
+
+
+def run_after_fork_hooks():
+    """Exécuter les hooks enregistrés (appelé par gunicorn post_fork)"""
+    for callback in _after_fork_hooks:
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Erreur dans le hook post-fork {callback.__name__}: {e}")
@@ -0,0 +1,46 @@
+"""
+Compteurs de métriques du processus (exposés sur /metrics)
+"""
+import threading
+from typing import Dict, Union
+
+from app.lifecycle import register_after_fork
+
+Number = Union[int, float]
+
+
+class Metrics:
+    """Compteurs et jauges thread-safe, propres à chaque worker"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Number] = {}
+        self._gauges: Dict[str, Number] = {}
+        register_after_fork(self.reset)
+    
+    def increment(self, name: str, value: Number = 1):
+        """Incrémenter un compteur"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+    
+    def set_gauge(self, name: str, value: Number):
+        """Fixer la valeur courante d'une jauge"""
+        with self._lock:
+            self._gauges[name] = value
+    
+    def snapshot(self) -> Dict[str, Dict[str, Number]]:
+        """Copie cohérente des compteurs et jauges"""
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges)
+            }
+    
+    def reset(self):
+        """Repartir de zéro (nouveau worker après fork)"""
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+
+
+metrics = Metrics()
@@ -0,0 +1,190 @@
+"""
+Export ONNX du modèle et inférence avec ONNX Runtime
+
+Le graphe exporté prend les entrées brutes (n, 8) en float64: codes des
+trois variables catégoriques puis les cinq métriques non normalisées. La
+normalisation MinMax y est intégrée:
+
+- forêt: un nœud affine X = x * scale + offset en float64 puis une
+  conversion en float32, comme preprocess_batch (scaler.transform puis
+  astype), devant l'ensemble d'arbres converti par skl2onnx;
+- ANN: la normalisation est repliée dans la première couche Dense
+  (ANNModel.fold_scaling), sans nœud supplémentaire.
+
+Les seuils float64 de sklearn sont arrondis vers le bas en float32 (et non
+au plus proche): pour toute entrée float32 x, x <= t équivaut alors à
+x <= seuil32, et les feuilles atteintes sont celles de sklearn.
+
+La sortie 'probabilities' (float32) et les classes (métadonnées 'classes')
+suffisent à OnnxBackend, backend 'onnx' (voir app/backends.py) qui garde
+une session ONNX Runtime ouverte.
+"""
+import json
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from app.backends import InferenceBackend
+from app.folding import affine_scaling
+
+try:
+    import onnxruntime
+except ImportError:  # dépendance optionnelle
+    onnxruntime = None
+
+INPUT_NAME = 'raw'
+OUTPUT_NAME = 'probabilities'
+TARGET_OPSET = {'': 17, 'ai.onnx.ml': 3}
+# Version IR de l'opset 17 (acceptée par les versions courantes d'ONNX Runtime)
+IR_VERSION = 8
+
+
+def _round_thresholds_down(onnx_model, forest):
+    """Remplacer les seuils float32 de skl2onnx par l'arrondi inférieur exact"""
+    thresholds = np.concatenate([e.tree_.threshold for e in forest.estimators_])
+    lower = thresholds.astype('float32')
+    above = lower.astype('float64') > thresholds
+    lower[above] = np.nextafter(lower[above], np.float32(-np.inf))
+
+    node = next(n for n in onnx_model.graph.node if n.op_type == 'TreeEnsembleClassifier')
+    values = next(a for a in node.attribute if a.name == 'nodes_values')
+    if len(values.floats) != len(thresholds):
+        raise ValueError("Ordre des nœuds ONNX inattendu: seuils non alignés")
+    values.floats[:] = lower.tolist()
+
+
+def _forest_graph(forest, scale: np.ndarray, offset: np.ndarray):
+    """Nœud affine float64 + ensemble d'arbres skl2onnx"""
+    from onnx import TensorProto, helper, numpy_helper
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+
+    n_features = len(scale)
+    converted = convert_sklearn(
+        forest, initial_types=[('X', FloatTensorType([None, n_features]))],
+        options={id(forest): {'zipmap': False}}, target_opset=TARGET_OPSET
+    )
+    _round_thresholds_down(converted, forest)
+
+    graph = converted.graph
+    prelude = [
+        helper.make_node('Mul', [INPUT_NAME, 'scale'], ['scaled']),
+        helper.make_node('Add', ['scaled', 'offset'], ['shifted']),
+        helper.make_node('Cast', ['shifted'], ['X'], to=TensorProto.FLOAT)
+    ]
+    initializers = [numpy_helper.from_array(scale, 'scale'),
+                    numpy_helper.from_array(offset, 'offset')]
+    outputs = [o for o in graph.output if o.name == OUTPUT_NAME]
+    merged = helper.make_graph(
+        prelude + list(graph.node), 'network_quality_forest',
+        [helper.make_tensor_value_info(INPUT_NAME, TensorProto.DOUBLE, [None, n_features])],
+        outputs, initializer=initializers + list(graph.initializer)
+    )
+    return helper.make_model(merged, opset_imports=list(converted.opset_import),
+                             ir_version=converted.ir_version), forest.classes_
+
+
+def _ann_graph(ann, scale: np.ndarray, offset: np.ndarray):
+    """Couches Dense (normalisation repliée) en MatMul / Add / activation"""
+    from onnx import TensorProto, helper, numpy_helper
+
+    ops = {'relu': 'Relu', 'sigmoid': 'Sigmoid', 'tanh': 'Tanh', 'softmax': 'Softmax'}
+    folded = ann.fold_scaling(scale, offset)
+    nodes = [helper.make_node('Cast', [INPUT_NAME], ['h0'], to=TensorProto.FLOAT)]
+    initializers = []
+    current = 'h0'
+    last = len(folded.kernels) - 1
+    for i, (kernel, bias, activation) in enumerate(
+            zip(folded.kernels, folded.biases, folded.activations)):
+        initializers += [numpy_helper.from_array(kernel, f'kernel{i}'),
+                         numpy_helper.from_array(bias, f'bias{i}')]
+        nodes += [helper.make_node('MatMul', [current, f'kernel{i}'], [f'mm{i}']),
+                  helper.make_node('Add', [f'mm{i}', f'bias{i}'], [f'z{i}'])]
+        output = OUTPUT_NAME if i == last else f'h{i + 1}'
+        if activation == 'linear':
+            nodes.append(helper.make_node('Identity', [f'z{i}'], [output]))
+        else:
+            attributes = {'axis': 1} if activation == 'softmax' else {}
+            nodes.append(helper.make_node(ops[activation], [f'z{i}'], [output], **attributes))
+        current = output
+
+    graph = helper.make_graph(
+        nodes, 'network_quality_ann',
+        [helper.make_tensor_value_info(INPUT_NAME, TensorProto.DOUBLE, [None, len(scale)])],
+        [helper.make_tensor_value_info(OUTPUT_NAME, TensorProto.FLOAT,
+                                       [None, len(folded.classes_)])],
+        initializer=initializers
+    )
+    opsets = [helper.make_opsetid('', TARGET_OPSET[''])]
+    return helper.make_model(graph, opset_imports=opsets, ir_version=IR_VERSION), folded.classes_
+
+
+def export_onnx(model, scaler, path: str, n_categorical: int = 3,
+                metadata: Optional[Dict[str, Any]] = None):
+    """
+    Exporter le modèle (forêt sklearn ou ANNModel) et sa normalisation en ONNX
+
+    Args:
+        model: Modèle servi (predict_proba sur les entrées normalisées)
+        scaler: MinMaxScaler des variables numériques
+        path: Fichier .onnx écrit
+        n_categorical: Nombre de colonnes catégoriques en tête de ligne
+        metadata: Métadonnées ajoutées (ex. model_version du service)
+
+    Returns:
+        Le ModelProto écrit
+    """
+    import onnx
+    from app.ann import ANNModel
+
+    scale, offset = affine_scaling(scaler, n_categorical)
+    if isinstance(model, ANNModel):
+        onnx_model, classes = _ann_graph(model, scale, offset)
+    else:
+        onnx_model, classes = _forest_graph(model, scale, offset)
+
+    properties = dict(metadata or {}, classes=json.dumps(np.asarray(classes).tolist()))
+    for key, value in properties.items():
+        entry = onnx_model.metadata_props.add()
+        entry.key, entry.value = key, str(value)
+    onnx.checker.check_model(onnx_model)
+    onnx.save(onnx_model, path)
+    return onnx_model
+
+
+class OnnxBackend(InferenceBackend):
+    """Session ONNX Runtime persistante sur un export de export_onnx()"""
+
+    name = 'onnx'
+    # InferenceSession.run peut être appelé depuis plusieurs threads
+    thread_safe = True
+    raw_inputs = True
+
+    def __init__(self, path: str, intra_op_threads: int = 1, inter_op_threads: int = 1):
+        if onnxruntime is None:
+            raise RuntimeError("onnxruntime n'est pas installé")
+        self.path = path
+        self.intra_op_threads = int(intra_op_threads)
+        self.inter_op_threads = int(inter_op_threads)
+        self._open_session()
+        self.metadata = dict(self.session.get_modelmeta().custom_metadata_map)
+        self.classes_ = np.asarray(json.loads(self.metadata['classes']))
+
+    def _open_session(self):
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(
+            self.path, sess_options=options, providers=['CPUExecutionProvider']
+        )
+
+    def after_fork(self):
+        """Les pools de threads de la session du master ne survivent pas au fork"""
+        self._open_session()
+
+    def predict_proba(self, raw: np.ndarray) -> np.ndarray:
+        """Probabilités par classe à partir des entrées brutes (n, 8)"""
+        raw = np.ascontiguousarray(raw, dtype='float64')
+        return self.session.run([OUTPUT_NAME], {INPUT_NAME: raw})[0].astype('float64')
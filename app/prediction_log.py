@@ -0,0 +1,334 @@
+"""
+Journal des prédictions en ajout seul, écrit en arrière-plan
+
+Le chemin de requête copie les entrées encodées, les probabilités, la version
+du modèle et l'horodatage dans un tampon circulaire préalloué (mémoire
+bornée, un verrou court par appel). Un thread de fond vide le tampon par lots
+dans des segments colonnes compressés:
+
+    fichier segment = suite de blocs
+    bloc = magic (4) | lignes (uint32) | longueur de l'en-tête (uint32)
+           | en-tête JSON (codec, colonnes: nom, dtype, forme, taille)
+           | colonnes compressées, l'une après l'autre
+
+Un segment est fermé après segment_rows lignes et un nouveau fichier est
+ouvert (nom horodaté avec le pid: pas de collision entre workers). Si le
+disque ne suit pas et que le tampon est plein, les nouvelles lignes sont
+abandonnées (policy='drop') ou la requête attend au plus block_timeout
+secondes (policy='block').
+
+read_prediction_log() relit les segments bloc par bloc sous forme de
+tableaux NumPy.
+"""
+import os
+import glob
+import json
+import time
+import zlib
+import atexit
+import struct
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, Optional, Sequence
+
+import numpy as np
+
+from app.lifecycle import register_after_fork
+from app.metrics import metrics
+
+try:
+    import zstandard
+except ImportError:  # zlib de la bibliothèque standard sinon
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+BLOCK_MAGIC = b'NQLB'
+BLOCK_HEADER = struct.Struct('<4sII')
+SEGMENT_SUFFIX = '.nqlog'
+VERSION_DTYPE = 'S32'
+POLICIES = ('drop', 'block')
+
+
+class PredictionLog:
+    """Tampon circulaire des prédictions et écrivain de segments"""
+
+    def __init__(self, directory: str, n_features: int, n_classes: int,
+                 capacity: int = 65536, flush_rows: int = 4096,
+                 flush_interval: float = 1.0, segment_rows: int = 1000000,
+                 policy: str = 'drop', block_timeout: float = 0.05):
+        """
+        Args:
+            directory: Dossier des segments (créé si besoin)
+            n_features: Largeur du vecteur encodé
+            n_classes: Nombre de probabilités par ligne
+            capacity: Nombre de lignes du tampon circulaire
+            flush_rows: Taille de lot déclenchant une écriture
+            flush_interval: Délai maximal avant écriture (secondes)
+            segment_rows: Lignes par segment avant rotation
+            policy: 'drop' ou 'block' quand le tampon est plein
+            block_timeout: Attente maximale en mode 'block' (secondes)
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Politique inconnue: {policy} (attendu: {', '.join(POLICIES)})")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.n_features = int(n_features)
+        self.n_classes = int(n_classes)
+        self.capacity = int(capacity)
+        self.flush_rows = min(int(flush_rows), self.capacity)
+        self.flush_interval = float(flush_interval)
+        self.segment_rows = int(segment_rows)
+        self.policy = policy
+        self.block_timeout = float(block_timeout)
+        self.codec = 'zstd' if zstandard is not None else 'zlib'
+
+        self._timestamps = np.empty(self.capacity, dtype='<f8')
+        self._features = np.empty((self.capacity, self.n_features), dtype='<f4')
+        self._probabilities = np.empty((self.capacity, self.n_classes), dtype='<f8')
+        self._versions = np.empty(self.capacity, dtype=VERSION_DTYPE)
+
+        self._reset()
+        register_after_fork(self._reset)
+        atexit.register(self.close)
+
+    def _reset(self):
+        """Tampon vide, nouveau segment et thread à (re)démarrer (aussi après fork)"""
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        # Sérialise les écritures disque (thread de fond, flush() explicite, close())
+        self._io_lock = threading.Lock()
+        self._head = 0       # prochaine ligne à écrire dans le tampon
+        self._pending = 0    # lignes en attente d'écriture sur disque
+        self._thread = None
+        self._closed = False
+        self._segment = None
+        self._segment_rows_written = 0
+        self._segment_index = 0
+        self.written = 0
+        self.dropped = 0
+
+    # -- Chemin de requête -------------------------------------------------
+
+    def append(self, X: np.ndarray, probabilities: np.ndarray, version: str):
+        """Enregistrer un lot de prédictions (copie dans le tampon, sans E/S)"""
+        n = X.shape[0]
+        if self._thread is None:
+            self._start()
+        now = time.time()
+        with self._lock:
+            if self.capacity - self._pending < n and not self._wait_for_space(n):
+                self.dropped += n
+                metrics.increment('prediction_log_dropped', n)
+                return
+            start = self._head
+            end = start + n
+            if end <= self.capacity:
+                self._store(slice(start, end), X, probabilities, version, now)
+            else:
+                split = self.capacity - start
+                self._store(slice(start, self.capacity), X[:split], probabilities[:split],
+                            version, now)
+                self._store(slice(0, end - self.capacity), X[split:], probabilities[split:],
+                            version, now)
+            self._head = end % self.capacity
+            self._pending += n
+            if self._pending >= self.flush_rows:
+                self._not_empty.notify()
+
+    def _store(self, rows: slice, X, probabilities, version, now):
+        self._timestamps[rows] = now
+        self._features[rows] = X
+        self._probabilities[rows] = probabilities
+        self._versions[rows] = version
+
+    def _wait_for_space(self, n: int) -> bool:
+        """Politique 'block': attendre que l'écrivain libère de la place (verrou tenu)"""
+        if self.policy != 'block' or n > self.capacity:
+            return False
+        self._not_empty.notify()
+        deadline = time.monotonic() + self.block_timeout
+        while self.capacity - self._pending < n:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._not_full.wait(remaining)
+        return True
+
+    # -- Thread d'écriture -------------------------------------------------
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='prediction-log', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if self._pending < self.flush_rows and not self._closed:
+                    self._not_empty.wait(self.flush_interval)
+                if self._closed and self._pending == 0:
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Erreur d'écriture du journal des prédictions: {e}")
+                time.sleep(self.flush_interval)
+
+    def flush(self):
+        """Écrire sur disque les lignes en attente (un bloc par segment touché)"""
+        with self._io_lock:
+            self._flush_pending()
+
+    def _flush_pending(self):
+        with self._lock:
+            n = self._pending
+            if n == 0:
+                return
+            start = (self._head - n) % self.capacity
+            # Copie sous verrou: le tampon peut être réutilisé juste après
+            indices = (start + np.arange(n)) % self.capacity
+            columns = {
+                'timestamp': self._timestamps[indices],
+                'features': self._features[indices],
+                'probabilities': self._probabilities[indices],
+                'model_version': self._versions[indices]
+            }
+            self._pending = 0
+            self._not_full.notify_all()
+
+        offset = 0
+        while offset < n:
+            if self._segment is None or self._segment_rows_written >= self.segment_rows:
+                self._rotate()
+            count = min(n - offset, self.segment_rows - self._segment_rows_written)
+            self._write_block({name: values[offset:offset + count]
+                               for name, values in columns.items()}, count)
+            offset += count
+        self.written += n
+        metrics.increment('prediction_log_written', n)
+
+    def _rotate(self):
+        """Fermer le segment courant et en ouvrir un nouveau"""
+        if self._segment is not None:
+            self._segment.close()
+        stamp = datetime.now().strftime('%Y%m%dT%H%M%S')
+        name = f"predictions-{stamp}-{os.getpid()}-{self._segment_index:04d}{SEGMENT_SUFFIX}"
+        self._segment_index += 1
+        self._segment = open(os.path.join(self.directory, name), 'ab')
+        self._segment_rows_written = 0
+
+    def _write_block(self, columns: Dict[str, np.ndarray], n_rows: int):
+        payloads = []
+        descriptors = []
+        for name, values in columns.items():
+            payload = _compress(np.ascontiguousarray(values).tobytes(), self.codec)
+            payloads.append(payload)
+            descriptors.append({
+                'name': name,
+                'dtype': values.dtype.str,
+                'shape': list(values.shape[1:]),
+                'size': len(payload)
+            })
+        header = json.dumps({'codec': self.codec, 'columns': descriptors}).encode('utf-8')
+        # Un seul write par bloc: un arrêt brutal laisse au pire un bloc tronqué en fin
+        self._segment.write(b''.join(
+            [BLOCK_HEADER.pack(BLOCK_MAGIC, n_rows, len(header)), header] + payloads
+        ))
+        self._segment.flush()
+        self._segment_rows_written += n_rows
+
+    def close(self):
+        """Écrire les lignes restantes et fermer le segment courant"""
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout=5)
+        self.flush()
+        with self._io_lock:
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+
+    def stats(self) -> Dict[str, object]:
+        """État du tampon et compteurs du worker"""
+        with self._lock:
+            return {
+                'directory': self.directory,
+                'policy': self.policy,
+                'capacity': self.capacity,
+                'pending': self._pending,
+                'written': self.written,
+                'dropped': self.dropped
+            }
+
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return zlib.compress(data, 1)
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Segment compressé en zstd: module zstandard requis")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def list_segments(directory: str) -> Sequence[str]:
+    """Segments du dossier, du plus ancien au plus récent"""
+    return sorted(glob.glob(os.path.join(directory, f"*{SEGMENT_SUFFIX}")),
+                  key=lambda path: (os.path.getmtime(path), path))
+
+
+def read_prediction_log(directory: str,
+                        columns: Optional[Sequence[str]] = None) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Relire le journal bloc par bloc
+
+    Args:
+        directory: Dossier des segments
+        columns: Colonnes à décompresser (toutes par défaut)
+
+    Yields:
+        Dictionnaire colonne -> tableau NumPy (timestamp, features,
+        probabilities, model_version) pour chaque bloc écrit
+    """
+    for path in list_segments(directory):
+        with open(path, 'rb') as f:
+            while True:
+                raw = f.read(BLOCK_HEADER.size)
+                if len(raw) < BLOCK_HEADER.size:
+                    break
+                magic, n_rows, header_size = BLOCK_HEADER.unpack(raw)
+                if magic != BLOCK_MAGIC:
+                    logger.warning(f"Bloc invalide dans {path}: lecture interrompue")
+                    break
+                header_bytes = f.read(header_size)
+                if len(header_bytes) < header_size:
+                    break  # bloc tronqué (arrêt pendant l'écriture)
+                header = json.loads(header_bytes.decode('utf-8'))
+                block = {}
+                truncated = False
+                for descriptor in header['columns']:
+                    payload = f.read(descriptor['size'])
+                    if len(payload) < descriptor['size']:
+                        truncated = True
+                        break
+                    if columns is not None and descriptor['name'] not in columns:
+                        continue
+                    values = np.frombuffer(_decompress(payload, header['codec']),
+                                           dtype=descriptor['dtype'])
+                    block[descriptor['name']] = values.reshape([n_rows] + descriptor['shape'])
+                if truncated:
+                    break
+                yield block
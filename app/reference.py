@@ -0,0 +1,188 @@
+"""
+Statistiques de référence par combinaison Opérateur / Quartier / Type réseau
+
+Le build (build_reference_stats.py) agrège les données d'entraînement une
+fois pour toutes dans un fichier binaire:
+
+    magic (8 octets) | longueur de l'en-tête (uint32) | en-tête JSON | données
+
+Les données forment un cube float64 indexé par (opérateur, quartier, type
+réseau), chaque dimension ayant une entrée supplémentaire "*" pour toutes les
+valeurs. Chaque cellule contient le nombre de mesures, la moyenne et les
+quantiles des cinq métriques puis la répartition des classes.
+
+À l'exécution le fichier est mappé en lecture seule (pages partagées entre
+workers via le cache du système): une recherche est un calcul d'indice et la
+lecture d'une ligne, sans pandas.
+"""
+import json
+import struct
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+MAGIC = b'NQREF001'
+HEADER_LENGTH = struct.Struct('<I')
+ALIGNMENT = 64
+WILDCARD = '*'
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+
+def normalize(value: Any) -> str:
+    """Clé de recherche d'une valeur catégorique (casse et espaces ignorés)"""
+    return str(value).strip().casefold()
+
+
+def build_reference_table(df, path: str, categorical_columns: Sequence[str],
+                          numeric_columns: Sequence[str], target_column: str,
+                          quantiles: Sequence[float] = QUANTILES) -> Dict[str, Any]:
+    """
+    Agréger un DataFrame d'entraînement et écrire la table mappable
+
+    Args:
+        df: Données d'entraînement (colonnes catégoriques, numériques et cible)
+        path: Fichier de sortie
+        categorical_columns: Dimensions du cube
+        numeric_columns: Métriques agrégées
+        target_column: Colonne de la classe de qualité
+        quantiles: Quantiles calculés pour chaque métrique
+
+    Returns:
+        En-tête écrit dans le fichier
+    """
+    import pandas as pd
+
+    categorical_columns = list(categorical_columns)
+    numeric_columns = list(numeric_columns)
+    df = df.dropna(subset=categorical_columns + numeric_columns + [target_column]).copy()
+    for col in categorical_columns:
+        df[col] = df[col].map(normalize)
+    df[target_column] = df[target_column].astype(str)
+
+    vocabulary = [sorted(df[col].unique()) for col in categorical_columns]
+    classes = sorted(df[target_column].unique())
+    shape = [len(values) + 1 for values in vocabulary]
+    stats_per_metric = 1 + len(quantiles)
+    width = 1 + len(numeric_columns) * stats_per_metric + len(classes)
+    cube = np.full((int(np.prod(shape)), width), np.nan)
+    cube[:, 0] = 0.0
+
+    codes = np.stack([
+        pd.Categorical(df[col], categories=values).codes
+        for col, values in zip(categorical_columns, vocabulary)
+    ], axis=1)
+
+    # Chaque sous-ensemble de dimensions: les autres sont agrégées sous "*"
+    n_dims = len(categorical_columns)
+    for mask in range(2 ** n_dims):
+        kept = [d for d in range(n_dims) if mask >> d & 1]
+        index = np.zeros(len(df), dtype='int64')
+        for d in range(n_dims):
+            position = codes[:, d] if d in kept else np.full(len(df), len(vocabulary[d]))
+            index = index * shape[d] + position
+        grouped = df.assign(_cell=index).groupby('_cell')
+
+        cells = grouped.size()
+        rows = cells.index.to_numpy()
+        cube[rows, 0] = cells.to_numpy()
+        means = grouped[numeric_columns].mean()
+        quantile_values = grouped[numeric_columns].quantile(list(quantiles))
+        for j, col in enumerate(numeric_columns):
+            base = 1 + j * stats_per_metric
+            cube[rows, base] = means[col].to_numpy()
+            for k, q in enumerate(quantiles):
+                cube[rows, base + 1 + k] = quantile_values[col].xs(q, level=1).to_numpy()
+        distribution = pd.crosstab(index, df[target_column], normalize='index')
+        distribution = distribution.reindex(columns=classes, fill_value=0.0)
+        offset = 1 + len(numeric_columns) * stats_per_metric
+        cube[distribution.index.to_numpy(), offset:] = distribution.to_numpy()
+
+    header = {
+        'categorical_columns': categorical_columns,
+        'numeric_columns': numeric_columns,
+        'vocabulary': vocabulary,
+        'quantiles': list(quantiles),
+        'classes': classes,
+        'shape': shape,
+        'width': width,
+        'rows': int(len(df))
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    data_offset = len(MAGIC) + HEADER_LENGTH.size + len(header_bytes)
+    padding = -data_offset % ALIGNMENT
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(HEADER_LENGTH.pack(len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b'\0' * padding)
+        f.write(cube.astype('<f8').tobytes())
+    return header
+
+
+class ReferenceStats:
+    """Table de référence mappée en lecture seule"""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            magic = f.read(len(MAGIC))
+            if magic != MAGIC:
+                raise ValueError(f"Fichier de statistiques de référence invalide: {path}")
+            (length,) = HEADER_LENGTH.unpack(f.read(HEADER_LENGTH.size))
+            header = json.loads(f.read(length).decode('utf-8'))
+
+        data_offset = len(MAGIC) + HEADER_LENGTH.size + length
+        data_offset += -data_offset % ALIGNMENT
+        self.path = path
+        self.header = header
+        self.categorical_columns: List[str] = header['categorical_columns']
+        self.numeric_columns: List[str] = header['numeric_columns']
+        self.quantiles: List[float] = header['quantiles']
+        self.quantile_labels = [f"p{int(round(q * 100)):02d}" for q in self.quantiles]
+        self.classes: List[str] = header['classes']
+        self.shape: List[int] = header['shape']
+        self.table = np.memmap(path, dtype='<f8', mode='r', offset=data_offset,
+                               shape=(int(np.prod(self.shape)), header['width']))
+        # Valeur normalisée -> position, par dimension ("*" = dernière position)
+        self.index = [
+            {**{value: i for i, value in enumerate(values)}, WILDCARD: len(values)}
+            for values in header['vocabulary']
+        ]
+        self.strides = [int(np.prod(self.shape[d + 1:])) for d in range(len(self.shape))]
+
+    def lookup(self, values: Mapping[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Statistiques d'une combinaison (colonnes absentes = toutes valeurs)
+
+        Returns:
+            Statistiques, ou None si une valeur est inconnue ou sans mesure
+        """
+        row = 0
+        for col, positions, stride in zip(self.categorical_columns, self.index, self.strides):
+            value = values.get(col)
+            key = WILDCARD if value in (None, '', WILDCARD) else normalize(value)
+            position = positions.get(key)
+            if position is None:
+                return None
+            row += position * stride
+
+        # Une seule lecture de la ligne, convertie en flottants Python
+        cell = self.table[row].tolist()
+        count = int(cell[0])
+        if count == 0:
+            return None
+
+        per_metric = 1 + len(self.quantiles)
+        metrics = {}
+        for j, col in enumerate(self.numeric_columns):
+            base = 1 + j * per_metric
+            metrics[col] = {'mean': cell[base]}
+            for k, label in enumerate(self.quantile_labels):
+                metrics[col][label] = cell[base + 1 + k]
+        offset = 1 + len(self.numeric_columns) * per_metric
+        return {
+            'count': count,
+            'metrics': metrics,
+            'class_distribution': {
+                label: share for label, share in zip(self.classes, cell[offset:])
+            }
+        }
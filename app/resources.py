@@ -0,0 +1,67 @@
+"""
+Ressources réellement disponibles pour le processus (CPU, mémoire)
+
+Seule implémentation de la détection des limites du conteneur: affinité du
+processus et quotas cgroup (v2 puis v1). Utilisée par gunicorn.conf.py
+(nombre de workers) et par app/thread_budget.py (threads d'inférence).
+"""
+import os
+from typing import Optional
+
+
+def read_sys_file(path: str) -> Optional[str]:
+    """Lire un fichier du système, None s'il n'existe pas"""
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit() -> Optional[float]:
+    """Limite CPU imposée par le cgroup (v2 puis v1), None si illimitée"""
+    cpu_max = read_sys_file('/sys/fs/cgroup/cpu.max')
+    if cpu_max:
+        quota, _, period = cpu_max.partition(' ')
+        if quota != 'max' and period:
+            return int(quota) / int(period)
+        return None
+
+    quota = read_sys_file('/sys/fs/cgroup/cpu/cpu.cfs_quota_us')
+    period = read_sys_file('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+
+def available_cpus() -> int:
+    """Nombre de CPU réellement utilisables: affinité bornée par le quota cgroup"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, max(1, int(limit)))
+    return max(1, cpus)
+
+
+def available_memory_mb() -> float:
+    """Mémoire disponible (limite cgroup si présente, sinon mémoire physique)"""
+    physical = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+
+    limit = read_sys_file('/sys/fs/cgroup/memory.max')
+    if limit is None:
+        limit = read_sys_file('/sys/fs/cgroup/memory/memory.limit_in_bytes')
+    if limit and limit != 'max' and int(limit) < physical:
+        physical = int(limit)
+    return physical / (1024 * 1024)
+
+
+def resident_memory_mb() -> Optional[float]:
+    """Mémoire résidente du processus (/proc/self/statm), None si inconnue"""
+    statm = read_sys_file('/proc/self/statm')
+    if not statm:
+        return None
+    return int(statm.split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
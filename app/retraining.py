@@ -0,0 +1,335 @@
+"""
+Réentraînement incrémental de la forêt (warm_start) et artefacts versionnés
+
+Au lieu de réentraîner toute la forêt, chaque incrément ajoute des arbres
+ajustés sur les nouvelles mesures étiquetées (warm_start de sklearn: les
+arbres existants ne sont pas recalculés) et peut retirer les plus anciens.
+Le résultat est validé sur une partie réservée des nouvelles données puis
+publié dans un dossier versionné:
+
+    MODEL_ARTIFACT_DIR/
+        LATEST                      nom de la version servie
+        checkpoint.json             fichiers intégrés ou rejetés
+        history.jsonl               un enregistrement par incrément
+        20260101T120000-3f2a9c1b/   model.pkl, scaler.pkl, metadata.json
+
+Le service charge la version pointée par LATEST au démarrage (voir
+PredictionService._load_model_and_scaler): un redémarrage gracieux des
+workers suffit pour la servir.
+"""
+import os
+import json
+import time
+import glob
+import shutil
+import hashlib
+import logging
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import joblib
+import numpy as np
+
+from app.dataset import CATEGORICAL_COLUMNS, CLASS_BY_LABEL, NUMERIC_COLUMNS, TARGET_COLUMN
+
+logger = logging.getLogger(__name__)
+
+LATEST_FILE = 'LATEST'
+CHECKPOINT_FILE = 'checkpoint.json'
+HISTORY_FILE = 'history.jsonl'
+DATA_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+
+
+def latest_artifact(artifact_dir: str) -> Optional[str]:
+    """Dossier de la version publiée la plus récente (None si aucune)"""
+    try:
+        with open(os.path.join(artifact_dir, LATEST_FILE)) as f:
+            name = f.read().strip()
+    except OSError:
+        return None
+    path = os.path.join(artifact_dir, name)
+    return path if name and os.path.isdir(path) else None
+
+
+def encode_frame(df, scaler) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Encoder des mesures étiquetées comme le fait le service
+
+    Returns:
+        Tuple (X (n, 8) float32 catégories puis numériques scalées, y int)
+    """
+    from app.services import PredictionService
+
+    missing = [col for col in CATEGORICAL_COLUMNS + NUMERIC_COLUMNS + [TARGET_COLUMN]
+               if col not in df.columns]
+    if missing:
+        raise ValueError(f"Colonnes manquantes: {', '.join(missing)}")
+    df = df.dropna(subset=CATEGORICAL_COLUMNS + NUMERIC_COLUMNS + [TARGET_COLUMN])
+
+    categorical = np.array(
+        [[PredictionService._encode_category(v) for v in row]
+         for row in df[CATEGORICAL_COLUMNS].itertuples(index=False)],
+        dtype='float32'
+    ).reshape(len(df), len(CATEGORICAL_COLUMNS))
+    numeric = scaler.transform(df[NUMERIC_COLUMNS].to_numpy(dtype='float64'))
+    X = np.hstack([categorical, numeric]).astype('float32')
+    return X, _encode_labels(df[TARGET_COLUMN])
+
+
+def _encode_labels(labels) -> np.ndarray:
+    """Classes entières à partir des libellés (Bonne/Moyenne/Mauvaise) ou codes"""
+    encoded = []
+    for label in labels:
+        key = str(label).strip().casefold()
+        if key in CLASS_BY_LABEL:
+            encoded.append(CLASS_BY_LABEL[key])
+        else:
+            try:
+                encoded.append(int(float(key)))
+            except ValueError:
+                raise ValueError(f"Classe inconnue: {label}")
+    return np.array(encoded, dtype='int64')
+
+
+def _fingerprint(path: str) -> str:
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}:{stat.st_size}:{int(stat.st_mtime)}"
+
+
+def new_data_files(data_dir: str, checkpoint: Dict[str, Any]) -> List[str]:
+    """Fichiers de mesures ni intégrés ni rejetés (nouveaux ou modifiés)"""
+    seen = set(checkpoint.get('files', [])) | set(checkpoint.get('rejected', []))
+    files = sorted(
+        path for path in glob.glob(os.path.join(data_dir, '*'))
+        if path.lower().endswith(DATA_EXTENSIONS)
+    )
+    return [path for path in files if _fingerprint(path) not in seen]
+
+
+def load_checkpoint(artifact_dir: str) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(artifact_dir, CHECKPOINT_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'files': [], 'rejected': []}
+
+
+def _read_data(paths: Sequence[str]):
+    """Lire les fichiers via le cache colonnes (pas de réanalyse Excel)"""
+    import pandas as pd
+    from app.dataset import load_dataset
+    frames = [load_dataset(path, mmap=False) for path in paths]
+    return pd.concat(frames, ignore_index=True)
+
+
+def encode_files(paths: Sequence[str], scaler, classes) -> Tuple[
+        np.ndarray, np.ndarray, List[str], Dict[str, str]]:
+    """
+    Lire et encoder chaque fichier séparément, en écartant les fichiers invalides
+
+    Un fichier illisible, sans ligne exploitable ou avec une classe inconnue
+    du modèle est écarté sans empêcher l'intégration des autres.
+
+    Returns:
+        Tuple (X, y des fichiers retenus, fichiers retenus,
+               {fichier écarté: raison})
+    """
+    known = set(np.asarray(classes).tolist())
+    parts, accepted, invalid = [], [], {}
+    for path in paths:
+        try:
+            X, y = encode_frame(_read_data([path]), scaler)
+            if not len(y):
+                raise ValueError("Aucune ligne complète")
+            unknown = set(np.unique(y).tolist()) - known
+            if unknown:
+                raise ValueError(f"Classes inconnues du modèle: {sorted(unknown)}")
+        except Exception as e:
+            logger.warning(f"Fichier écarté {os.path.basename(path)}: {e}")
+            invalid[path] = str(e)
+            continue
+        parts.append((X, y))
+        accepted.append(path)
+
+    if not parts:
+        return np.empty((0, 0), dtype='float32'), np.empty(0, dtype='int64'), [], invalid
+    return (np.vstack([X for X, _ in parts]), np.concatenate([y for _, y in parts]),
+            accepted, invalid)
+
+
+def grow_forest(model, X: np.ndarray, y: np.ndarray, n_new_trees: int,
+                max_trees: Optional[int] = None, n_jobs: int = 1):
+    """
+    Ajouter n_new_trees arbres ajustés sur (X, y), puis retirer les plus anciens
+
+    Les arbres existants sont conservés tels quels (warm_start). Les nouvelles
+    données doivent contenir exactement les classes du modèle: sklearn recalcule
+    classes_ à chaque fit et des arbres sans une classe, ou avec une classe de
+    plus, seraient incompatibles.
+    """
+    known = set(model.classes_.tolist())
+    present = set(np.unique(y).tolist())
+    unknown = present - known
+    if unknown:
+        raise ValueError(f"Classes inconnues du modèle: {sorted(unknown)}")
+    missing = known - present
+    if missing:
+        raise ValueError(f"Classes absentes des nouvelles données: {sorted(missing)}")
+
+    model.set_params(warm_start=True, n_jobs=n_jobs,
+                     n_estimators=len(model.estimators_) + int(n_new_trees))
+    model.fit(X, y)
+    if max_trees is not None and len(model.estimators_) > max_trees:
+        model.estimators_ = model.estimators_[-max_trees:]
+        model.n_estimators = max_trees
+    return model
+
+
+def evaluate(model, X: np.ndarray, y: np.ndarray) -> Dict[str, float]:
+    """Exactitude et log-loss sur un jeu réservé"""
+    from sklearn.metrics import accuracy_score, log_loss
+    proba = model.predict_proba(X)
+    return {
+        'accuracy': float(accuracy_score(y, model.classes_[proba.argmax(axis=1)])),
+        'log_loss': float(log_loss(y, proba, labels=model.classes_))
+    }
+
+
+def publish_artifact(artifact_dir: str, model, scaler_path: str,
+                     metadata: Dict[str, Any]) -> str:
+    """Écrire une nouvelle version puis basculer LATEST (renommage atomique)"""
+    os.makedirs(artifact_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.staging-', dir=artifact_dir)
+    model_path = os.path.join(staging, 'model.pkl')
+    joblib.dump(model, model_path)
+    shutil.copyfile(scaler_path, os.path.join(staging, 'scaler.pkl'))
+
+    digest = hashlib.sha256()
+    for name in ('model.pkl', 'scaler.pkl'):
+        with open(os.path.join(staging, name), 'rb') as f:
+            digest.update(f.read())
+    name = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{digest.hexdigest()[:8]}"
+    metadata = dict(metadata, version=name)
+    with open(os.path.join(staging, 'metadata.json'), 'w') as f:
+        json.dump(metadata, f, indent=2, ensure_ascii=False)
+
+    final = os.path.join(artifact_dir, name)
+    os.rename(staging, final)
+    _atomic_write(os.path.join(artifact_dir, LATEST_FILE), name + '\n')
+    return final
+
+
+def _atomic_write(path: str, content: str):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'w') as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+def run_increment(data_dir: str, artifact_dir: str, base_model_path: str,
+                  base_scaler_path: str, n_new_trees: int = 20,
+                  max_trees: Optional[int] = None, holdout: float = 0.2,
+                  max_regression: float = 0.02, n_jobs: int = 1,
+                  random_state: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Exécuter un incrément: nouvelles données -> arbres ajoutés -> validation -> publication
+
+    Args:
+        data_dir: Dossier des fichiers de mesures étiquetées (CSV/Excel)
+        artifact_dir: Dossier des versions publiées
+        base_model_path: Modèle de départ si aucune version n'est publiée
+        base_scaler_path: Scaler de départ (recopié dans chaque version)
+        n_new_trees: Arbres ajoutés par incrément
+        max_trees: Taille maximale de la forêt (les plus anciens sont retirés)
+        holdout: Part des nouvelles données réservée à la validation
+        max_regression: Baisse d'exactitude tolérée par rapport au modèle courant
+        n_jobs: Processus sklearn (1 par défaut: ne pas concurrencer le service)
+        random_state: Graine du découpage et des nouveaux arbres (par défaut,
+            le découpage est dérivé des fichiers: un lot rejeté le reste)
+
+    Les fichiers illisibles ou avec une classe inconnue sont notés rejetés
+    au point de contrôle (clé invalid_files du rapport) sans interrompre
+    l'incrément: --loop ne s'arrête pas sur un fichier défectueux.
+
+    Returns:
+        Rapport de l'incrément (status: published, rejected ou no_data)
+    """
+    from sklearn.model_selection import train_test_split
+
+    checkpoint = load_checkpoint(artifact_dir)
+    files = new_data_files(data_dir, checkpoint)
+    if not files:
+        return {'status': 'no_data'}
+
+    current = latest_artifact(artifact_dir)
+    model_path = os.path.join(current, 'model.pkl') if current else base_model_path
+    scaler_path = os.path.join(current, 'scaler.pkl') if current else base_scaler_path
+    model = joblib.load(model_path)
+    scaler = joblib.load(scaler_path)
+
+    X, y, files, invalid = encode_files(files, scaler, model.classes_)
+    if invalid:
+        checkpoint['rejected'] = (checkpoint.get('rejected', [])
+                                  + [_fingerprint(p) for p in invalid])
+        invalid = {os.path.basename(path): reason for path, reason in invalid.items()}
+    if not files:
+        report = {'status': 'no_data', 'invalid_files': invalid}
+        _save_increment(artifact_dir, checkpoint, report)
+        return report
+
+    fingerprints = [_fingerprint(p) for p in files]
+    if random_state is None:
+        split_seed = int.from_bytes(
+            hashlib.blake2b('\n'.join(fingerprints).encode('utf-8'), digest_size=4).digest(),
+            'little'
+        )
+    else:
+        split_seed = random_state
+    X_train, X_holdout, y_train, y_holdout = train_test_split(
+        X, y, test_size=holdout, random_state=split_seed, stratify=y
+    )
+    before = evaluate(model, X_holdout, y_holdout)
+
+    start = time.perf_counter()
+    n_before = len(model.estimators_)
+    if random_state is not None:
+        model.set_params(random_state=random_state)
+    grow_forest(model, X_train, y_train, n_new_trees, max_trees=max_trees, n_jobs=n_jobs)
+    training_seconds = time.perf_counter() - start
+    after = evaluate(model, X_holdout, y_holdout)
+
+    report = {
+        'files': [os.path.basename(path) for path in files],
+        'rows': int(len(y)),
+        'trees_before': n_before,
+        'trees_after': len(model.estimators_),
+        'training_seconds': round(training_seconds, 3),
+        'holdout_before': before,
+        'holdout_after': after,
+        'invalid_files': invalid,
+        'parent': os.path.basename(current) if current else None,
+        'created_at': datetime.now().isoformat(timespec='seconds')
+    }
+
+    if after['accuracy'] < before['accuracy'] - max_regression:
+        # Lot rejeté noté: sinon --loop le retenterait à chaque cycle jusqu'à
+        # passer la validation par hasard (il l'est de nouveau s'il est modifié)
+        report['status'] = 'rejected'
+        checkpoint['rejected'] = checkpoint.get('rejected', []) + fingerprints
+    else:
+        report['status'] = 'published'
+        report['artifact'] = publish_artifact(artifact_dir, model, scaler_path, report)
+        # Les fichiers ne sont marqués intégrés qu'une fois la version publiée
+        checkpoint['files'] = checkpoint.get('files', []) + fingerprints
+
+    _save_increment(artifact_dir, checkpoint, report)
+    return report
+
+
+def _save_increment(artifact_dir: str, checkpoint: Dict[str, Any], report: Dict[str, Any]):
+    """Écrire le point de contrôle et ajouter le rapport à l'historique"""
+    os.makedirs(artifact_dir, exist_ok=True)
+    _atomic_write(os.path.join(artifact_dir, CHECKPOINT_FILE), json.dumps(checkpoint))
+    with open(os.path.join(artifact_dir, HISTORY_FILE), 'a') as f:
+        f.write(json.dumps(report, ensure_ascii=False) + '\n')
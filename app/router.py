@@ -0,0 +1,328 @@
+"""
+Routage des prédictions entre plusieurs versions de modèle
+
+Le routeur garde plusieurs versions nommées chargées en même temps (réentraînements
+régionaux, tests A/B). Une requête est routée, par ordre de priorité:
+
+- par un en-tête explicite (X-Model-Version par défaut);
+- par un hachage stable de l'identifiant client (X-Client-Id): un même client
+  tombe toujours sur la même version tant que les poids ne changent pas;
+- sinon par tirage pondéré.
+
+Les arbres identiques d'une version à l'autre (une forêt étendue par warm_start
+conserve ses premiers arbres) ne sont gardés qu'une fois: leurs tableaux sont
+partagés en lecture seule. La mémoire est comptée par version et les versions
+les moins récemment utilisées sont déchargées au-delà du plafond.
+"""
+import os
+import time
+import zlib
+import pickle
+import random
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+import joblib
+import numpy as np
+
+from app.ann import load_model_file
+from app.lifecycle import register_after_fork
+from app.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ModelVersion:
+    """Version de modèle chargée: modèle, scaler et empreinte mémoire"""
+
+    def __init__(self, name: str, model, scaler, version: str,
+                 tree_digests: List[bytes], pinned: bool = False):
+        self.name = name
+        self.model = model
+        self.scaler = scaler
+        self.version = version
+        self.tree_digests = tree_digests
+        self.pinned = pinned
+        self.loaded_at = time.time()
+        self.last_used = time.monotonic()
+        self.requests = 0
+
+
+class ModelRouter:
+    """Versions de modèle chargées, sélection par requête et éviction LRU"""
+
+    def __init__(self, specs: Mapping[str, Mapping[str, Any]], default: str,
+                 default_weight: float = 1.0, memory_cap_bytes: Optional[int] = None,
+                 header: str = 'X-Model-Version', client_header: str = 'X-Client-Id',
+                 prepare_model: Optional[Callable[[Any], Any]] = None):
+        """
+        Args:
+            specs: Versions additionnelles {nom: {"model": chemin, "scaler": chemin
+                   (optionnel, scaler par défaut sinon), "weight": poids}}
+            default: Nom de la version par défaut (enregistrée via register)
+            default_weight: Poids de la version par défaut dans le tirage
+            memory_cap_bytes: Plafond mémoire des arbres chargés (None: illimité)
+            header: En-tête forçant une version
+            client_header: En-tête identifiant le client (routage collant)
+            prepare_model: Ajustement appliqué à chaque modèle chargé
+                           (budget de threads du service)
+        """
+        self.specs = {name: dict(spec) for name, spec in specs.items()}
+        self.default = default
+        self.memory_cap_bytes = memory_cap_bytes
+        self.header = header
+        self.client_header = client_header
+        self.prepare_model = prepare_model
+
+        self.weights = [(default, float(default_weight))] + [
+            (name, float(spec.get('weight', 0.0))) for name, spec in self.specs.items()
+        ]
+        self.weights = [(name, weight) for name, weight in self.weights if weight > 0]
+        self.total_weight = sum(weight for _, weight in self.weights)
+
+        self._lock = threading.Lock()
+        # Un verrou de chargement par version: les requêtes qui manquent la
+        # même version attendent un seul chargement, les autres versions non
+        self._load_locks: Dict[str, threading.Lock] = {}
+        register_after_fork(self._reset_lock)
+        # Ordre LRU: la version la plus récemment chargée/utilisée en dernier
+        self._loaded: 'OrderedDict[str, ModelVersion]' = OrderedDict()
+        # Empreinte d'un arbre -> [estimateur partagé, nombre de références, octets]
+        self._trees: Dict[bytes, list] = {}
+        self._default_scaler = None
+
+    def _reset_lock(self):
+        """Nouveaux verrous dans le worker (ceux du master peuvent être tenus)"""
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    # -- Sélection -------------------------------------------------------
+
+    @property
+    def names(self) -> List[str]:
+        """Toutes les versions configurées (chargées ou non)"""
+        return [self.default] + [name for name in self.specs if name != self.default]
+
+    def route(self, headers: Mapping[str, str]) -> str:
+        """
+        Choisir la version à utiliser pour une requête
+
+        Raises:
+            ValueError: Version demandée explicitement mais inconnue
+        """
+        requested = headers.get(self.header)
+        if requested:
+            if requested not in self.names:
+                raise ValueError(f"Version de modèle inconnue: {requested}")
+            return requested
+
+        if len(self.weights) <= 1:
+            return self.weights[0][0] if self.weights else self.default
+
+        client_id = headers.get(self.client_header)
+        if client_id:
+            # Hachage stable entre processus (comme l'encodage des catégories)
+            point = zlib.crc32(client_id.encode('utf-8')) / 2 ** 32
+        else:
+            point = random.random()
+        return self._pick(point * self.total_weight)
+
+    def _pick(self, point: float) -> str:
+        cumulative = 0.0
+        for name, weight in self.weights:
+            cumulative += weight
+            if point < cumulative:
+                return name
+        return self.weights[-1][0]
+
+    # -- Chargement et partage ---------------------------------------------
+
+    def register(self, name: str, model, scaler, version: str, pinned: bool = False):
+        """Ajouter une version déjà chargée (la version par défaut du service)"""
+        digests = _model_digests(model)
+        with self._lock:
+            if name == self.default:
+                self._default_scaler = scaler
+            return self._add(name, model, scaler, version, digests, pinned)
+
+    def get(self, name: str) -> ModelVersion:
+        """Version chargée (chargée à la demande si elle a été évincée)"""
+        # Ordre LRU et compteurs modifiés sous le verrou: _evict parcourt
+        # et vide _loaded depuis d'autres threads
+        with self._lock:
+            entry = self._loaded.get(name)
+            if entry is not None:
+                return self._touch(entry)
+            if name not in self.specs:
+                raise ValueError(f"Version de modèle inconnue: {name}")
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # Lecture du fichier et empreintes hors du verrou global: le
+        # routage vers les versions déjà chargées continue pendant ce temps
+        with load_lock:
+            with self._lock:
+                entry = self._loaded.get(name)
+                if entry is not None:
+                    # Chargée par la requête qui tenait load_lock
+                    return self._touch(entry)
+            start = time.perf_counter()
+            model, scaler, version, digests = self._load(name)
+            with self._lock:
+                entry = self._add(name, model, scaler, version, digests, pinned=False)
+                self._evict(keep=name)
+                metrics.increment('model_loads')
+                logger.info(
+                    f"Version de modèle '{name}' chargée en "
+                    f"{(time.perf_counter() - start) * 1000:.1f} ms"
+                )
+                return self._touch(entry)
+
+    def _touch(self, entry: ModelVersion) -> ModelVersion:
+        """Compter une requête et placer la version en fin d'ordre LRU (verrou tenu)"""
+        entry.last_used = time.monotonic()
+        entry.requests += 1
+        self._loaded.move_to_end(entry.name)
+        return entry
+
+    def _load(self, name: str):
+        """Charger une version depuis le disque, sans toucher à l'état partagé"""
+        spec = self.specs.get(name)
+        if spec is None:
+            raise ValueError(f"Version de modèle inconnue: {name}")
+        model_path = spec['model']
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Modèle non trouvé: {model_path}")
+        scaler_path = spec.get('scaler')
+
+        model = load_model_file(model_path)
+        if self.prepare_model is not None:
+            model = self.prepare_model(model)
+        scaler = joblib.load(scaler_path) if scaler_path else self._default_scaler
+        if scaler is None:
+            raise RuntimeError(f"Aucun scaler disponible pour la version {name}")
+        version = _file_digest(model_path, *([scaler_path] if scaler_path else []))
+        return model, scaler, version, _model_digests(model)
+
+    def _add(self, name, model, scaler, version, digests, pinned) -> ModelVersion:
+        """Enregistrer une version en partageant ses arbres (verrou tenu)"""
+        previous = self._loaded.pop(name, None)
+        if previous is not None:
+            self._release(previous)
+        entry = ModelVersion(name, model, scaler, version,
+                             self._intern_trees(model, digests), pinned=pinned)
+        self._loaded[name] = entry
+        return entry
+
+    def _intern_trees(self, model, digests) -> List[bytes]:
+        """Remplacer chaque arbre déjà connu par l'instance partagée (verrou tenu)"""
+        estimators = getattr(model, 'estimators_', None)
+        if estimators is None:
+            # Modèle sans arbres: compté comme un bloc unique
+            (digest, nbytes), = digests
+            self._retain(digest, model, nbytes)
+            return [digest]
+
+        for i, (estimator, (digest, nbytes)) in enumerate(zip(estimators, digests)):
+            shared = self._retain(digest, estimator, nbytes)
+            if shared is not estimator:
+                estimators[i] = shared
+        return [digest for digest, _ in digests]
+
+    def _retain(self, digest: bytes, obj, nbytes: int):
+        slot = self._trees.get(digest)
+        if slot is None:
+            slot = self._trees[digest] = [obj, 0, nbytes]
+        slot[1] += 1
+        return slot[0]
+
+    def _release(self, entry: ModelVersion):
+        for digest in entry.tree_digests:
+            slot = self._trees.get(digest)
+            if slot is None:
+                continue
+            slot[1] -= 1
+            if slot[1] <= 0:
+                del self._trees[digest]
+
+    def _evict(self, keep: str):
+        """Décharger les versions les moins récemment utilisées au-delà du plafond"""
+        if self.memory_cap_bytes is None:
+            return
+        for name in list(self._loaded):
+            if self.memory_bytes() <= self.memory_cap_bytes:
+                return
+            entry = self._loaded[name]
+            if entry.pinned or name == keep:
+                continue
+            del self._loaded[name]
+            self._release(entry)
+            metrics.increment('model_evictions')
+            logger.info(f"Version de modèle '{name}' évincée (plafond mémoire)")
+
+    # -- Mémoire et statistiques -------------------------------------------
+
+    def memory_bytes(self) -> int:
+        """Mémoire totale des arbres chargés, chaque arbre partagé compté une fois"""
+        return sum(slot[2] for slot in self._trees.values())
+
+    def stats(self) -> Dict[str, Any]:
+        """Versions configurées, chargées et leur empreinte mémoire"""
+        with self._lock:
+            loaded = {}
+            for name, entry in self._loaded.items():
+                total = shared = 0
+                for digest in entry.tree_digests:
+                    _, refs, nbytes = self._trees[digest]
+                    total += nbytes
+                    if refs > 1:
+                        shared += nbytes
+                loaded[name] = {
+                    'version': entry.version,
+                    'pinned': entry.pinned,
+                    'requests': entry.requests,
+                    'idle_seconds': round(time.monotonic() - entry.last_used, 3),
+                    'memory_bytes': total,
+                    'shared_bytes': shared,
+                    'exclusive_bytes': total - shared
+                }
+            return {
+                'default': self.default,
+                'weights': {name: weight / self.total_weight for name, weight in self.weights},
+                'configured': self.names,
+                'loaded': loaded,
+                'memory_bytes': self.memory_bytes(),
+                'memory_cap_bytes': self.memory_cap_bytes
+            }
+
+
+def _model_digests(model):
+    """Empreinte et taille de chaque arbre (ou du modèle entier s'il n'en a pas)"""
+    estimators = getattr(model, 'estimators_', None)
+    if estimators is None:
+        blob = pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)
+        return [(hashlib.blake2b(blob, digest_size=16).digest(), len(blob))]
+    return [_tree_digest(estimator) for estimator in estimators]
+
+
+def _tree_digest(estimator):
+    """Empreinte du contenu d'un arbre sklearn et taille de ses tableaux"""
+    state = estimator.tree_.__getstate__()
+    nodes, values = state['nodes'], state['values']
+    digest = hashlib.blake2b(digest_size=16)
+    # Champ par champ: les octets de bourrage du tableau structuré sont indéfinis
+    for field in nodes.dtype.names:
+        digest.update(np.ascontiguousarray(nodes[field]).tobytes())
+    digest.update(np.ascontiguousarray(values).tobytes())
+    digest.update(str(estimator.get_params()).encode('utf-8'))
+    return digest.digest(), nodes.nbytes + values.nbytes
+
+
+def _file_digest(*paths: str) -> str:
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
@@ -1,8 +1,13 @@
 """
 Routes pour l'API de prédiction
 """
-from flask import Blueprint, request, jsonify, render_template
+import gzip
+from flask import Blueprint, request, jsonify, render_template, current_app
 from app.services import get_prediction_service
+from app.admission import admission_controlled
+from app.http_cache import conditional_response
+from app.compression import streaming_json_response
+from app.export import export_forest
 import logging
 import traceback
 
@@ -12,6 +17,7 @@ predict_bp = Blueprint('predict', __name__)
 
 
 @predict_bp.route('/predict', methods=['POST'])
+@admission_controlled
 def predict():
     """
     Endpoint POST pour effectuer une prédiction
@@ -39,6 +45,11 @@ def predict():
             "Mauvaise": ...
         }
     }
+    
+    Avec ?explain=true, le résultat contient aussi "explanation": probabilités
+    de base et contribution de chaque variable à chaque classe.
+    Avec ?context=true, "context" donne les statistiques de référence de la
+    combinaison Opérateur / Quartier / Type réseau (voir GET /reference).
     """
     try:
         # Vérifier que la requête contient du JSON
@@ -57,14 +68,17 @@ def predict():
                 'message': 'Le corps de la requête ne peut pas être vide'
             }), 400
         
-        # Effectuer la prédiction
+        # Effectuer la prédiction (version choisie par le routeur s'il existe)
         service = get_prediction_service()
-        result = service.predict(data)
+        model_name = service.route(request.headers)
+        result = service.predict(data, model_name=model_name, explain=_query_flag('explain'))
+        if _query_flag('context'):
+            result['context'] = service.reference_context(data)
         
         return jsonify({
             'success': True,
             'result': result
-        }), 200
+        }), 200, _model_headers(model_name)
     
     except ValueError as e:
         logger.error(f"Erreur de validation: {e}")
@@ -91,41 +105,462 @@ def predict():
         }), 500
 
 
+def _query_flag(name: str) -> bool:
+    """Option activée dans la query string (?explain=true, ?context=1...)"""
+    return request.args.get(name, '').lower() in ('1', 'true', 'yes')
+
+
+def _model_headers(model_name):
+    """En-têtes indiquant la version de modèle qui a répondu"""
+    if model_name is None:
+        return {}
+    return {'X-Model-Version': model_name, 'Vary': 'X-Model-Version, X-Client-Id'}
+
+
+@predict_bp.route('/predict/batch', methods=['POST'])
+@admission_controlled
+def predict_batch():
+    """
+    Endpoint POST pour prédire un lot d'entrées en un seul appel au modèle
+    
+    Requête JSON: liste d'entrées (format de /predict), ou {"records": [...]}
+    
+    Réponse JSON (produite en flux, compressée gzip/zstd selon Accept-Encoding):
+    {
+        "success": true,
+        "count": n,
+        "results": [ {...résultat /predict...}, ... ]
+    }
+    """
+    try:
+        if not request.is_json:
+            return jsonify({
+                'error': 'Content-Type doit être application/json',
+                'message': 'Veuillez envoyer une requête JSON'
+            }), 400
+        
+        data = request.get_json()
+        records = data.get('records') if isinstance(data, dict) else data
+        
+        if not isinstance(records, list) or not records:
+            return jsonify({
+                'error': 'Données vides',
+                'message': 'Une liste non vide d\'entrées est attendue'
+            }), 400
+        
+        max_records = current_app.config.get('BATCH_MAX_RECORDS', 10000)
+        if len(records) > max_records:
+            return jsonify({
+                'error': 'Lot trop volumineux',
+                'message': f"Au plus {max_records} entrées par lot"
+            }), 400
+        
+        service = get_prediction_service()
+        model_name = service.route(request.headers)
+        results = service.predict_batch(records, model_name=model_name,
+                                        explain=_query_flag('explain'))
+        if _query_flag('context'):
+            for result, record in zip(results, records):
+                result['context'] = service.reference_context(record)
+        
+        dumps = current_app.json.dumps
+        head = f'{{"success": true, "count": {len(results)}, "results": ['.encode('utf-8')
+        response = streaming_json_response(
+            head=head,
+            items=results,
+            tail=b']}',
+            estimated_size=len(dumps(results[0])) * len(results),
+            dumps=dumps
+        )
+        response.headers.extend(_model_headers(model_name))
+        return response
+    
+    except ValueError as e:
+        logger.error(f"Erreur de validation: {e}")
+        return jsonify({
+            'error': 'Erreur de validation',
+            'message': str(e),
+            'details': traceback.format_exc()
+        }), 400
+    
+    except RuntimeError as e:
+        logger.error(f"Erreur runtime: {e}")
+        return jsonify({
+            'error': 'Erreur du serveur',
+            'message': str(e),
+            'details': traceback.format_exc()
+        }), 500
+    
+    except Exception as e:
+        logger.error(f"Erreur non gérée: {e}")
+        return jsonify({
+            'error': 'Erreur interne du serveur',
+            'message': str(e),
+            'details': traceback.format_exc()
+        }), 500
+
+
+@predict_bp.route('/predict/sweep', methods=['POST'])
+@admission_controlled
+def predict_sweep():
+    """
+    Endpoint POST "what-if": probabilités quand une ou deux métriques varient
+    
+    Requête JSON:
+    {
+        "base": {...entrée /predict...},
+        "sweep": [
+            {"feature": "Latence (ms)", "start": 5, "stop": 200, "steps": 40},
+            {"feature": "Download (Mbps)", "start": 1, "stop": 500, "steps": 50}
+        ]
+    }
+    
+    Réponse JSON: valeurs des axes et, par classe, une courbe (1 axe) ou une
+    surface (2 axes, [i][j] pour le i-ème pas du premier axe et le j-ème du
+    second), plus la classe prédite en chaque point. La grille est évaluée
+    en un seul appel au modèle, au plus SWEEP_MAX_POINTS points.
+    """
+    try:
+        if not request.is_json:
+            return jsonify({
+                'error': 'Content-Type doit être application/json',
+                'message': 'Veuillez envoyer une requête JSON'
+            }), 400
+        
+        data = request.get_json()
+        if not isinstance(data, dict) or 'base' not in data or 'sweep' not in data:
+            return jsonify({
+                'error': 'Données incomplètes',
+                'message': 'Les champs "base" et "sweep" sont attendus'
+            }), 400
+        
+        axes = data['sweep']
+        if isinstance(axes, dict):
+            axes = [axes]
+        service = get_prediction_service()
+        model_name = service.route(request.headers)
+        sweep = service.sweep(data['base'], axes, model_name=model_name,
+                              max_points=current_app.config.get('SWEEP_MAX_POINTS'))
+        if model_name is not None:
+            sweep['model_version'] = model_name
+        
+        return jsonify({
+            'success': True,
+            'sweep': sweep
+        }), 200, _model_headers(model_name)
+    
+    except ValueError as e:
+        logger.error(f"Erreur de validation: {e}")
+        return jsonify({
+            'error': 'Erreur de validation',
+            'message': str(e)
+        }), 400
+    
+    except Exception as e:
+        logger.error(f"Erreur non gérée: {e}")
+        return jsonify({
+            'error': 'Erreur interne du serveur',
+            'message': str(e)
+        }), 500
+
+
+@predict_bp.route('/predict/best-config', methods=['POST'])
+@admission_controlled
+def predict_best_config():
+    """
+    Endpoint POST: combinaisons catégoriques les plus favorables pour un site
+
+    Requête JSON:
+    {
+        "base": {...métriques mesurées, "Quartier": "Centre"...},
+        "vary": ["Type réseau", "Opérateur"],          (optionnel)
+        "candidates": {"Opérateur": ["Orange", "Vodafone"]},  (optionnel)
+        "target": "Bonne",                              (optionnel)
+        "top_k": 5                                      (optionnel)
+    }
+
+    Réponse JSON: les top_k combinaisons classées par probabilité de la
+    classe cible. Toutes les combinaisons sont évaluées en un seul appel au
+    modèle; le classement est mis en cache par version de modèle et par case
+    de métriques (BEST_CONFIG_BUCKETS cases sur la plage d'entraînement).
+    """
+    try:
+        if not request.is_json:
+            return jsonify({
+                'error': 'Content-Type doit être application/json',
+                'message': 'Veuillez envoyer une requête JSON'
+            }), 400
+
+        data = request.get_json()
+        if not isinstance(data, dict) or 'base' not in data:
+            return jsonify({
+                'error': 'Données incomplètes',
+                'message': 'Le champ "base" est attendu'
+            }), 400
+
+        service = get_prediction_service()
+        model_name = service.route(request.headers)
+        result = service.best_configurations(
+            data['base'],
+            vary=data.get('vary'),
+            candidates=data.get('candidates'),
+            target=data.get('target', 'Bonne'),
+            top_k=data.get('top_k', 5),
+            model_name=model_name
+        )
+        if model_name is not None:
+            result['model_version'] = model_name
+
+        return jsonify({
+            'success': True,
+            'best_config': result
+        }), 200, _model_headers(model_name)
+
+    except (ValueError, TypeError) as e:
+        logger.error(f"Erreur de validation: {e}")
+        return jsonify({
+            'error': 'Erreur de validation',
+            'message': str(e)
+        }), 400
+
+    except Exception as e:
+        logger.error(f"Erreur non gérée: {e}")
+        return jsonify({
+            'error': 'Erreur interne du serveur',
+            'message': str(e)
+        }), 500
+
+
+# Schéma sérialisé par version de modèle (le schéma ne change qu'avec le modèle)
+_schema_cache = {}
+
+
+def _build_schema(service) -> dict:
+    """Construire le schéma de l'API à partir du service"""
+    return {
+        'numeric_fields': {
+            col: 'float' for col in service.numeric_columns
+        },
+        'categorical_fields': {
+            col: 'string' for col in service.categorical_columns
+        },
+        'output_classes': list(service.target_mapping.values()),
+        'example_request': {
+            "Opérateur": "Orange",
+            "Quartier": "Centre",
+            "Type réseau": "5G",
+            "Download (Mbps)": 100,
+            "Upload (Mbps)": 50,
+            "Latence (ms)": 10,
+            "Jitter (ms)": 2,
+            "Loss (%)": 0.1
+        }
+    }
+
+
 @predict_bp.route('/predict/schema', methods=['GET'])
 def predict_schema():
     """
     Endpoint GET pour obtenir le schéma de l'API
+    
+    Le corps est sérialisé une seule fois et servi avec un ETag fort:
+    un client qui renvoie If-None-Match reçoit un 304 sans corps.
     """
     try:
         service = get_prediction_service()
         
-        schema = {
-            'numeric_fields': {
-                col: 'float' for col in service.numeric_columns
-            },
-            'categorical_fields': {
-                col: 'string' for col in service.categorical_columns
-            },
-            'output_classes': list(service.target_mapping.values()),
-            'example_request': {
-                "Opérateur": "Orange",
-                "Quartier": "Centre",
-                "Type réseau": "5G",
-                "Download (Mbps)": 100,
-                "Upload (Mbps)": 50,
-                "Latence (ms)": 10,
-                "Jitter (ms)": 2,
-                "Loss (%)": 0.1
+        body = _schema_cache.get(service.model_version)
+        if body is None:
+            body = current_app.json.dumps({
+                'success': True,
+                'schema': _build_schema(service)
+            }).encode('utf-8')
+            _schema_cache[service.model_version] = body
+        
+        return conditional_response(body, 'application/json')
+    
+    except Exception as e:
+        logger.error(f"Erreur lors de la récupération du schéma: {e}")
+        return jsonify({
+            'error': 'Erreur interne du serveur',
+            'message': str(e)
+        }), 500
+
+
+# Export du modèle par version: corps brut et variante gzip
+_export_cache = {}
+
+
+@predict_bp.route('/predict/model', methods=['GET'])
+def predict_model_export():
+    """
+    Endpoint GET exportant la forêt, le scaler et l'encodage des catégories
+    
+    Utilisé par l'interface web pour prédire directement dans le navigateur
+    (static/js/forest.js). Le document ne change qu'avec le modèle: il est
+    sérialisé une fois, servi en gzip si accepté et revalidé par ETag.
+    """
+    try:
+        service = get_prediction_service()
+        
+        cached = _export_cache.get(service.model_version)
+        if cached is None:
+            body = current_app.json.dumps(export_forest(service)).encode('utf-8')
+            cached = {
+                'identity': body,
+                'gzip': gzip.compress(body, mtime=0)
             }
-        }
+            _export_cache[service.model_version] = cached
+        
+        encoding = 'gzip' if request.accept_encodings.quality('gzip') > 0 else 'identity'
+        response = conditional_response(
+            cached[encoding],
+            'application/json',
+            etag=f"{service.model_version}-{encoding}"
+        )
+        if encoding == 'gzip':
+            response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+        return response
+    
+    except RuntimeError as e:
+        logger.error(f"Export du modèle impossible: {e}")
+        return jsonify({
+            'error': 'Export non disponible',
+            'message': str(e)
+        }), 501
+    
+    except Exception as e:
+        logger.error(f"Erreur lors de l'export du modèle: {e}")
+        return jsonify({
+            'error': 'Erreur interne du serveur',
+            'message': str(e)
+        }), 500
+
+
+@predict_bp.route('/stats/drift', methods=['GET'])
+def drift_stats():
+    """
+    Endpoint GET exposant les statistiques de dérive des entrées du worker
+    
+    Pour chaque variable numérique: quantiles approchés et nombre de valeurs
+    hors de la plage d'entraînement du scaler. Pour chaque variable
+    catégorique: fréquences et part de valeurs inconnues.
+    """
+    try:
+        service = get_prediction_service()
+        if service.drift is None:
+            return jsonify({
+                'error': 'Suivi de dérive désactivé',
+                'message': 'Activer DRIFT_MONITORING_ENABLED'
+            }), 404
         
         return jsonify({
             'success': True,
-            'schema': schema
+            'drift': service.drift.snapshot()
         }), 200
     
     except Exception as e:
-        logger.error(f"Erreur lors de la récupération du schéma: {e}")
+        logger.error(f"Erreur lors du calcul des statistiques de dérive: {e}")
+        return jsonify({
+            'error': 'Erreur interne du serveur',
+            'message': str(e)
+        }), 500
+
+
+@predict_bp.route('/stats/shadow', methods=['GET'])
+def shadow_stats():
+    """
+    Endpoint GET comparant le modèle shadow au modèle principal
+    
+    Taux d'accord sur la classe prédite, écarts de probabilités et latence
+    propre du modèle shadow (mesurée en arrière-plan).
+    """
+    try:
+        service = get_prediction_service()
+        if service.shadow is None:
+            return jsonify({
+                'error': 'Aucun modèle shadow',
+                'message': 'Configurer SHADOW_MODEL_PATH'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'shadow': service.shadow.stats()
+        }), 200
+    
+    except Exception as e:
+        logger.error(f"Erreur lors de la lecture des statistiques shadow: {e}")
+        return jsonify({
+            'error': 'Erreur interne du serveur',
+            'message': str(e)
+        }), 500
+
+
+@predict_bp.route('/reference', methods=['GET'])
+def reference_stats():
+    """
+    Endpoint GET des statistiques de référence d'une combinaison catégorique
+    
+    Paramètres (optionnels, absents = toutes valeurs): Opérateur, Quartier,
+    Type réseau. Exemple: /reference?Opérateur=Orange&Quartier=Centre
+    
+    Lecture directe dans la table mappée construite par build_reference_stats.py.
+    """
+    try:
+        service = get_prediction_service()
+        if service.reference is None:
+            return jsonify({
+                'error': 'Statistiques de référence non disponibles',
+                'message': 'Exécuter build_reference_stats.py'
+            }), 404
+        
+        query = {col: request.args.get(col) for col in service.reference.categorical_columns}
+        stats = service.reference.lookup(query)
+        if stats is None:
+            return jsonify({
+                'error': 'Aucune mesure de référence',
+                'message': 'Combinaison inconnue ou sans mesure',
+                'query': query
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'query': query,
+            'reference': stats
+        }), 200
+    
+    except Exception as e:
+        logger.error(f"Erreur lors de la lecture des statistiques de référence: {e}")
+        return jsonify({
+            'error': 'Erreur interne du serveur',
+            'message': str(e)
+        }), 500
+
+
+@predict_bp.route('/models', methods=['GET'])
+def models_stats():
+    """
+    Endpoint GET listant les versions de modèle configurées et chargées
+    
+    Pour chaque version chargée: empreinte mémoire des arbres, part partagée
+    avec les autres versions et nombre de requêtes servies par ce worker.
+    """
+    try:
+        service = get_prediction_service()
+        if service.router is None:
+            return jsonify({
+                'error': 'Routage des modèles désactivé',
+                'message': 'Configurer MODEL_VERSIONS'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'models': service.router.stats()
+        }), 200
+    
+    except Exception as e:
+        logger.error(f"Erreur lors de la lecture des versions de modèle: {e}")
         return jsonify({
             'error': 'Erreur interne du serveur',
             'message': str(e)
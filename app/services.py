@@ -2,32 +2,72 @@
 Service de prédiction pour le modèle de qualité réseau
 """
 import os
+import time
+import zlib
+import itertools
+import threading
+import hashlib
+import weakref
 import joblib
 import numpy as np
 import pandas as pd
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, List, Mapping, Optional, Sequence, Tuple
 import logging
 
+from app.best_config import ResultCache, bucketize
+from app.coalescing import SingleFlight
+from app.lifecycle import register_after_fork
+from app.metrics import metrics
+from app.resources import resident_memory_mb
+
 logger = logging.getLogger(__name__)
 
+# Paramètres issus de la configuration Flask (voir configure_prediction_service)
+_settings: Dict[str, Any] = {}
+
+# Entrée représentative utilisée pour le warmup du modèle
+WARMUP_SAMPLE = {
+    "Opérateur": "Orange",
+    "Quartier": "Centre",
+    "Type réseau": "5G",
+    "Download (Mbps)": 100,
+    "Upload (Mbps)": 50,
+    "Latence (ms)": 10,
+    "Jitter (ms)": 2,
+    "Loss (%)": 0.1
+}
+
 
 class PredictionService:
     """Service pour charger le modèle et effectuer les prédictions"""
     
     _instance = None
+    # Création et chargement: une seule fois par processus, même si les
+    # premières requêtes arrivent en même temps sur plusieurs threads
+    _init_lock = threading.Lock()
     
     def __new__(cls):
         """Pattern Singleton pour charger le modèle une seule fois"""
         if cls._instance is None:
-            cls._instance = super(PredictionService, cls).__new__(cls)
-            cls._instance._initialized = False
+            with cls._init_lock:
+                if cls._instance is None:
+                    instance = super(PredictionService, cls).__new__(cls)
+                    instance._initialized = False
+                    cls._instance = instance
         return cls._instance
     
     def __init__(self):
         """Initialiser le service et charger le modèle"""
         if self._initialized:
             return
-        
+        # Double vérification: les threads arrivés pendant le chargement
+        # attendent le verrou puis trouvent le service initialisé
+        with self._init_lock:
+            if not self._initialized:
+                self._initialize()
+    
+    def _initialize(self):
+        """Charger le modèle et créer les composants du service"""
         self.model = None
         self.scaler = None
         self.le_operateur = None
@@ -56,10 +96,95 @@ class PredictionService:
             2: "Mauvaise"
         }
         
+        # Valeurs catégoriques connues (suggestions de l'interface, export)
+        self.categorical_vocabulary = {
+            "Opérateur": ["Orange", "Vodafone", "Maroc Telecom"],
+            "Quartier": ["Centre", "Tahrir", "Souissi"],
+            "Type réseau": ["5G", "4G", "3G", "WiFi", "ADSL"]
+        }
+        
+        # Durées de chargement et de warmup (None tant que non effectués)
+        self.load_duration = None
+        self.warmup_duration = None
+        self.model_version = None
+        self.cache = None
+        self.drift = None
+        self.shadow = None
+        self.router = None
+        self.reference = None
+        self.prediction_log = None
+        self.backend = None
+        self.backend_report = None
+        self.thread_budget = None
+        # Mémoire retenue par le modèle et ses dérivés (None si non mesurable)
+        self.memory_footprint_mb = None
+        # Explications précalculées par modèle (défaut et versions routées)
+        self._explainers = weakref.WeakKeyDictionary()
+        # Tampons de prétraitement réutilisés, propres à chaque thread
+        self._scratch = threading.local()
+        # Classements de /predict/best-config par version et case d'entrée
+        self.best_config_cache = ResultCache(_settings.get('BEST_CONFIG_CACHE_SIZE', 1024))
+        
+        # Regrouper les prédictions identiques arrivant en même temps
+        self.singleflight = (
+            SingleFlight() if _settings.get('PREDICTION_COALESCING_ENABLED', True) else None
+        )
+        
+        # Mémoire résidente avant/après le chargement: dimensionnement des
+        # workers Gunicorn au préchargement (voir gunicorn.conf.py). Les
+        # bibliothèques des modèles sont importées avant la mesure: elles
+        # relèvent de la mémoire de base d'un worker (GUNICORN_WORKER_BASE_MB)
+        import sklearn.ensemble  # noqa: F401
+        import sklearn.preprocessing  # noqa: F401
+        resident_before = resident_memory_mb()
+        
         # Charger le modèle et le scaler
+        start = time.perf_counter()
         self._load_model_and_scaler()
+        self.load_duration = time.perf_counter() - start
+        self._setup_thread_budget()
+        self._setup_cache()
+        self._setup_drift_monitor()
+        if _settings.get('SHADOW_MODEL_PATH'):
+            self.load_shadow_model(_settings['SHADOW_MODEL_PATH'])
+        self._setup_reference()
+        self._setup_prediction_log()
+        self._setup_backend()
+        if _settings.get('MODEL_VERSIONS'):
+            self.setup_router(_settings['MODEL_VERSIONS'])
+        
+        resident_after = resident_memory_mb()
+        if resident_before is not None and resident_after is not None:
+            self.memory_footprint_mb = self._footprint_mb(resident_after - resident_before)
+        register_after_fork(self._reset_after_fork)
         self._initialized = True
     
+    def _footprint_mb(self, loaded_mb: float) -> float:
+        """
+        Mémoire d'un worker due au modèle: mémoire résidente prise par le
+        chargement (modèle, backend et sa copie éventuelle, shadow...) et
+        versions routées encore chargeables jusqu'au plafond MODEL_MEMORY_CAP_MB
+        """
+        footprint = max(0.0, loaded_mb)
+        if self.router is not None and self.router.memory_cap_bytes:
+            remaining = self.router.memory_cap_bytes - self.router.memory_bytes()
+            footprint += max(0, remaining) / (1024 * 1024)
+        return footprint
+    
+    def _reset_after_fork(self):
+        """
+        Repartir d'un état propre dans le worker (service créé dans le master)
+        
+        Le modèle chargé est conservé (pages partagées en copy-on-write);
+        les tampons par thread et les pools de threads du backend, qui ne
+        survivent pas au fork, sont recréés.
+        """
+        self._scratch = threading.local()
+        if self.thread_budget is not None:
+            self.thread_budget.limit_threadpools()
+        if self.backend is not None:
+            self.backend.after_fork()
+    
     def _load_model_and_scaler(self):
         """Charger le modèle et le scaler depuis les fichiers"""
         model_path = os.path.join(
@@ -71,6 +196,15 @@ class PredictionService:
             '../model/scaler.pkl'
         )
         
+        # Version publiée par le réentraînement incrémental, si présente
+        if _settings.get('MODEL_ARTIFACT_DIR'):
+            from app.retraining import latest_artifact
+            artifact = latest_artifact(_settings['MODEL_ARTIFACT_DIR'])
+            if artifact is not None:
+                model_path = os.path.join(artifact, 'model.pkl')
+                scaler_path = os.path.join(artifact, 'scaler.pkl')
+                logger.info(f"Version publiée utilisée: {artifact}")
+        
         try:
             # Vérifier que les fichiers existent
             if not os.path.exists(model_path):
@@ -81,12 +215,497 @@ class PredictionService:
             # Charger le modèle et le scaler
             self.model = joblib.load(model_path)
             self.scaler = joblib.load(scaler_path)
+            self.model_version = self._compute_model_version(model_path, scaler_path)
             
             logger.info("Modèle et scaler chargés avec succès")
         except Exception as e:
             logger.error(f"Erreur lors du chargement du modèle: {e}")
             raise
     
+    @staticmethod
+    def _compute_model_version(*paths: str) -> str:
+        """Empreinte du contenu des artefacts, identique dans tous les workers"""
+        digest = hashlib.sha256()
+        for path in paths:
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        return digest.hexdigest()[:16]
+    
+    def _setup_thread_budget(self):
+        """Imposer le budget de threads du worker au modèle et aux pools BLAS/OpenMP"""
+        if not _settings.get('THREAD_BUDGET_ENABLED', True):
+            return
+        from app.thread_budget import ThreadBudget
+        self.thread_budget = ThreadBudget.from_settings(_settings)
+        self.thread_budget.apply_to_model(self.model)
+        self.thread_budget.limit_threadpools()
+        budget = self.thread_budget
+        logger.info(
+            f"Budget de threads: {budget.threads} par appel "
+            f"({budget.cpus} CPU, {budget.workers} workers x {budget.worker_threads} threads)"
+        )
+    
+    def _setup_cache(self):
+        """Attacher le cache de prédictions partagé si activé"""
+        if not _settings.get('PREDICTION_CACHE_ENABLED'):
+            return
+        from app.cache import SharedPredictionCache, default_cache_path
+        try:
+            self.cache = SharedPredictionCache(
+                path=_settings.get('PREDICTION_CACHE_PATH') or default_cache_path(),
+                n_slots=int(_settings.get('PREDICTION_CACHE_SLOTS', 65536)),
+                model_version=self.model_version
+            )
+            logger.info(f"Cache de prédictions partagé: {self.cache.path}")
+        except Exception as e:
+            logger.warning(f"Cache de prédictions désactivé: {e}")
+            self.cache = None
+    
+    def _setup_drift_monitor(self):
+        """Créer le suivi de dérive des entrées si activé"""
+        if not _settings.get('DRIFT_MONITORING_ENABLED', True):
+            return
+        from app.drift import DriftMonitor
+        self.drift = DriftMonitor(
+            categorical_columns=self.categorical_columns,
+            numeric_columns=self.numeric_columns,
+            scaler=self.scaler,
+            vocabulary=self.categorical_vocabulary,
+            encode=self._encode_category,
+            bins=int(_settings.get('DRIFT_HISTOGRAM_BINS', 256))
+        )
+    
+    def _setup_reference(self):
+        """Mapper la table de statistiques de référence si elle a été construite"""
+        path = _settings.get('REFERENCE_STATS_PATH') or os.path.join(
+            os.path.dirname(__file__), '../model/reference_stats.bin'
+        )
+        if not os.path.exists(path):
+            return
+        from app.reference import ReferenceStats
+        try:
+            self.reference = ReferenceStats(path)
+            logger.info(f"Statistiques de référence mappées: {path}")
+        except Exception as e:
+            logger.warning(f"Statistiques de référence ignorées: {e}")
+    
+    def _setup_prediction_log(self):
+        """Journaliser les prédictions en arrière-plan si un dossier est configuré"""
+        directory = _settings.get('PREDICTION_LOG_DIR')
+        if not directory:
+            return
+        from app.prediction_log import PredictionLog
+        self.prediction_log = PredictionLog(
+            directory,
+            n_features=len(self.categorical_columns) + len(self.numeric_columns),
+            n_classes=len(self.model.classes_),
+            capacity=int(_settings.get('PREDICTION_LOG_CAPACITY', 65536)),
+            flush_rows=int(_settings.get('PREDICTION_LOG_FLUSH_ROWS', 4096)),
+            flush_interval=float(_settings.get('PREDICTION_LOG_FLUSH_INTERVAL', 1.0)),
+            segment_rows=int(_settings.get('PREDICTION_LOG_SEGMENT_ROWS', 1000000)),
+            policy=_settings.get('PREDICTION_LOG_POLICY', 'drop'),
+            block_timeout=float(_settings.get('PREDICTION_LOG_BLOCK_TIMEOUT', 0.05))
+        )
+        logger.info(f"Journal des prédictions: {directory}")
+    
+    def _setup_backend(self):
+        """
+        Choisir le backend d'inférence (PREDICTION_BACKEND)
+        
+        Un nom enregistré dans app/backends.py, ou 'auto': mesure des backends
+        disponibles et choix du plus rapide qui concorde avec sklearn. En cas
+        d'échec, retour à sklearn.
+        """
+        from app.backends import AUTO, REFERENCE_BACKEND, create_backend, select_backend
+        name = _settings.get('PREDICTION_BACKEND', REFERENCE_BACKEND)
+        self.backend_report = None
+        try:
+            if name == AUTO:
+                self.backend, self.backend_report = select_backend(self, _settings)
+            else:
+                self.backend = create_backend(name, self, _settings)
+        except Exception as e:
+            logger.warning(f"Backend {name} indisponible, retour à sklearn: {e}")
+            self.backend = create_backend(REFERENCE_BACKEND, self, _settings)
+        logger.info(f"Backend d'inférence: {self.backend.name}")
+    
+    def reference_context(self, data: Mapping[str, Any]) -> Optional[Dict[str, Any]]:
+        """Statistiques de référence pour la combinaison catégorique d'une entrée"""
+        if self.reference is None or not isinstance(data, Mapping):
+            return None
+        return self.reference.lookup(data)
+    
+    def load_shadow_model(self, path: str, sample_rate: Optional[float] = None,
+                          queue_size: Optional[int] = None):
+        """
+        Charger un modèle candidat évalué en arrière-plan sur le trafic réel
+        
+        Args:
+            path: Fichier joblib ou export ANN .npz du modèle shadow
+                  (mêmes entrées prétraitées)
+            sample_rate: Fraction des prédictions copiées (SHADOW_SAMPLE_RATE)
+            queue_size: Taille de la file d'attente (SHADOW_QUEUE_SIZE)
+        """
+        from app.ann import load_model_file
+        from app.shadow import ShadowEvaluator
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Modèle shadow non trouvé: {path}")
+        
+        model = load_model_file(path)
+        if self.thread_budget is not None:
+            self.thread_budget.apply_to_model(model)
+        self.shadow = ShadowEvaluator(
+            model,
+            sample_rate=sample_rate if sample_rate is not None
+            else float(_settings.get('SHADOW_SAMPLE_RATE', 0.1)),
+            queue_size=queue_size if queue_size is not None
+            else int(_settings.get('SHADOW_QUEUE_SIZE', 1000)),
+            name=os.path.basename(path)
+        )
+        logger.info(f"Modèle shadow chargé: {path}")
+    
+    def setup_router(self, versions: Mapping[str, Mapping[str, Any]]):
+        """
+        Servir plusieurs versions de modèle à côté du modèle par défaut
+        
+        Args:
+            versions: {nom: {"model": chemin, "scaler": chemin, "weight": poids}}
+                      (MODEL_VERSIONS); les versions sont chargées à la demande
+        """
+        from app.router import ModelRouter
+        cap_mb = _settings.get('MODEL_MEMORY_CAP_MB')
+        self.router = ModelRouter(
+            versions,
+            default=_settings.get('MODEL_DEFAULT_NAME', 'default'),
+            default_weight=float(_settings.get('MODEL_DEFAULT_WEIGHT', 1.0)),
+            memory_cap_bytes=int(float(cap_mb) * 1024 * 1024) if cap_mb else None,
+            header=_settings.get('MODEL_ROUTING_HEADER', 'X-Model-Version'),
+            client_header=_settings.get('MODEL_CLIENT_ID_HEADER', 'X-Client-Id'),
+            prepare_model=self.thread_budget.apply_to_model if self.thread_budget else None
+        )
+        # Le modèle par défaut reste celui du service, jamais évincé
+        self.router.register(self.router.default, self.model, self.scaler,
+                             self.model_version, pinned=True)
+        logger.info(f"Routage des modèles: {self.router.names}")
+    
+    def route(self, headers: Mapping[str, str]) -> Optional[str]:
+        """Nom de la version à utiliser pour une requête (None sans routeur)"""
+        if self.router is None:
+            return None
+        return self.router.route(headers)
+    
+    def _predict_routed(self, records: Sequence[Dict[str, Any]], model_name: str,
+                        explain: bool = False) -> List[Dict[str, Any]]:
+        """Prédire avec une version non par défaut (sans cache, dérive ni shadow)"""
+        variant = self.router.get(model_name)
+        X = self.preprocess_batch(records, scaler=variant.scaler)
+        probabilities = variant.model.predict_proba(X)
+        if self.prediction_log is not None:
+            self.prediction_log.append(X, probabilities, variant.version)
+        metrics.increment('predictions_total', len(records))
+        results = []
+        for proba_array, record in zip(probabilities, records):
+            result = self._format_result(proba_array, record, classes=variant.model.classes_)
+            result['model_version'] = model_name
+            results.append(result)
+        if explain:
+            self._attach_explanations(results, X, variant.model)
+        return results
+    
+    def _score_raw(self, raw: np.ndarray, model_name: Optional[str] = None
+                   ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Probabilités de lignes brutes générées (grilles, combinaisons) en un appel
+        
+        Sans cache, dérive, shadow ni journal: ce ne sont pas des mesures.
+        
+        Returns:
+            Tuple (probabilités (n, classes), classes du modèle)
+        """
+        if model_name is not None and model_name != self.router.default:
+            variant = self.router.get(model_name)
+            X = self._scale_raw(raw, variant.scaler)
+            return variant.model.predict_proba(X), variant.model.classes_
+        return self._infer(self._scale_raw(raw), raw), self.model.classes_
+    
+    def sweep(self, base: Dict[str, Any], axes: Sequence[Mapping[str, Any]],
+              model_name: Optional[str] = None,
+              max_points: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Courbe ou surface de probabilités quand une ou deux métriques varient
+        
+        Args:
+            base: Entrée de référence (format de predict), autres variables fixées
+            axes: 1 ou 2 axes {"feature": métrique, "start", "stop", "steps"}
+            model_name: Version de modèle choisie par le routeur (défaut si None)
+            max_points: Taille maximale de la grille (SWEEP_MAX_POINTS)
+            
+        Returns:
+            Valeurs de chaque axe, forme de la grille, et pour chaque classe
+            une liste (1 axe) ou une liste de listes (2 axes) de probabilités
+        """
+        if not isinstance(base, dict):
+            raise ValueError("L'entrée de référence doit être un objet JSON")
+        if not isinstance(axes, (list, tuple)) or not 1 <= len(axes) <= 2:
+            raise ValueError("Un ou deux axes de variation sont attendus")
+        max_points = int(max_points or _settings.get('SWEEP_MAX_POINTS', 2500))
+        
+        features, bounds = [], []
+        n_points = 1
+        for axis in axes:
+            if not isinstance(axis, Mapping):
+                raise ValueError("Chaque axe doit être un objet JSON")
+            feature = axis.get('feature')
+            if feature not in self.numeric_columns:
+                raise ValueError(
+                    f"Variable non balayable: {feature} "
+                    f"(métriques: {', '.join(self.numeric_columns)})"
+                )
+            if feature in features:
+                raise ValueError(f"Variable balayée deux fois: {feature}")
+            try:
+                start, stop = float(axis['start']), float(axis['stop'])
+                steps = int(axis.get('steps', 50))
+            except (KeyError, TypeError, ValueError, OverflowError):
+                raise ValueError(f"Axe {feature}: start, stop et steps numériques attendus")
+            if steps < 2 or not np.isfinite([start, stop]).all():
+                raise ValueError(f"Axe {feature}: au moins 2 pas et des bornes finies")
+            # Taille vérifiée avant toute allocation (entiers Python: pas de
+            # débordement du produit)
+            n_points *= steps
+            if n_points > max_points:
+                raise ValueError(f"Grille de {n_points} points: au plus {max_points}")
+            features.append(feature)
+            bounds.append((start, stop, steps))
+        
+        values = [np.linspace(start, stop, steps) for start, stop, steps in bounds]
+        shape = tuple(len(v) for v in values)
+        
+        # Toute la grille en une matrice: la ligne de référence répétée, les
+        # colonnes balayées remplies par le produit cartésien des axes
+        _, base_raw = self.preprocess_batch([base], return_raw=True)
+        raw = np.repeat(base_raw, n_points, axis=0)
+        n_categorical = len(self.categorical_columns)
+        for feature, grid in zip(features, np.meshgrid(*values, indexing='ij')):
+            raw[:, n_categorical + self.numeric_columns.index(feature)] = grid.ravel()
+        
+        probabilities, classes = self._score_raw(raw, model_name)
+        metrics.increment('sweep_points', n_points)
+        labels = [self.target_mapping.get(int(c), str(c)) for c in classes]
+        predicted = classes[probabilities.argmax(axis=1)].reshape(shape)
+        return {
+            'features': features,
+            'axes': {feature: v.tolist() for feature, v in zip(features, values)},
+            'shape': list(shape),
+            'classes': labels,
+            'probabilities': {
+                label: np.round(probabilities[:, k], 6).reshape(shape).tolist()
+                for k, label in enumerate(labels)
+            },
+            'predicted_class': predicted.tolist()
+        }
+
+    def best_configurations(self, base: Dict[str, Any],
+                            vary: Optional[Sequence[str]] = None,
+                            candidates: Optional[Mapping[str, Sequence[str]]] = None,
+                            target: str = "Bonne", top_k: int = 5,
+                            model_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Combinaisons catégoriques les plus probables pour des métriques fixées
+
+        Args:
+            base: Métriques mesurées et variables catégoriques non variées
+            vary: Variables catégoriques à faire varier (Type réseau et
+                Opérateur par défaut)
+            candidates: Sous-ensemble de valeurs par variable variée (tout le
+                vocabulaire par défaut)
+            target: Classe dont la probabilité ordonne les combinaisons
+            top_k: Nombre de combinaisons renvoyées
+            model_name: Version de modèle choisie par le routeur (défaut si None)
+
+        Returns:
+            Métriques utilisées (centre de leur case), nombre de combinaisons
+            évaluées et les top_k combinaisons avec leurs probabilités
+        """
+        if not isinstance(base, dict):
+            raise ValueError("L'entrée de référence doit être un objet JSON")
+        if vary is not None and not isinstance(vary, (list, tuple)):
+            raise ValueError("vary doit être une liste de variables catégoriques")
+        if candidates is not None and not isinstance(candidates, Mapping):
+            raise ValueError("candidates doit être un objet JSON {variable: [valeurs]}")
+        vary = list(vary) if vary else ["Type réseau", "Opérateur"]
+        candidates = candidates or {}
+        for column in vary:
+            if column not in self.categorical_columns:
+                raise ValueError(
+                    f"Variable non catégorique: {column} "
+                    f"(catégories: {', '.join(self.categorical_columns)})"
+                )
+        if len(set(vary)) != len(vary):
+            raise ValueError("Variable catégorique variée deux fois")
+        unknown = [column for column in candidates if column not in vary]
+        if unknown:
+            raise ValueError(f"Valeurs candidates pour des variables non variées: {', '.join(unknown)}")
+
+        values = []
+        for column in vary:
+            vocabulary = self.categorical_vocabulary[column]
+            subset = candidates.get(column, vocabulary)
+            if not isinstance(subset, (list, tuple)) or not subset:
+                raise ValueError(f"{column}: une liste de valeurs non vide est attendue")
+            invalid = [value for value in subset if value not in vocabulary]
+            if invalid:
+                raise ValueError(
+                    f"{column}: valeurs inconnues {', '.join(map(str, invalid))} "
+                    f"(connues: {', '.join(vocabulary)})"
+                )
+            values.append(list(dict.fromkeys(subset)))
+
+        if model_name is not None and model_name != self.router.default:
+            variant = self.router.get(model_name)
+            model, scaler, version = variant.model, variant.scaler, variant.version
+        else:
+            model, scaler, version = self.model, self.scaler, self.model_version
+        labels = [self.target_mapping.get(int(c), str(c)) for c in model.classes_]
+        if target not in labels:
+            raise ValueError(f"Classe cible inconnue: {target} (classes: {', '.join(labels)})")
+        try:
+            top_k = int(top_k)
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError("top_k doit être un entier")
+        if top_k < 1:
+            raise ValueError("top_k doit être au moins 1")
+
+        # Les colonnes variées peuvent être absentes de l'entrée de référence
+        record = dict(base)
+        for column, column_values in zip(vary, values):
+            record[column] = column_values[0]
+        _, base_raw = self.preprocess_batch([record], return_raw=True)
+        n_categorical = len(self.categorical_columns)
+        if not np.isfinite(base_raw[0, n_categorical:]).all():
+            raise ValueError("Les métriques doivent être des valeurs finies")
+
+        # Métriques ramenées au centre de leur case: clé de cache et entrées
+        bucket, centers = bucketize(
+            base_raw[0, n_categorical:], scaler.data_min_, scaler.data_max_,
+            int(_settings.get('BEST_CONFIG_BUCKETS', 200))
+        )
+        fixed = {column: record[column] for column in self.categorical_columns
+                 if column not in vary}
+        key = (version, target, tuple(vary), tuple(map(tuple, values)),
+               tuple(sorted(fixed.items())), bucket)
+
+        ranking = self.best_config_cache.get(key)
+        cached = ranking is not None
+        if not cached:
+            # Toutes les combinaisons en une matrice, évaluées en un appel
+            combinations = list(itertools.product(*values))
+            raw = np.repeat(base_raw, len(combinations), axis=0)
+            raw[:, n_categorical:] = centers
+            for j, column in enumerate(vary):
+                raw[:, self.categorical_columns.index(column)] = [
+                    self._encode_category(combination[j]) for combination in combinations
+                ]
+            probabilities, _ = self._score_raw(raw, model_name)
+            metrics.increment('best_config_evaluations', len(combinations))
+
+            target_index = labels.index(target)
+            order = np.argsort(-probabilities[:, target_index], kind='stable')
+            ranking = []
+            for i in order:
+                entry = dict(zip(vary, combinations[i]))
+                entry['probability'] = round(float(probabilities[i, target_index]), 6)
+                predicted_class = int(model.classes_[int(probabilities[i].argmax())])
+                entry['prediction'] = self.target_mapping.get(predicted_class, "Inconnue")
+                entry['predicted_class'] = predicted_class
+                entry['probabilities'] = {
+                    label: round(float(p), 6) for label, p in zip(labels, probabilities[i])
+                }
+                ranking.append(entry)
+            self.best_config_cache.put(key, ranking)
+
+        return {
+            'target': target,
+            'vary': vary,
+            'fixed': fixed,
+            'metrics': dict(zip(self.numeric_columns, centers.tolist())),
+            'evaluated': len(ranking),
+            'cached': cached,
+            'top': ranking[:top_k]
+        }
+
+    def explain(self, X: np.ndarray, model=None) -> List[Dict[str, Any]]:
+        """
+        Contributions de chaque variable aux probabilités (méthode de Saabas)
+        
+        Args:
+            X: Entrées prétraitées (n, 8)
+            model: Forêt à expliquer (modèle par défaut si None)
+            
+        Returns:
+            Une explication par ligne: probabilités de base (moyenne des
+            racines) et contributions par variable et par classe, dont la
+            somme redonne exactement les probabilités prédites
+        """
+        from app.explain import ForestExplainer
+        model = model if model is not None else self.model
+        explainer = self._explainers.get(model)
+        if explainer is None:
+            explainer = self._explainers[model] = ForestExplainer(model)
+        
+        bias, contributions = explainer.explain(X)
+        labels = [self.target_mapping.get(int(c), str(c)) for c in model.classes_]
+        columns = self.categorical_columns + self.numeric_columns
+        base = {label: float(p) for label, p in zip(labels, bias)}
+        return [
+            {
+                'base': base,
+                'contributions': {
+                    column: {label: float(c) for label, c in zip(labels, row[j])}
+                    for j, column in enumerate(columns)
+                }
+            }
+            for row in contributions
+        ]
+    
+    def _attach_explanations(self, results: List[Dict[str, Any]], X: np.ndarray, model):
+        for result, explanation in zip(results, self.explain(X, model)):
+            result['explanation'] = explanation
+    
+    def _infer(self, X: np.ndarray, raw: Optional[np.ndarray]) -> np.ndarray:
+        """Un appel au backend (sklearn si les entrées brutes manquent)"""
+        if self.backend is None or (self.backend.raw_inputs and raw is None):
+            return self.model.predict_proba(X)
+        return self.backend.infer(X, raw)
+    
+    def _predict_proba(self, X: np.ndarray, raw: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Probabilités pour chaque ligne, en passant par le cache partagé
+        
+        Args:
+            X: Entrées prétraitées (n, 8)
+            raw: Mêmes entrées avant normalisation (backends raw_inputs)
+        """
+        if self.cache is None:
+            return self._infer(X, raw)
+        
+        probabilities = np.empty((X.shape[0], len(self.model.classes_)))
+        misses = []
+        for i, row in enumerate(X):
+            cached = self.cache.get(row.tobytes())
+            if cached is None:
+                misses.append(i)
+            else:
+                probabilities[i] = cached
+        metrics.increment('cache_hits', X.shape[0] - len(misses))
+        metrics.increment('cache_misses', len(misses))
+        if misses:
+            computed = self._infer(X[misses], raw[misses] if raw is not None else None)
+            probabilities[misses] = computed
+            for i, proba_array in zip(misses, computed):
+                self.cache.put(X[i].tobytes(), proba_array)
+        return probabilities
+    
     def preprocess_input(self, data: Dict[str, Any]) -> Tuple[np.ndarray, Dict]:
         """
         Prétraiter les données d'entrée selon le même processus qu'en entraînement
@@ -117,10 +736,7 @@ class PredictionService:
             # Utiliser un encoding simple basé sur la première occurrence
             for cat_col in self.categorical_columns:
                 # Pour chaque catégorie, créer un hash numérique stable
-                cat_value = str(df[cat_col].iloc[0])
-                # Utiliser hash() pour obtenir un nombre entier stable
-                encoded_value = abs(hash(cat_value)) % 1000
-                df[cat_col] = encoded_value
+                df[cat_col] = self._encode_category(df[cat_col].iloc[0])
             
             # Convertir les colonnes catégoriques en float
             df[self.categorical_columns] = df[self.categorical_columns].astype('float32')
@@ -147,50 +763,232 @@ class PredictionService:
             logger.error(f"Erreur lors du prétraitement: {e}")
             raise
     
-    def predict(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    @staticmethod
+    def _encode_category(value: Any) -> float:
+        """
+        Encoder une valeur catégorique en nombre
+        
+        CRC32 est stable d'un processus à l'autre, contrairement à hash()
+        (randomisé par PYTHONHASHSEED): tous les workers encodent pareil.
+        """
+        return float(zlib.crc32(str(value).encode('utf-8')) % 1000)
+    
+    def preprocess_batch(self, records: Sequence[Dict[str, Any]],
+                         scaler=None, return_raw: bool = False):
+        """
+        Prétraiter un lot d'entrées en une seule matrice
+        
+        Args:
+            records: Liste de dictionnaires d'entrée
+            scaler: Scaler à utiliser (celui du service par défaut)
+            return_raw: Renvoyer aussi la matrice avant normalisation
+            
+        Returns:
+            Matrice (n, 8) dans l'ordre catégories puis numériques, ou le
+            tuple (matrice, matrice brute float64) si return_raw
+        """
+        if not records:
+            raise ValueError("Le lot de données ne peut pas être vide")
+        
+        required_columns = self.numeric_columns + self.categorical_columns
+        for index, record in enumerate(records):
+            if not isinstance(record, dict):
+                raise ValueError(f"Entrée {index}: un objet JSON est attendu")
+            missing_columns = [col for col in required_columns if col not in record]
+            if missing_columns:
+                raise ValueError(
+                    f"Entrée {index}: colonnes manquantes: {', '.join(missing_columns)}"
+                )
+        
+        # Lignes brutes écrites dans le tampon du thread (pas de matrices
+        # intermédiaires par requête); seule X est allouée
+        n_categorical = len(self.categorical_columns)
+        raw = self._scratch_rows(len(records))
+        raw[:, :n_categorical] = [
+            [self._encode_category(record[col]) for col in self.categorical_columns]
+            for record in records
+        ]
+        try:
+            raw[:, n_categorical:] = [
+                [float(record[col]) for col in self.numeric_columns] for record in records
+            ]
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Valeur numérique invalide: {e}")
+        
+        X = self._scale_raw(raw, scaler)
+        if return_raw:
+            # Copie: le tampon est réutilisé par le prochain appel du thread
+            return X, raw.copy()
+        return X
+    
+    def _scale_raw(self, raw: np.ndarray, scaler=None) -> np.ndarray:
+        """
+        Lignes brutes (n, 8) -> entrées du modèle: métriques normalisées, float32
+        
+        Mêmes opérations float64 que MinMaxScaler.transform (x * scale_ + min_,
+        puis écrêtage si clip), sans sa validation des entrées.
+        """
+        scaler = scaler or self.scaler
+        n_categorical = len(self.categorical_columns)
+        X = np.empty(raw.shape, dtype='float32')
+        X[:, :n_categorical] = raw[:, :n_categorical]
+        numeric = raw[:, n_categorical:] * scaler.scale_ + scaler.min_
+        if getattr(scaler, 'clip', False):
+            np.clip(numeric, *scaler.feature_range, out=numeric)
+        X[:, n_categorical:] = numeric
+        return X
+    
+    def _scratch_rows(self, n_rows: int) -> np.ndarray:
+        """Vue (n_rows, 8) float64 sur le tampon du thread courant, agrandi au besoin"""
+        buffer = getattr(self._scratch, 'rows', None)
+        if buffer is None or buffer.shape[0] < n_rows:
+            capacity = 1 << max(n_rows - 1, 0).bit_length()
+            n_features = len(self.categorical_columns) + len(self.numeric_columns)
+            buffer = self._scratch.rows = np.empty((capacity, n_features), dtype='float64')
+        return buffer[:n_rows]
+    
+    def _format_result(self, proba_array: np.ndarray, data: Dict[str, Any],
+                       classes: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        """Construire le dictionnaire de résultat à partir des probabilités"""
+        if classes is None:
+            classes = self.model.classes_
+        predicted_class = int(classes[int(np.argmax(proba_array))])
+        return {
+            'prediction': self.target_mapping.get(predicted_class, "Inconnue"),
+            'predicted_class': predicted_class,
+            'confidence': float(np.max(proba_array)),
+            'probabilities': {
+                'Bonne': float(proba_array[0]),
+                'Moyenne': float(proba_array[1]),
+                'Mauvaise': float(proba_array[2])
+            },
+            'input_features': {col: data.get(col) for col in self.numeric_columns + self.categorical_columns}
+        }
+    
+    def predict_batch(self, records: Sequence[Dict[str, Any]],
+                      model_name: Optional[str] = None,
+                      explain: bool = False) -> List[Dict[str, Any]]:
+        """
+        Effectuer les prédictions d'un lot d'entrées en un seul appel au modèle
+        
+        Args:
+            records: Liste de dictionnaires d'entrée
+            model_name: Version de modèle choisie par le routeur (défaut si None)
+            explain: Ajouter les contributions par variable à chaque résultat
+            
+        Returns:
+            Liste de résultats dans le même format que predict()
+        """
+        if self.model is None:
+            raise RuntimeError("Modèle non chargé")
+        if model_name is not None and model_name != self.router.default:
+            return self._predict_routed(records, model_name, explain=explain)
+        
+        X, raw = self.preprocess_batch(records, return_raw=True)
+        if self.drift is not None:
+            self.drift.observe(X)
+        probabilities = self._predict_proba(X, raw)
+        if self.shadow is not None:
+            self.shadow.submit(X, probabilities)
+        if self.prediction_log is not None:
+            self.prediction_log.append(X, probabilities, self.model_version)
+        metrics.increment('predictions_total', len(records))
+        results = [
+            self._format_result(proba_array, record)
+            for proba_array, record in zip(probabilities, records)
+        ]
+        if model_name is not None:
+            for result in results:
+                result['model_version'] = model_name
+        if explain:
+            self._attach_explanations(results, X, self.model)
+        return results
+    
+    @property
+    def is_ready(self) -> bool:
+        """Le service est prêt une fois le modèle chargé et le warmup terminé"""
+        return self.model is not None and self.warmup_duration is not None
+    
+    def warmup(self, iterations: int = 3, batch_sizes: Sequence[int] = (1,)) -> float:
+        """
+        Exécuter des prédictions de warmup sur les tailles de lot utilisées
+        
+        Args:
+            iterations: Nombre de passes par taille de lot
+            batch_sizes: Tailles de lot à préchauffer
+            
+        Returns:
+            Durée totale du warmup en secondes
+        """
+        start = time.perf_counter()
+        for batch_size in batch_sizes:
+            records = [WARMUP_SAMPLE] * int(batch_size)
+            for _ in range(iterations):
+                # Sans passer par predict_batch: ni métriques ni dérive
+                self._predict_proba(*self.preprocess_batch(records, return_raw=True))
+        self.warmup_duration = time.perf_counter() - start
+        logger.info(
+            f"Warmup terminé en {self.warmup_duration * 1000:.1f} ms "
+            f"({iterations} itérations, lots {list(batch_sizes)})"
+        )
+        return self.warmup_duration
+    
+    def predict(self, data: Dict[str, Any], model_name: Optional[str] = None,
+                explain: bool = False) -> Dict[str, Any]:
         """
         Effectuer une prédiction
         
         Args:
             data: Dictionnaire avec les données d'entrée
+            model_name: Version de modèle choisie par le routeur (défaut si None)
+            explain: Ajouter les contributions par variable au résultat
             
         Returns:
             Dictionnaire avec la prédiction
         """
         try:
-            # Prétraiter les données
-            X, metadata = self.preprocess_input(data)
+            if model_name is not None and model_name != self.router.default:
+                if not isinstance(data, dict):
+                    raise ValueError("Un objet JSON est attendu")
+                return self._predict_routed([data], model_name, explain=explain)[0]
+            
+            # Prétraiter les données (avec les valeurs brutes si le backend les prend)
+            if not isinstance(data, dict):
+                raise ValueError("Un objet JSON est attendu")
+            raw = None
+            if self.backend is not None and self.backend.raw_inputs:
+                X, raw = self.preprocess_batch([data], return_raw=True)
+            else:
+                X = self.preprocess_batch([data])
+            if self.drift is not None:
+                self.drift.observe(X)
             
             # Effectuer la prédiction
             if self.model is None:
                 raise RuntimeError("Modèle non chargé")
             
-            # Obtenir les prédictions et probabilités
-            prediction = self.model.predict(X)  # Classe prédite
-            probabilities = self.model.predict_proba(X)  # Probabilités pour chaque classe
-            
-            # Obtenir la classe prédite et la confiance
-            predicted_class = int(prediction[0])
-            proba_array = probabilities[0]
-            confidence = float(np.max(proba_array))
-            
-            # Mapper la classe à sa représentation texte
-            predicted_label = self.target_mapping.get(
-                predicted_class,
-                "Inconnue"
-            )
-            
-            result = {
-                'prediction': predicted_label,
-                'predicted_class': predicted_class,
-                'confidence': confidence,
-                'probabilities': {
-                    'Bonne': float(proba_array[0]),
-                    'Moyenne': float(proba_array[1]),
-                    'Mauvaise': float(proba_array[2])
-                },
-                'input_features': {col: data.get(col) for col in self.numeric_columns + self.categorical_columns}
-            }
+            # Probabilités pour chaque classe (via le cache partagé si activé);
+            # la classe prédite est l'argmax, comme dans model.predict
+            if raw is None:
+                compute = lambda: self._predict_proba(X)
+            else:
+                compute = lambda: self._predict_proba(X, raw)
+            if self.singleflight is not None:
+                probabilities, shared = self.singleflight.do(X.tobytes(), compute)
+                if shared:
+                    metrics.increment('predictions_coalesced')
+            else:
+                probabilities = compute()
+            if self.shadow is not None:
+                self.shadow.submit(X, probabilities)
+            if self.prediction_log is not None:
+                self.prediction_log.append(X, probabilities, self.model_version)
+            metrics.increment('predictions_total')
+            result = self._format_result(probabilities[0], data)
+            if model_name is not None:
+                result['model_version'] = model_name
+            if explain:
+                self._attach_explanations([result], X, self.model)
             
             logger.info(f"Prédiction effectuée: {result['prediction']}")
             return result
@@ -200,6 +998,17 @@ class PredictionService:
             raise
 
 
+@register_after_fork
+def _reset_init_lock():
+    """Le verrou d'initialisation hérité du master peut avoir été tenu au fork"""
+    PredictionService._init_lock = threading.Lock()
+
+
+def configure_prediction_service(config: Mapping[str, Any]):
+    """Transmettre la configuration de l'application au service"""
+    _settings.update(config)
+
+
 def get_prediction_service() -> PredictionService:
     """Obtenir l'instance du service de prédiction"""
     return PredictionService()
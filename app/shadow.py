@@ -0,0 +1,140 @@
+"""
+Évaluation d'un modèle "shadow" sur le trafic réel, hors du chemin de requête
+
+Une fraction des entrées déjà prétraitées est copiée, avec les probabilités
+du modèle principal, dans une file bornée. Un thread de fond y applique le
+modèle shadow et cumule accord, écarts de probabilités et latence. Si la file
+est pleine, l'entrée est abandonnée: la requête principale n'attend jamais.
+"""
+import time
+import queue
+import random
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from app.lifecycle import register_after_fork
+from app.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ShadowEvaluator:
+    """Compare un modèle candidat au modèle principal en arrière-plan"""
+
+    def __init__(self, model, sample_rate: float = 0.1, queue_size: int = 1000,
+                 latency_window: int = 1000, name: Optional[str] = None):
+        """
+        Args:
+            model: Modèle candidat (interface predict_proba de sklearn)
+            sample_rate: Fraction des prédictions copiées vers le shadow
+            queue_size: Taille maximale de la file d'attente
+            latency_window: Nombre de latences récentes gardées pour les quantiles
+            name: Nom du modèle shadow (affiché dans les statistiques)
+        """
+        self.model = model
+        self.sample_rate = float(sample_rate)
+        self.queue_size = int(queue_size)
+        self.latency_window = int(latency_window)
+        self.name = name
+        self._reset()
+        register_after_fork(self._reset)
+
+    def _reset(self):
+        """État vide; le thread de fond est (re)démarré à la première soumission"""
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._thread = None
+        self.evaluated = 0
+        self.dropped = 0
+        self.agreements = 0
+        self.abs_delta_sum = None
+        self.abs_delta_max = None
+        self.latencies = deque(maxlen=self.latency_window)
+
+    def submit(self, X: np.ndarray, primary_proba: np.ndarray):
+        """Copier (éventuellement) une prédiction vers le shadow, sans bloquer"""
+        if random.random() >= self.sample_rate:
+            return
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait((X, primary_proba))
+        except queue.Full:
+            # Threads de requête concurrents: += n'est pas atomique
+            with self._lock:
+                self.dropped += 1
+            metrics.increment('shadow_dropped')
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='shadow-evaluator', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        """Boucle du thread de fond"""
+        while True:
+            X, primary_proba = self._queue.get()
+            try:
+                self._evaluate(X, primary_proba)
+            except Exception as e:
+                logger.error(f"Erreur d'évaluation du modèle shadow: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _evaluate(self, X: np.ndarray, primary_proba: np.ndarray):
+        start = time.perf_counter()
+        shadow_proba = self.model.predict_proba(X)
+        latency = time.perf_counter() - start
+
+        abs_delta = np.abs(shadow_proba - primary_proba)
+        agreements = int((shadow_proba.argmax(axis=1) == primary_proba.argmax(axis=1)).sum())
+        with self._lock:
+            self.evaluated += X.shape[0]
+            self.agreements += agreements
+            if self.abs_delta_sum is None:
+                self.abs_delta_sum = abs_delta.sum(axis=0)
+                self.abs_delta_max = abs_delta.max(axis=0)
+            else:
+                self.abs_delta_sum += abs_delta.sum(axis=0)
+                self.abs_delta_max = np.maximum(self.abs_delta_max, abs_delta.max(axis=0))
+            self.latencies.append(latency / X.shape[0])
+        metrics.increment('shadow_evaluated', X.shape[0])
+
+    def wait_idle(self):
+        """Attendre que la file soit vide (tests, arrêt propre)"""
+        self._queue.join()
+
+    def stats(self) -> Dict[str, Any]:
+        """Statistiques de comparaison shadow / principal"""
+        with self._lock:
+            evaluated = self.evaluated
+            latencies = np.array(self.latencies)
+            stats = {
+                'name': self.name,
+                'sample_rate': self.sample_rate,
+                'evaluated': evaluated,
+                'dropped': self.dropped,
+                'queue_depth': self._queue.qsize(),
+                'agreement_rate': self.agreements / evaluated if evaluated else None,
+                # Écarts absolus de probabilité, dans l'ordre des classes du modèle
+                'mean_abs_delta': (
+                    [float(x) for x in self.abs_delta_sum / evaluated] if evaluated else None
+                ),
+                'max_abs_delta': (
+                    [float(x) for x in self.abs_delta_max] if evaluated else None
+                )
+            }
+        if latencies.size:
+            stats['latency_ms_per_row'] = {
+                'mean': float(latencies.mean() * 1000),
+                'p50': float(np.percentile(latencies, 50) * 1000),
+                'p95': float(np.percentile(latencies, 95) * 1000)
+            }
+        return stats
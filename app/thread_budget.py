@@ -0,0 +1,86 @@
+"""
+Budget de threads CPU de l'inférence, par worker
+
+create_trained_model.py entraîne la forêt avec n_jobs=-1, valeur conservée
+dans le pickle: chaque predict_proba lance alors un pool d'autant de threads
+que de CPU, dans chacun des workers Gunicorn (et pour chacun de leurs
+threads de requête). S'y ajoutent les pools BLAS/OpenMP. Avec W workers
+sur C cœurs, jusqu'à W x C threads se disputent C cœurs.
+
+Le budget d'un processus est C // (workers x threads de requête), au moins
+1, ou INFERENCE_THREADS s'il est fixé. Il est appliqué au chargement:
+n_jobs des modèles remplacé, pools BLAS/OpenMP plafonnés via threadpoolctl.
+"""
+from typing import Any, Dict, Optional
+
+try:
+    from threadpoolctl import threadpool_info, threadpool_limits
+except ImportError:  # dépendance optionnelle (installée avec scikit-learn)
+    threadpool_info = threadpool_limits = None
+
+from app.resources import available_cpus
+
+
+def compute_budget(cpus: int, workers: int, worker_threads: int = 1) -> int:
+    """Threads d'inférence par appel: cœurs partagés entre toutes les requêtes concurrentes"""
+    return max(1, int(cpus) // max(1, int(workers) * int(worker_threads)))
+
+
+class ThreadBudget:
+    """Budget appliqué aux modèles (n_jobs) et aux pools BLAS/OpenMP du processus"""
+
+    def __init__(self, threads: Optional[int] = None, workers: int = 1,
+                 worker_threads: int = 1, cpus: Optional[int] = None):
+        """
+        Args:
+            threads: Budget imposé (None ou 0: dérivé des CPU et des workers)
+            workers: Processus servant en parallèle (workers Gunicorn)
+            worker_threads: Threads de requête par worker
+            cpus: CPU disponibles (détectés par défaut)
+        """
+        self.cpus = int(cpus) if cpus else available_cpus()
+        self.workers = max(1, int(workers))
+        self.worker_threads = max(1, int(worker_threads))
+        self.threads = int(threads) if threads else compute_budget(
+            self.cpus, self.workers, self.worker_threads
+        )
+        self.models_adjusted = 0
+        self._limiter = None
+
+    @classmethod
+    def from_settings(cls, settings) -> 'ThreadBudget':
+        return cls(
+            threads=settings.get('INFERENCE_THREADS') or None,
+            workers=settings.get('INFERENCE_WORKERS', 1),
+            worker_threads=settings.get('INFERENCE_WORKER_THREADS', 1)
+        )
+
+    def apply_to_model(self, model):
+        """Remplacer le n_jobs picklé du modèle (sans effet sur un ANNModel)"""
+        if getattr(model, 'n_jobs', None) is not None or hasattr(model, 'estimators_'):
+            model.n_jobs = self.threads
+            self.models_adjusted += 1
+        return model
+
+    def limit_threadpools(self):
+        """Plafonner les pools BLAS/OpenMP déjà chargés (à refaire après fork)"""
+        if threadpool_limits is None:
+            return
+        self._limiter = threadpool_limits(limits=self.threads)
+
+    def report(self) -> Dict[str, Any]:
+        pools = []
+        if threadpool_info is not None:
+            pools = [
+                {'api': pool['user_api'], 'library': pool['internal_api'],
+                 'num_threads': pool['num_threads']}
+                for pool in threadpool_info()
+            ]
+        return {
+            'threads': self.threads,
+            'cpus': self.cpus,
+            'workers': self.workers,
+            'worker_threads': self.worker_threads,
+            'models_adjusted': self.models_adjusted,
+            'threadpools': pools
+        }
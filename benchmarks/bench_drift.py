@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+"""
+Benchmark: surcoût du suivi de dérive par requête
+
+Mesure DriftMonitor.observe() sur un vecteur prétraité (fusions périodiques
+comprises). Objectif: moins d'une microseconde par requête.
+
+Utilisation:
+    python benchmarks/bench_drift.py
+"""
+import os
+import sys
+import timeit
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings('ignore')
+
+from app.services import get_prediction_service, WARMUP_SAMPLE
+
+
+def main(n: int = 500000):
+    service = get_prediction_service()
+    if service.drift is None:
+        print("Suivi de dérive désactivé")
+        return
+    
+    X, _ = service.preprocess_input(WARMUP_SAMPLE)
+    observe = service.drift.observe
+    
+    per_call = timeit.timeit('observe(X)', globals={'observe': observe, 'X': X}, number=n) / n
+    baseline = timeit.timeit('noop(X)', globals={'noop': lambda X: None, 'X': X}, number=n) / n
+    print(f"observe(): {per_call * 1e6:.3f} µs/appel "
+          f"(appel de fonction vide: {baseline * 1e6:.3f} µs)")
+    print(f"Observations agrégées: {service.drift.snapshot()['count']}")
+
+
+if __name__ == '__main__':
+    main()
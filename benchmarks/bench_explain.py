@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+"""
+Benchmark: coût des explications par rapport à la prédiction seule
+
+Compare predict_proba() et ForestExplainer.explain() sur les mêmes entrées
+prétraitées, pour un lot de 1 et un lot de 1000 lignes. Objectif: un coût
+du même ordre de grandeur que la prédiction.
+
+Utilisation:
+    python benchmarks/bench_explain.py
+"""
+import os
+import sys
+import timeit
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings('ignore')
+
+from app.explain import ForestExplainer
+from app.services import get_prediction_service, WARMUP_SAMPLE
+
+
+def main(repeat: int = 20):
+    service = get_prediction_service()
+    explainer = ForestExplainer(service.model)
+    row = service.preprocess_batch([WARMUP_SAMPLE])
+    
+    for batch_size in (1, 1000):
+        X = np.repeat(row, batch_size, axis=0)
+        predict = min(timeit.repeat(lambda: service.model.predict_proba(X),
+                                    number=1, repeat=repeat))
+        explain = min(timeit.repeat(lambda: explainer.explain(X),
+                                    number=1, repeat=repeat))
+        print(f"Lot {batch_size:5d}: predict_proba {predict * 1000:.2f} ms, "
+              f"explain {explain * 1000:.2f} ms (x{explain / predict:.2f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""
+Benchmark: ONNX Runtime contre sklearn predict_proba
+
+Compare le chemin de service actuel (scaler.transform + predict_proba sur la
+forêt) et la session ONNX Runtime (normalisation intégrée au graphe) pour
+un lot de 1 et un lot de 1024 lignes. L'export est créé dans un dossier
+temporaire à partir du modèle servi.
+
+Utilisation:
+    python benchmarks/bench_onnx.py [--threads 1]
+"""
+import os
+import sys
+import timeit
+import argparse
+import tempfile
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings('ignore')
+
+from app.onnx_backend import OnnxBackend, export_onnx
+from app.services import get_prediction_service, WARMUP_SAMPLE
+
+
+def main(threads: int = 1, repeat: int = 50):
+    service = get_prediction_service()
+    path = os.path.join(tempfile.mkdtemp(), 'model.onnx')
+    export_onnx(service.model, service.scaler, path)
+    backend = OnnxBackend(path, intra_op_threads=threads)
+    _, raw_row = service.preprocess_batch([WARMUP_SAMPLE], return_raw=True)
+    n_categorical = len(service.categorical_columns)
+
+    def sklearn_path(raw):
+        numeric = service.scaler.transform(raw[:, n_categorical:])
+        X = np.hstack([raw[:, :n_categorical], numeric]).astype('float32')
+        return service.model.predict_proba(X)
+
+    print(f"Forêt de {len(service.model.estimators_)} arbres, "
+          f"ONNX Runtime intra_op_threads={threads}")
+    for batch_size in (1, 1024):
+        raw = np.repeat(raw_row, batch_size, axis=0)
+        raw[:, n_categorical:] *= np.random.default_rng(0).uniform(0.5, 1.5, raw[:, n_categorical:].shape)
+        np.testing.assert_allclose(backend.predict_proba(raw), sklearn_path(raw), atol=1e-6)
+        sklearn_time = min(timeit.repeat(lambda: sklearn_path(raw), number=1, repeat=repeat))
+        onnx_time = min(timeit.repeat(lambda: backend.predict_proba(raw), number=1, repeat=repeat))
+        print(f"Lot {batch_size:5d}: sklearn {sklearn_time * 1000:.3f} ms, "
+              f"onnx {onnx_time * 1000:.3f} ms (x{sklearn_time / onnx_time:.1f})")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=1)
+    main(threads=parser.parse_args().threads)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""
+Benchmark: latence de la prédiction principale avec et sans modèle shadow
+
+Le modèle shadow (ici une copie du modèle principal) est évalué par un
+thread de fond: la latence médiane de predict() ne doit pas bouger.
+
+Utilisation:
+    python benchmarks/bench_shadow.py
+"""
+import os
+import sys
+import time
+import tempfile
+import warnings
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings('ignore')
+
+from app.services import get_prediction_service, WARMUP_SAMPLE
+
+
+def measure(service, n: int):
+    """Latences de predict() en millisecondes"""
+    latencies = []
+    for i in range(n):
+        # Entrées distinctes pour ne pas profiter du cache ni du regroupement
+        data = dict(WARMUP_SAMPLE, **{"Download (Mbps)": 1 + i % 500})
+        start = time.perf_counter()
+        service.predict(data)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+def report(label, latencies):
+    print(f"{label:<20} p50={np.percentile(latencies, 50):.3f} ms  "
+          f"p95={np.percentile(latencies, 95):.3f} ms")
+
+
+def main(n: int = 500):
+    service = get_prediction_service()
+    measure(service, 50)
+    report("sans shadow", measure(service, n))
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'shadow.pkl')
+        joblib.dump(service.model, path)
+        for rate in (0.1, 1.0):
+            service.load_shadow_model(path, sample_rate=rate)
+            report(f"shadow {rate:.0%}", measure(service, n))
+            service.shadow.wait_idle()
+            stats = service.shadow.stats()
+            print(f"{'':<20} évaluées={stats['evaluated']} abandonnées={stats['dropped']} "
+                  f"accord={stats['agreement_rate']}")
+    service.shadow = None
+
+
+if __name__ == '__main__':
+    main()
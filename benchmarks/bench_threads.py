@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+Benchmark: sursouscription des threads d'inférence entre workers
+
+Simule W workers (processus) qui appellent predict_proba en boucle, comme
+sous Gunicorn, avec le n_jobs picklé (-1: un pool par cœur et par appel)
+puis avec le budget de app/thread_budget.py (CPU // W). Affiche la
+latence (p50, p99) et le débit total par taille de lot.
+
+joblib résout n_jobs=-1 selon les CPU qu'il détecte: sur une machine dont
+le quota n'est pas visible (parts CPU, hôte partagé), c'est le nombre de
+cœurs de l'hôte. --host-cpus N reproduit ce cas (n_jobs=N sans budget),
+y compris sur une machine de test à un seul cœur.
+
+Utilisation:
+    python benchmarks/bench_threads.py [--workers 4] [--seconds 3] [--host-cpus 8]
+"""
+import os
+import sys
+import time
+import argparse
+import warnings
+import multiprocessing
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings('ignore')
+
+import joblib
+
+from app.resources import available_cpus
+from app.thread_budget import ThreadBudget
+from app.services import get_prediction_service, WARMUP_SAMPLE
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          'model', 'modele_non_entraine.pkl')
+
+
+def worker(n_jobs, budgeted, X, seconds, start_event, queue):
+    model = joblib.load(MODEL_PATH)
+    if not budgeted:
+        model.n_jobs = n_jobs
+    else:
+        budget = ThreadBudget(threads=n_jobs)
+        budget.apply_to_model(model)
+        budget.limit_threadpools()
+    model.predict_proba(X)
+    start_event.wait()
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        model.predict_proba(X)
+        latencies.append(time.perf_counter() - start)
+    queue.put(latencies)
+
+
+def run(n_jobs, budgeted, X, workers, seconds):
+    context = multiprocessing.get_context('fork')
+    start_event, queue = context.Event(), context.Queue()
+    processes = [context.Process(target=worker, args=(n_jobs, budgeted, X, seconds, start_event, queue))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    time.sleep(1.0)
+    start_event.set()
+    latencies = np.concatenate([queue.get() for _ in processes])
+    for process in processes:
+        process.join()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--host-cpus', type=int, default=None,
+                        help="n_jobs=-1 résolu à ce nombre de cœurs (défaut: détection joblib)")
+    args = parser.parse_args()
+
+    cpus = available_cpus()
+    budget = ThreadBudget(workers=args.workers, cpus=cpus).threads
+    unbudgeted = args.host_cpus or -1
+    row = get_prediction_service().preprocess_batch([WARMUP_SAMPLE])
+    print(f"{cpus} CPU, {args.workers} workers: n_jobs={unbudgeted} contre budget={budget}")
+    for batch_size in (1, 32):
+        X = np.repeat(row, batch_size, axis=0)
+        for label, n_jobs, budgeted in ((f'n_jobs={unbudgeted}', unbudgeted, False),
+                                        (f'budget={budget}', budget, True)):
+            latencies = run(n_jobs, budgeted, X, args.workers, args.seconds) * 1000
+            throughput = len(latencies) * batch_size / args.seconds
+            print(f"Lot {batch_size:3d} {label:>10}: p50 {np.percentile(latencies, 50):7.2f} ms, "
+                  f"p99 {np.percentile(latencies, 99):7.2f} ms, {throughput:9.0f} lignes/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+"""
+Build des statistiques de référence à partir des données d'entraînement
+
+Agrège le fichier de mesures (Excel ou CSV) par Opérateur / Quartier /
+Type réseau: nombre de mesures, moyenne et quantiles des cinq métriques,
+répartition des classes de qualité. Le résultat est écrit dans
+model/reference_stats.bin, lu par l'API via un mappage mémoire
+(GET /reference, bloc "context" des prédictions).
+
+Utilisation:
+    python build_reference_stats.py chemin/dataset_tp_ml.xlsx [sortie.bin]
+"""
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+
+from app.dataset import CATEGORICAL_COLUMNS, NUMERIC_COLUMNS, TARGET_COLUMN, load_dataset
+from app.reference import build_reference_table
+
+OUTPUT_PATH = os.path.join(BASE_DIR, 'model', 'reference_stats.bin')
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    source = sys.argv[1]
+    output = sys.argv[2] if len(sys.argv) > 2 else OUTPUT_PATH
+
+    # Via le cache colonnes typé (Excel analysé une seule fois)
+    df = load_dataset(source, mmap=False)
+    header = build_reference_table(
+        df, output,
+        categorical_columns=CATEGORICAL_COLUMNS,
+        numeric_columns=NUMERIC_COLUMNS,
+        target_column=TARGET_COLUMN
+    )
+    size_kb = os.path.getsize(output) / 1024
+    print(f"{header['rows']} mesures agrégées en {header['shape']} cellules "
+          f"-> {output} ({size_kb:.1f} Ko)")
+
+
+if __name__ == '__main__':
+    main()
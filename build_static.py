@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+Build des assets statiques pour la production
+
+Copie chaque fichier CSS/JS de static/ sous static/dist/ avec l'empreinte de
+son contenu dans le nom (ex: js/app.3f2a9c1b04.js), génère les variantes
+précompressées .gz (et .br si le module brotli est installé) et écrit le
+manifeste static/dist/manifest.json utilisé par l'application.
+
+Utilisation:
+    python build_static.py
+"""
+import os
+import sys
+import gzip
+import json
+import shutil
+import hashlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_PATH = os.path.join(DIST_DIR, 'manifest.json')
+
+ASSET_EXTENSIONS = ('.css', '.js')
+# Les petits fichiers ne gagnent rien à être compressés
+MIN_COMPRESS_SIZE = 256
+
+
+def iter_assets():
+    """Parcourir les assets sources (hors dist/)"""
+    for root, dirs, files in os.walk(STATIC_DIR):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != DIST_DIR]
+        for name in sorted(files):
+            if name.endswith(ASSET_EXTENSIONS):
+                path = os.path.join(root, name)
+                yield os.path.relpath(path, STATIC_DIR).replace(os.sep, '/'), path
+
+
+def hashed_name(relative_path, content):
+    """Insérer l'empreinte du contenu avant l'extension"""
+    stem, ext = os.path.splitext(relative_path)
+    digest = hashlib.sha256(content).hexdigest()[:10]
+    return f"{stem}.{digest}{ext}"
+
+
+def write_variants(path, content):
+    """Écrire les variantes précompressées d'un asset"""
+    variants = []
+    if len(content) < MIN_COMPRESS_SIZE:
+        return variants
+    
+    # mtime=0 pour des fichiers .gz reproductibles d'un build à l'autre
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(content, compresslevel=9, mtime=0))
+    variants.append('gzip')
+    
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(content, quality=11))
+        variants.append('br')
+    return variants
+
+
+def build():
+    """Construire static/dist/ et le manifeste"""
+    if os.path.isdir(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+    os.makedirs(DIST_DIR)
+    
+    manifest = {}
+    for relative_path, source in iter_assets():
+        with open(source, 'rb') as f:
+            content = f.read()
+        
+        target_name = hashed_name(relative_path, content)
+        target = os.path.join(DIST_DIR, target_name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(content)
+        
+        variants = write_variants(target, content)
+        manifest[relative_path] = {
+            'path': f"dist/{target_name}",
+            'encodings': variants
+        }
+        print(f"{relative_path} -> dist/{target_name} {variants}")
+    
+    with open(MANIFEST_PATH, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    print(f"Manifeste écrit: {MANIFEST_PATH}")
+    
+    if brotli is None:
+        print("Module brotli absent: variantes .br non générées")
+    return manifest
+
+
+if __name__ == '__main__':
+    build()
+    sys.exit(0)
@@ -7,6 +7,8 @@ Peut être utilisé comme module ou script autonome
 import requests
 import json
 import sys
+import time
+import random
 from typing import Dict, Any, Optional
 from dataclasses import dataclass
 
@@ -38,17 +40,46 @@ Entrées:
 class NetworkQualityAPIClient:
     """Client pour l'API de prédiction de qualité réseau"""
     
-    def __init__(self, base_url: str = "http://localhost:5000"):
+    def __init__(self, base_url: str = "http://localhost:5000",
+                 max_retries: int = 3, max_backoff: float = 30.0):
         """
         Initialiser le client
         
         Args:
             base_url: URL de base de l'API (sans trailing slash)
+            max_retries: Nombre de nouvelles tentatives après un 429
+            max_backoff: Attente maximale entre deux tentatives (secondes)
         """
         self.base_url = base_url.rstrip('/')
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
         self.session = requests.Session()
         self.session.headers.update({'Content-Type': 'application/json'})
     
+    def _retry_delay(self, response: requests.Response, attempt: int) -> float:
+        """
+        Délai avant la prochaine tentative: Retry-After du serveur (ou
+        backoff exponentiel) avec jitter pour désynchroniser les clients
+        """
+        try:
+            base = float(response.headers.get('Retry-After', ''))
+        except ValueError:
+            base = 2 ** attempt * 0.5
+        return min(self.max_backoff, base * random.uniform(1.0, 1.5))
+    
+    def _post(self, path: str, payload: Any, timeout: float = 10) -> requests.Response:
+        """POST en respectant les réponses 429 (Retry-After)"""
+        for attempt in range(self.max_retries + 1):
+            response = self.session.post(
+                f"{self.base_url}{path}",
+                json=payload,
+                timeout=timeout
+            )
+            if response.status_code != 429 or attempt == self.max_retries:
+                return response
+            time.sleep(self._retry_delay(response, attempt))
+        return response
+    
     def health_check(self) -> bool:
         """
         Vérifier que l'API est disponible
@@ -90,11 +121,7 @@ class NetworkQualityAPIClient:
             PredictionResult si succès, None sinon
         """
         try:
-            response = self.session.post(
-                f"{self.base_url}/predict",
-                json=data,
-                timeout=10
-            )
+            response = self._post("/predict", data)
             response.raise_for_status()
             
             json_response = response.json()
@@ -1,6 +1,7 @@
 # Configuration pour le déploiement Flask
 
 import os
+import json
 from datetime import timedelta
 
 class Config:
@@ -16,6 +17,89 @@ class Config:
     
     # Sessions
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
+    
+    # Chargement du modèle et warmup au démarrage
+    EAGER_MODEL_LOADING = os.environ.get('EAGER_MODEL_LOADING', 'True').lower() == 'true'
+    WARMUP_ITERATIONS = int(os.environ.get('WARMUP_ITERATIONS', 3))
+    WARMUP_BATCH_SIZES = [
+        int(size) for size in os.environ.get('WARMUP_BATCH_SIZES', '1,32').split(',')
+    ]
+    
+    # Cache de prédictions partagé entre workers (fichier mappé, /dev/shm par défaut)
+    PREDICTION_CACHE_ENABLED = os.environ.get('PREDICTION_CACHE_ENABLED', 'False').lower() == 'true'
+    PREDICTION_CACHE_PATH = os.environ.get('PREDICTION_CACHE_PATH')
+    PREDICTION_CACHE_SLOTS = int(os.environ.get('PREDICTION_CACHE_SLOTS', 65536))
+    
+    # Regroupement des prédictions identiques concurrentes (singleflight)
+    PREDICTION_COALESCING_ENABLED = os.environ.get('PREDICTION_COALESCING_ENABLED', 'True').lower() == 'true'
+    
+    # Contrôle d'admission: au-delà, réponse 429 avec Retry-After. Sous
+    # Gunicorn, limites dérivées du nombre de threads (gunicorn.conf.py)
+    ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', 'True').lower() == 'true'
+    ADMISSION_MAX_IN_FLIGHT = int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', 4))
+    ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', 16))
+    ADMISSION_MAX_WAIT_SECONDS = float(os.environ.get('ADMISSION_MAX_WAIT_SECONDS', 2.0))
+    
+    # Prédiction par lot et compression des réponses volumineuses
+    BATCH_MAX_RECORDS = int(os.environ.get('BATCH_MAX_RECORDS', 10000))
+    # Taille maximale des grilles de /predict/sweep
+    SWEEP_MAX_POINTS = int(os.environ.get('SWEEP_MAX_POINTS', 2500))
+    # /predict/best-config: cases par métrique (0: valeurs exactes) et classements en cache
+    BEST_CONFIG_BUCKETS = int(os.environ.get('BEST_CONFIG_BUCKETS', 200))
+    BEST_CONFIG_CACHE_SIZE = int(os.environ.get('BEST_CONFIG_CACHE_SIZE', 1024))
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+    COMPRESSION_ZSTD_LEVEL = int(os.environ.get('COMPRESSION_ZSTD_LEVEL', 3))
+    
+    # Statistiques de dérive des entrées (mémoire constante, /stats/drift)
+    DRIFT_MONITORING_ENABLED = os.environ.get('DRIFT_MONITORING_ENABLED', 'True').lower() == 'true'
+    DRIFT_HISTOGRAM_BINS = int(os.environ.get('DRIFT_HISTOGRAM_BINS', 256))
+    
+    # Modèle shadow évalué en arrière-plan (désactivé si aucun chemin)
+    SHADOW_MODEL_PATH = os.environ.get('SHADOW_MODEL_PATH')
+    SHADOW_SAMPLE_RATE = float(os.environ.get('SHADOW_SAMPLE_RATE', 0.1))
+    SHADOW_QUEUE_SIZE = int(os.environ.get('SHADOW_QUEUE_SIZE', 1000))
+    
+    # Versions publiées par retrain_incremental.py (LATEST chargé au démarrage)
+    MODEL_ARTIFACT_DIR = os.environ.get('MODEL_ARTIFACT_DIR')
+    
+    # Journal des prédictions (désactivé si aucun dossier)
+    PREDICTION_LOG_DIR = os.environ.get('PREDICTION_LOG_DIR')
+    PREDICTION_LOG_CAPACITY = int(os.environ.get('PREDICTION_LOG_CAPACITY', 65536))
+    PREDICTION_LOG_FLUSH_ROWS = int(os.environ.get('PREDICTION_LOG_FLUSH_ROWS', 4096))
+    PREDICTION_LOG_FLUSH_INTERVAL = float(os.environ.get('PREDICTION_LOG_FLUSH_INTERVAL', 1.0))
+    PREDICTION_LOG_SEGMENT_ROWS = int(os.environ.get('PREDICTION_LOG_SEGMENT_ROWS', 1000000))
+    PREDICTION_LOG_POLICY = os.environ.get('PREDICTION_LOG_POLICY', 'drop')
+    PREDICTION_LOG_BLOCK_TIMEOUT = float(os.environ.get('PREDICTION_LOG_BLOCK_TIMEOUT', 0.05))
+    
+    # Statistiques de référence (défaut: model/reference_stats.bin si présent)
+    REFERENCE_STATS_PATH = os.environ.get('REFERENCE_STATS_PATH')
+    
+    # Versions de modèle additionnelles, JSON {nom: {"model", "scaler", "weight"}}
+    MODEL_VERSIONS = json.loads(os.environ.get('MODEL_VERSIONS') or '{}')
+    MODEL_DEFAULT_NAME = os.environ.get('MODEL_DEFAULT_NAME', 'default')
+    MODEL_DEFAULT_WEIGHT = float(os.environ.get('MODEL_DEFAULT_WEIGHT', 1.0))
+    MODEL_MEMORY_CAP_MB = float(os.environ.get('MODEL_MEMORY_CAP_MB', 256))
+    MODEL_ROUTING_HEADER = os.environ.get('MODEL_ROUTING_HEADER', 'X-Model-Version')
+    MODEL_CLIENT_ID_HEADER = os.environ.get('MODEL_CLIENT_ID_HEADER', 'X-Client-Id')
+    
+    # Backend d'inférence: 'sklearn', 'folded' (normalisation repliée dans une
+    # copie du modèle, entrées brutes), 'onnx' (export de export_onnx.py)
+    # ou 'auto' (le plus rapide au démarrage parmi ceux qui concordent avec sklearn)
+    PREDICTION_BACKEND = os.environ.get('PREDICTION_BACKEND', 'sklearn')
+    BACKEND_PARITY_TOLERANCE = float(os.environ.get('BACKEND_PARITY_TOLERANCE', 1e-5))
+    
+    # Budget de threads CPU de l'inférence par worker (n_jobs du modèle,
+    # pools BLAS/OpenMP). INFERENCE_THREADS=0: CPU // (workers x threads);
+    # workers et threads sont exportés par gunicorn.conf.py
+    THREAD_BUDGET_ENABLED = os.environ.get('THREAD_BUDGET_ENABLED', 'True').lower() == 'true'
+    INFERENCE_THREADS = int(os.environ.get('INFERENCE_THREADS', 0))
+    INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', 1))
+    INFERENCE_WORKER_THREADS = int(os.environ.get('INFERENCE_WORKER_THREADS', 1))
+    ONNX_MODEL_PATH = os.environ.get('ONNX_MODEL_PATH')
+    # 0: budget de threads du worker (INFERENCE_THREADS)
+    ONNX_INTRA_OP_THREADS = int(os.environ.get('ONNX_INTRA_OP_THREADS', 0))
+    ONNX_INTER_OP_THREADS = int(os.environ.get('ONNX_INTER_OP_THREADS', 1))
 
 class DevelopmentConfig(Config):
     """Configuration de développement"""
@@ -28,6 +112,7 @@ class ProductionConfig(Config):
     DEBUG = False
     TESTING = False
     ENV = 'production'
+    PREDICTION_CACHE_ENABLED = os.environ.get('PREDICTION_CACHE_ENABLED', 'True').lower() == 'true'
 
 class TestingConfig(Config):
     """Configuration de test"""
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+Export ONNX du modèle servi, normalisation MinMax intégrée
+
+Convertit la forêt (ou un export ANN .npz) et son scaler en un graphe ONNX
+prenant les entrées brutes, puis vérifie la parité avec sklearn sur des
+entrées aléatoires avant d'écrire le fichier lu par le backend ONNX Runtime
+(PREDICTION_BACKEND=onnx).
+
+Utilisation:
+    python export_onnx.py [--model model/modele_non_entraine.pkl] [--output model/model.onnx]
+    python export_onnx.py --model model/ann.npz --output model/ann.onnx
+"""
+import os
+import sys
+import argparse
+import warnings
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+warnings.filterwarnings('ignore')
+
+import joblib
+
+from app.ann import load_model_file
+from app.onnx_backend import OnnxBackend, affine_scaling, export_onnx
+from app.services import PredictionService
+
+N_CATEGORICAL = 3
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--model', default=os.path.join(BASE_DIR, 'model', 'modele_non_entraine.pkl'))
+    parser.add_argument('--scaler', default=os.path.join(BASE_DIR, 'model', 'scaler.pkl'))
+    parser.add_argument('--output', default=os.path.join(BASE_DIR, 'model', 'model.onnx'))
+    parser.add_argument('--parity-rows', type=int, default=20000)
+    parser.add_argument('--tolerance', type=float, default=1e-5,
+                        help="Écart maximal toléré sur les probabilités")
+    return parser.parse_args()
+
+
+def random_raw_inputs(scaler, n_rows: int, seed: int = 0) -> np.ndarray:
+    """Entrées brutes couvrant la plage d'entraînement du scaler (et au-delà)"""
+    rng = np.random.default_rng(seed)
+    span = scaler.data_max_ - scaler.data_min_
+    numeric = rng.uniform(scaler.data_min_ - 0.1 * span, scaler.data_max_ + 0.1 * span,
+                          size=(n_rows, len(span)))
+    categorical = rng.integers(0, 1000, size=(n_rows, N_CATEGORICAL)).astype('float64')
+    return np.hstack([categorical, numeric])
+
+
+def main():
+    args = parse_args()
+    model = load_model_file(args.model)
+    scaler = joblib.load(args.scaler)
+    version = PredictionService._compute_model_version(args.model, args.scaler)
+
+    export_onnx(model, scaler, args.output, n_categorical=N_CATEGORICAL,
+                metadata={'model_version': version, 'source': os.path.basename(args.model)})
+
+    # Parité: même entrée brute, chemin de service (scaler puis float32) contre ONNX
+    raw = random_raw_inputs(scaler, args.parity_rows)
+    scale, offset = affine_scaling(scaler, N_CATEGORICAL)
+    expected = model.predict_proba((raw * scale + offset).astype('float32'))
+    actual = OnnxBackend(args.output).predict_proba(raw)
+    max_diff = float(np.abs(expected - actual).max())
+    mismatches = int((expected.argmax(axis=1) != actual.argmax(axis=1)).sum())
+    print(f"Parité sur {len(raw)} lignes: écart max {max_diff:.2e}, "
+          f"{mismatches} classes différentes")
+    if max_diff > args.tolerance:
+        os.remove(args.output)
+        sys.exit(f"Écart supérieur à {args.tolerance}: export supprimé")
+
+    size_kb = os.path.getsize(args.output) / 1024
+    print(f"Export ONNX (version {version}): {args.output} ({size_kb:.1f} Ko)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Configuration Gunicorn pour la production
+
+Le nombre de workers et de threads est dérivé des CPU disponibles, des
+limites cgroup du conteneur et de l'empreinte mémoire du modèle servi.
+Chaque valeur peut être forcée via une variable d'environnement GUNICORN_*.
+
+L'empreinte est mesurée par le service pendant le préchargement de
+l'application dans le master (mémoire résidente prise par le chargement):
+modèle, backend configuré (copie repliée, session ONNX), shadow, plus les
+versions routées jusqu'à leur plafond. Le modèle n'est chargé qu'une fois. Le nombre de workers, provisoirement borné
+par les CPU, est réduit dans on_starting si la mémoire l'exige.
+
+Utilisation:
+    gunicorn -c gunicorn.conf.py run:app
+"""
+import os
+import random
+
+from app.admission import limits_for_threads
+from app.resources import available_cpus, available_memory_mb
+
+# Mémoire d'un worker hors modèle (interpréteur, Flask, numpy, sklearn)
+WORKER_BASE_MB = float(os.environ.get('GUNICORN_WORKER_BASE_MB', 150))
+# Part de la mémoire disponible que les workers peuvent occuper
+MEMORY_FRACTION = float(os.environ.get('GUNICORN_MEMORY_FRACTION', 0.8))
+
+
+def compute_workers(cpus, memory_mb, footprint_mb):
+    """Un worker par CPU, borné par la mémoire disponible"""
+    per_worker = WORKER_BASE_MB + footprint_mb
+    by_memory = int(memory_mb * MEMORY_FRACTION // per_worker)
+    return max(1, min(cpus, by_memory))
+
+
+CPUS = available_cpus()
+MEMORY_MB = available_memory_mb()
+# Empreinte imposée, sinon mesurée au préchargement (None tant qu'inconnue)
+FOOTPRINT_MB = (float(os.environ['GUNICORN_MODEL_FOOTPRINT_MB'])
+                if 'GUNICORN_MODEL_FOOTPRINT_MB' in os.environ else None)
+WORKERS_FORCED = 'GUNICORN_WORKERS' in os.environ
+
+# Serveur
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('GUNICORN_WORKERS', compute_workers(CPUS, MEMORY_MB, FOOTPRINT_MB or 0)))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+# Quelques threads par worker pour recouvrir les E/S réseau et refuser (429)
+# les requêtes en trop sans les laisser attendre dans la file de Gunicorn
+threads = int(os.environ.get('GUNICORN_THREADS', 4 if worker_class == 'gthread' else 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Budget de threads de l'inférence (config.py, app/thread_budget.py): les
+# workers se partagent les CPU au lieu de lancer chacun un pool par cœur
+os.environ.setdefault('INFERENCE_WORKERS', str(workers))
+os.environ.setdefault('INFERENCE_WORKER_THREADS', str(threads))
+
+# Contrôle d'admission (app/admission.py): en vol + file sous le nombre de
+# threads, sinon la surcharge s'accumule dans la file du worker sans 429
+ADMISSION_IN_FLIGHT, ADMISSION_QUEUE = limits_for_threads(threads)
+os.environ.setdefault('ADMISSION_MAX_IN_FLIGHT', str(ADMISSION_IN_FLIGHT))
+os.environ.setdefault('ADMISSION_MAX_QUEUE', str(ADMISSION_QUEUE))
+
+# Charger l'application (et le modèle) dans le master avant le fork:
+# les pages du modèle sont partagées en copy-on-write entre workers
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True').lower() == 'true'
+MEASURE_FOOTPRINT = preload_app and not WORKERS_FORCED and FOOTPRINT_MB is None
+
+# Logs
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def measured_footprint_mb(server):
+    """Empreinte mesurée par le service préchargé dans le master, None sinon"""
+    try:
+        from app.services import get_prediction_service
+        return get_prediction_service().memory_footprint_mb
+    except Exception as e:
+        server.log.warning(f"Empreinte du modèle non mesurée: {e}")
+        return None
+
+
+def on_starting(server):
+    """Ajuster les workers à l'empreinte mesurée et journaliser les paramètres"""
+    footprint = FOOTPRINT_MB
+    if MEASURE_FOOTPRINT:
+        # Appelé après le préchargement, avant le lancement des workers. Le
+        # budget de threads, calculé pour le nombre provisoire (plus grand),
+        # reste prudent.
+        footprint = measured_footprint_mb(server)
+        if footprint is not None:
+            server.num_workers = compute_workers(CPUS, MEMORY_MB, footprint)
+    elif footprint is None and not WORKERS_FORCED:
+        server.log.warning(
+            "Sans préchargement, workers bornés par les CPU seulement: "
+            "fixer GUNICORN_MODEL_FOOTPRINT_MB ou GUNICORN_WORKERS"
+        )
+    server.log.info(
+        f"Gunicorn: {server.num_workers} workers x {threads} threads ({worker_class}), "
+        f"preload_app={preload_app}, timeout={timeout}s"
+    )
+    server.log.info(
+        f"Ressources: {CPUS} CPU, {MEMORY_MB:.0f} MB disponibles, empreinte modèle "
+        + (f"{footprint:.1f} MB" if footprint is not None else "inconnue")
+    )
+
+
+def post_fork(server, worker):
+    """Réinitialiser l'état propre à chaque worker après le fork"""
+    # Graines aléatoires distinctes par worker
+    random.seed()
+    try:
+        import numpy as np
+        np.random.seed(int.from_bytes(os.urandom(4), 'little'))
+    except ImportError:
+        pass
+
+    # Pools de threads et autres états hérités du master
+    from app.lifecycle import run_after_fork_hooks
+    run_after_fork_hooks()
+
+    server.log.info(f"Worker {worker.pid} initialisé")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+Réentraînement incrémental de la forêt en arrière-plan
+
+Intègre les nouveaux fichiers de mesures étiquetées (CSV/Excel avec la
+colonne Qualite) depuis le dernier point de contrôle: ajoute des arbres avec
+warm_start, valide sur une partie réservée des nouvelles données et publie
+une version dans MODEL_ARTIFACT_DIR. Le processus se place en basse priorité
+(nice) et n'utilise qu'un cœur par défaut pour ne pas ralentir le service.
+
+Utilisation:
+    python retrain_incremental.py --data-dir data/incoming --artifact-dir model/versions
+    python retrain_incremental.py ... --loop 3600   # toutes les heures
+"""
+import os
+import sys
+import time
+import argparse
+import warnings
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+warnings.filterwarnings('ignore')
+
+from app.retraining import run_increment
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data-dir', required=True,
+                        help="Dossier des nouvelles mesures étiquetées")
+    parser.add_argument('--artifact-dir',
+                        default=os.environ.get('MODEL_ARTIFACT_DIR',
+                                               os.path.join(BASE_DIR, 'model', 'versions')),
+                        help="Dossier des versions publiées")
+    parser.add_argument('--base-model', default=os.path.join(BASE_DIR, 'model', 'modele_non_entraine.pkl'))
+    parser.add_argument('--base-scaler', default=os.path.join(BASE_DIR, 'model', 'scaler.pkl'))
+    parser.add_argument('--trees', type=int, default=20, help="Arbres ajoutés par incrément")
+    parser.add_argument('--max-trees', type=int, default=None,
+                        help="Taille maximale de la forêt (retire les plus anciens)")
+    parser.add_argument('--holdout', type=float, default=0.2)
+    parser.add_argument('--max-regression', type=float, default=0.02,
+                        help="Baisse d'exactitude tolérée avant rejet")
+    parser.add_argument('--n-jobs', type=int, default=1)
+    parser.add_argument('--nice', type=int, default=10, help="Incrément de priorité (0: aucun)")
+    parser.add_argument('--loop', type=float, default=None,
+                        help="Relancer toutes les N secondes au lieu d'une seule fois")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.nice and hasattr(os, 'nice'):
+        os.nice(args.nice)
+
+    while True:
+        report = run_increment(
+            data_dir=args.data_dir,
+            artifact_dir=args.artifact_dir,
+            base_model_path=args.base_model,
+            base_scaler_path=args.base_scaler,
+            n_new_trees=args.trees,
+            max_trees=args.max_trees,
+            holdout=args.holdout,
+            max_regression=args.max_regression,
+            n_jobs=args.n_jobs
+        )
+        for name, reason in report.get('invalid_files', {}).items():
+            print(f"Fichier écarté {name}: {reason}")
+        if report['status'] == 'no_data':
+            print("Aucune nouvelle donnée")
+        else:
+            print(f"{report['status']}: {report['rows']} lignes, "
+                  f"{report['trees_before']} -> {report['trees_after']} arbres, "
+                  f"entraînement {report['training_seconds']:.2f} s, "
+                  f"exactitude {report['holdout_before']['accuracy']:.3f} -> "
+                  f"{report['holdout_after']['accuracy']:.3f}")
+            if report.get('artifact'):
+                print(f"Version publiée: {report['artifact']}")
+        if args.loop is None:
+            sys.exit(0 if report['status'] != 'rejected' else 2)
+        time.sleep(args.loop)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,6 +6,30 @@
 // URL de base de l'API
 const API_BASE_URL = '/predict';
 
+// URL de l'export du modèle pour l'inférence locale
+const MODEL_EXPORT_URL = '/predict/model';
+
+// Modèle exporté (null tant qu'il n'est pas chargé: on passe par le serveur)
+let localModel = null;
+
+// Délai d'inactivité avant une prédiction en mode direct (ms)
+const LIVE_DEBOUNCE_MS = 300;
+
+// Nombre de résultats récents gardés en mémoire
+const MEMO_MAX_ENTRIES = 100;
+
+// Clé du schéma mis en cache dans localStorage
+const SCHEMA_STORAGE_KEY = 'nq-api-schema';
+
+// Résultats récents indexés par tuple d'entrée (ordre d'insertion = LRU)
+const predictionMemo = new Map();
+
+// Requête serveur en cours (annulée si une nouvelle prédiction part)
+let pendingController = null;
+
+// Minuteur du mode direct
+let liveTimer = null;
+
 // Exemples de données
 const EXAMPLES = [
     {
@@ -54,21 +78,23 @@ const EXAMPLES = [
  */
 document.addEventListener('DOMContentLoaded', function () {
     // Attacher l'écouteur d'événement sur le formulaire
-    document.getElementById('predictionForm').addEventListener('submit', handleFormSubmit);
+    const form = document.getElementById('predictionForm');
+    form.addEventListener('submit', handleFormSubmit);
+    
+    // Mode direct: prédire à chaque modification (avec debounce)
+    form.addEventListener('input', handleLiveInput);
     
     // Logger que l'app est prête
     console.log('Application Network Quality Prediction chargée');
 });
 
 /**
- * Gérer la soumission du formulaire
+ * Lire le formulaire et convertir les valeurs numériques
  */
-async function handleFormSubmit(event) {
-    event.preventDefault();
-    
-    // Récupérer les données du formulaire
+function readFormData() {
     const formData = new FormData(document.getElementById('predictionForm'));
     const data = Object.fromEntries(formData);
+    delete data.liveMode;
     
     // Convertir les valeurs numériques en nombres
     const numericFields = [
@@ -85,8 +111,102 @@ async function handleFormSubmit(event) {
         }
     });
     
+    return data;
+}
+
+/**
+ * Gérer la soumission du formulaire
+ */
+async function handleFormSubmit(event) {
+    event.preventDefault();
+    clearTimeout(liveTimer);
+    
+    const data = readFormData();
     console.log('Données du formulaire:', data);
     
+    await runPrediction(data, { live: false });
+}
+
+/**
+ * Mode direct: relancer la prédiction après une pause de saisie
+ */
+function handleLiveInput() {
+    const form = document.getElementById('predictionForm');
+    if (!form.elements.liveMode || !form.elements.liveMode.checked) {
+        return;
+    }
+    
+    clearTimeout(liveTimer);
+    liveTimer = setTimeout(() => {
+        // Ne prédire que lorsque tous les champs sont valides
+        if (form.checkValidity()) {
+            runPrediction(readFormData(), { live: true });
+        }
+    }, LIVE_DEBOUNCE_MS);
+}
+
+/**
+ * Clé de mémoïsation: valeurs de l'entrée dans un ordre fixe
+ */
+function memoKey(data) {
+    return JSON.stringify(Object.keys(data).sort().map(field => [field, data[field]]));
+}
+
+/**
+ * Mémoriser un résultat (les plus anciens sont évincés)
+ */
+function rememberResult(key, result) {
+    predictionMemo.delete(key);
+    predictionMemo.set(key, result);
+    if (predictionMemo.size > MEMO_MAX_ENTRIES) {
+        predictionMemo.delete(predictionMemo.keys().next().value);
+    }
+}
+
+/**
+ * Annuler l'appel au serveur en cours, devenu obsolète
+ */
+function cancelPendingPrediction() {
+    if (pendingController) {
+        pendingController.abort();
+        pendingController = null;
+        showLoading(false);
+    }
+}
+
+/**
+ * Prédire: résultat mémorisé, puis modèle local, puis appel au serveur
+ */
+async function runPrediction(data, { live }) {
+    const key = memoKey(data);
+    
+    // Quel que soit le chemin suivi, la réponse d'un appel précédent ne
+    // doit plus remplacer ce résultat
+    cancelPendingPrediction();
+    
+    // Résultat déjà calculé pour ce tuple d'entrée
+    if (predictionMemo.has(key)) {
+        const result = predictionMemo.get(key);
+        rememberResult(key, result);
+        displayResult(result, { scroll: !live });
+        return;
+    }
+    
+    // Prédiction locale dans le navigateur si le modèle est chargé
+    if (localModel) {
+        try {
+            const result = ForestModel.predict(localModel, data);
+            rememberResult(key, result);
+            displayResult(result, { scroll: !live });
+            return;
+        } catch (error) {
+            console.warn('Prédiction locale impossible, appel au serveur:', error);
+        }
+    }
+    
+    const controller = new AbortController();
+    pendingController = controller;
+    
     // Afficher la zone de chargement
     showLoading(true);
     
@@ -97,32 +217,46 @@ async function handleFormSubmit(event) {
             headers: {
                 'Content-Type': 'application/json'
             },
-            body: JSON.stringify(data)
+            body: JSON.stringify(data),
+            signal: controller.signal
         });
         
         // Récupérer les données de réponse
         const responseData = await response.json();
         
+        // Réponse arrivée après une prédiction plus récente: ignorée
+        if (pendingController !== controller) {
+            return;
+        }
+        
         if (response.ok && responseData.success) {
             // Afficher le résultat
-            displayResult(responseData.result);
+            rememberResult(key, responseData.result);
+            displayResult(responseData.result, { scroll: !live });
         } else {
             // Afficher l'erreur
             displayError(responseData.error || 'Erreur inconnue', responseData.message);
         }
     } catch (error) {
+        if (error.name === 'AbortError' || pendingController !== controller) {
+            // Remplacée par une requête plus récente
+            return;
+        }
         console.error('Erreur lors de l\'appel API:', error);
         displayError('Erreur de Connexion', error.message);
     } finally {
-        // Masquer la zone de chargement
-        showLoading(false);
+        if (pendingController === controller) {
+            pendingController = null;
+            // Masquer la zone de chargement
+            showLoading(false);
+        }
     }
 }
 
 /**
  * Afficher les résultats de la prédiction
  */
-function displayResult(result) {
+function displayResult(result, { scroll = true } = {}) {
     // Masquer la zone d'erreur
     document.getElementById('errorSection').style.display = 'none';
     
@@ -147,8 +281,10 @@ function displayResult(result) {
     // Données envoyées
     displayInputData(result.input_features);
     
-    // Scroller vers le résultat
-    scroll_to_result();
+    // Scroller vers le résultat (pas en mode direct, pour ne pas gêner la saisie)
+    if (scroll) {
+        scroll_to_result();
+    }
 }
 
 /**
@@ -261,18 +397,70 @@ function scroll_to_result() {
     resultSection.scrollIntoView({ behavior: 'smooth', block: 'start' });
 }
 
+/**
+ * Lire le schéma mis en cache ({etag, schema}) dans localStorage
+ */
+function readCachedSchema() {
+    try {
+        return JSON.parse(localStorage.getItem(SCHEMA_STORAGE_KEY));
+    } catch (error) {
+        return null;
+    }
+}
+
 /**
  * Mettre à jour le schéma de l'API au chargement
+ * (revalidé par ETag: un 304 réutilise la copie de localStorage)
  */
 async function loadApiSchema() {
+    const cached = readCachedSchema();
     try {
-        const response = await fetch('/predict/schema');
-        const data = await response.json();
-        console.log('Schéma API:', data.schema);
+        const headers = cached && cached.etag ? { 'If-None-Match': cached.etag } : {};
+        const response = await fetch('/predict/schema', { headers, cache: 'no-store' });
+        
+        let schema;
+        if (response.status === 304 && cached) {
+            schema = cached.schema;
+        } else {
+            const data = await response.json();
+            schema = data.schema;
+            const etag = response.headers.get('ETag');
+            if (etag) {
+                try {
+                    localStorage.setItem(SCHEMA_STORAGE_KEY, JSON.stringify({ etag, schema }));
+                } catch (error) {
+                    // Stockage plein ou désactivé: pas de cache
+                }
+            }
+        }
+        console.log('Schéma API:', schema);
+        return schema;
     } catch (error) {
         console.error('Erreur lors du chargement du schéma:', error);
+        return cached ? cached.schema : null;
+    }
+}
+
+/**
+ * Charger le modèle exporté pour prédire sans aller-retour serveur
+ * (en cas d'échec, les prédictions restent faites par l'API)
+ */
+async function loadLocalModel() {
+    if (typeof ForestModel === 'undefined') {
+        return;
+    }
+    try {
+        const response = await fetch(MODEL_EXPORT_URL);
+        if (!response.ok) {
+            return;
+        }
+        localModel = await response.json();
+        console.log('Modèle local chargé (version ' + localModel.model_version + ')');
+    } catch (error) {
+        console.warn('Modèle local indisponible:', error);
     }
 }
 
-// Charger le schéma au démarrage
+// Charger le schéma et le modèle local au démarrage
 loadApiSchema();
+loadLocalModel();
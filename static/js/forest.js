@@ -0,0 +1,120 @@
+/**
+ * Inférence locale de la forêt aléatoire exportée par GET /predict/model
+ * Reproduit exactement PredictionService.predict (encodage, scaler, arbres)
+ */
+
+const ForestModel = (function () {
+
+    // Table CRC32 (polynôme 0xEDB88320, identique à zlib.crc32)
+    const CRC_TABLE = (function () {
+        const table = new Uint32Array(256);
+        for (let n = 0; n < 256; n++) {
+            let c = n;
+            for (let k = 0; k < 8; k++) {
+                c = (c & 1) ? (0xEDB88320 ^ (c >>> 1)) : (c >>> 1);
+            }
+            table[n] = c >>> 0;
+        }
+        return table;
+    })();
+
+    /**
+     * CRC32 des octets UTF-8 d'une chaîne
+     */
+    function crc32(text) {
+        const bytes = new TextEncoder().encode(text);
+        let crc = 0xFFFFFFFF;
+        for (let i = 0; i < bytes.length; i++) {
+            crc = CRC_TABLE[(crc ^ bytes[i]) & 0xFF] ^ (crc >>> 8);
+        }
+        return (crc ^ 0xFFFFFFFF) >>> 0;
+    }
+
+    /**
+     * Construire le vecteur d'entrée (catégories puis numériques scalées)
+     * Chaque valeur est arrondie en float32 comme côté serveur
+     */
+    function buildFeatures(exported, data) {
+        const features = [];
+        for (const column of exported.categorical_columns) {
+            if (data[column] === undefined || data[column] === null) {
+                throw new Error('Colonne manquante: ' + column);
+            }
+            features.push(crc32(String(data[column])) % exported.encoding.modulo);
+        }
+        exported.numeric_columns.forEach((column, j) => {
+            const value = parseFloat(data[column]);
+            if (Number.isNaN(value)) {
+                throw new Error('Valeur numérique invalide: ' + column);
+            }
+            // MinMaxScaler.transform: X *= scale_ puis X += min_
+            let scaled = value * exported.scaler.scale[j];
+            scaled = scaled + exported.scaler.min[j];
+            features.push(Math.fround(scaled));
+        });
+        return features;
+    }
+
+    /**
+     * Parcourir un arbre jusqu'à la feuille
+     */
+    function leafProbabilities(tree, features) {
+        let node = 0;
+        while (tree.f[node] !== -1) {
+            node = features[tree.f[node]] <= tree.t[node] ? tree.l[node] : tree.r[node];
+        }
+        return tree.v[tree.r[node]];
+    }
+
+    /**
+     * Prédire à partir du modèle exporté; même format que la réponse de /predict
+     */
+    function predict(exported, data) {
+        const features = buildFeatures(exported, data);
+        const nClasses = exported.classes.length;
+        const proba = new Array(nClasses).fill(0);
+
+        // Somme dans l'ordre des arbres puis division, comme predict_proba
+        for (const tree of exported.trees) {
+            const leaf = leafProbabilities(tree, features);
+            for (let k = 0; k < nClasses; k++) {
+                proba[k] += leaf[k];
+            }
+        }
+        for (let k = 0; k < nClasses; k++) {
+            proba[k] /= exported.trees.length;
+        }
+
+        let best = 0;
+        for (let k = 1; k < nClasses; k++) {
+            if (proba[k] > proba[best]) {
+                best = k;
+            }
+        }
+        const predictedClass = exported.classes[best];
+
+        const inputFeatures = {};
+        for (const column of exported.numeric_columns.concat(exported.categorical_columns)) {
+            inputFeatures[column] = data[column];
+        }
+
+        return {
+            prediction: exported.target_mapping[String(predictedClass)] || 'Inconnue',
+            predicted_class: predictedClass,
+            confidence: proba[best],
+            probabilities: {
+                'Bonne': proba[0],
+                'Moyenne': proba[1],
+                'Mauvaise': proba[2]
+            },
+            input_features: inputFeatures
+        };
+    }
+
+    return { crc32, buildFeatures, predict };
+})();
+
+// Utilisable aussi depuis Node.js (test de parité)
+if (typeof module !== 'undefined' && module.exports) {
+    module.exports = ForestModel;
+}
@@ -5,11 +5,19 @@ import pytest
 import json
 import sys
 import os
+import time
+import threading
+
+import numpy as np
 
 # Ajouter le répertoire parent au path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from run import app
+from app.best_config import ResultCache
+from app.cache import SharedPredictionCache
+from app.coalescing import SingleFlight
+from app.services import get_prediction_service, WARMUP_SAMPLE
 
 
 @pytest.fixture
@@ -31,6 +39,52 @@ class TestHealthEndpoint:
         assert data['status'] == 'healthy'
 
 
+class TestReadyEndpoint:
+    """Tests pour l'endpoint /ready"""
+    
+    def test_ready_after_warmup(self, client):
+        """Tester que /ready répond une fois le warmup terminé"""
+        response = client.get('/ready')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['status'] == 'ready'
+        assert data['load_duration_ms'] >= 0
+        assert data['warmup_duration_ms'] >= 0
+    
+    def test_not_ready_before_warmup_finishes(self, client, monkeypatch):
+        """Tester que /ready répond 503 tant que le warmup n'est pas terminé"""
+        from app.services import PredictionService
+        service = get_prediction_service()
+        monkeypatch.setattr(PredictionService, '_instance', None)
+        response = client.get('/ready')
+        assert response.status_code == 503
+        assert json.loads(response.data)['status'] == 'not_ready'
+        monkeypatch.undo()
+        
+        # Warmup en cours: bloqué dans la première prédiction
+        started, release = threading.Event(), threading.Event()
+        original = service._predict_proba
+        
+        def blocking_predict(*args, **kwargs):
+            started.set()
+            release.wait(5)
+            return original(*args, **kwargs)
+        
+        monkeypatch.setattr(service, 'warmup_duration', None)
+        monkeypatch.setattr(service, '_predict_proba', blocking_predict)
+        warmup = threading.Thread(target=service.warmup, kwargs={'iterations': 1})
+        warmup.start()
+        try:
+            assert started.wait(5)
+            response = client.get('/ready')
+            assert response.status_code == 503
+            assert json.loads(response.data)['status'] == 'not_ready'
+        finally:
+            release.set()
+            warmup.join(5)
+        assert client.get('/ready').status_code == 200
+
+
 class TestSchemaEndpoint:
     """Tests pour l'endpoint /predict/schema"""
     
@@ -45,6 +99,53 @@ class TestSchemaEndpoint:
         assert 'categorical_fields' in data['schema']
 
 
+class TestHttpCaching:
+    """Tests pour le cache HTTP (ETag, assets versionnés)"""
+    
+    def test_schema_etag_not_modified(self, client):
+        """Tester le 304 sur le schéma avec If-None-Match"""
+        response = client.get('/predict/schema')
+        etag = response.headers['ETag']
+        assert not etag.startswith('W/')
+        cached = client.get('/predict/schema', headers={'If-None-Match': etag})
+        assert cached.status_code == 304
+        assert cached.data == b''
+    
+    def test_index_etag_not_modified(self, client):
+        """Tester le 304 sur la page d'accueil avec If-None-Match"""
+        response = client.get('/')
+        assert response.status_code == 200
+        cached = client.get('/', headers={'If-None-Match': response.headers['ETag']})
+        assert cached.status_code == 304
+    
+    def test_hashed_asset_precompressed(self, client, tmp_path):
+        """Tester le service d'une variante gzip d'un asset versionné"""
+        import gzip
+        static_dir = tmp_path / 'dist' / 'js'
+        static_dir.mkdir(parents=True)
+        content = b'console.log("ok");' * 50
+        (static_dir / 'app.abc.js').write_bytes(content)
+        (static_dir / 'app.abc.js.gz').write_bytes(gzip.compress(content))
+        
+        saved_folder = app.static_folder
+        saved_assets = app.extensions['hashed_assets']
+        app.static_folder = str(tmp_path)
+        app.extensions['hashed_assets'] = {'dist/js/app.abc.js': {'gzip'}}
+        try:
+            response = client.get('/static/dist/js/app.abc.js',
+                                  headers={'Accept-Encoding': 'gzip'})
+            assert response.headers['Content-Encoding'] == 'gzip'
+            assert 'immutable' in response.headers['Cache-Control']
+            assert gzip.decompress(response.data) == content
+            
+            plain = client.get('/static/dist/js/app.abc.js')
+            assert 'Content-Encoding' not in plain.headers
+            assert plain.data == content
+        finally:
+            app.static_folder = saved_folder
+            app.extensions['hashed_assets'] = saved_assets
+
+
 class TestPredictEndpoint:
     """Tests pour l'endpoint /predict"""
     
@@ -133,6 +234,1661 @@ class TestPredictEndpoint:
         assert prediction in ["Bonne", "Moyenne", "Mauvaise"]
 
 
+class TestPredictionService:
+    """Tests pour le service de prédiction"""
+    
+    def test_predict_batch_matches_predict(self):
+        """Tester que le lot donne les mêmes résultats que l'appel unitaire"""
+        service = get_prediction_service()
+        other = dict(WARMUP_SAMPLE, **{"Latence (ms)": 150, "Type réseau": "3G"})
+        batch = service.predict_batch([WARMUP_SAMPLE, other])
+        assert batch[0] == service.predict(WARMUP_SAMPLE)
+        assert batch[1] == service.predict(other)
+
+
+class TestSharedPredictionCache:
+    """Tests pour le cache de prédictions partagé"""
+    
+    def test_put_get_roundtrip(self, tmp_path):
+        """Tester qu'une entrée écrite est relue à l'identique"""
+        cache = SharedPredictionCache(str(tmp_path / 'cache.bin'), 64, 'v1')
+        key = np.arange(8, dtype='float32').tobytes()
+        proba = np.array([0.2, 0.3, 0.5])
+        assert cache.get(key) is None
+        cache.put(key, proba)
+        assert np.array_equal(cache.get(key), proba)
+    
+    def test_shared_between_instances(self, tmp_path):
+        """Tester que deux attachements au même fichier partagent les entrées"""
+        path = str(tmp_path / 'cache.bin')
+        writer = SharedPredictionCache(path, 64, 'v1')
+        reader = SharedPredictionCache(path, 64, 'v1')
+        key = np.ones(8, dtype='float32').tobytes()
+        writer.put(key, np.array([1.0, 0.0, 0.0]))
+        assert reader.get(key) is not None
+    
+    def test_new_model_version_invalidates(self, tmp_path):
+        """Tester l'invalidation lors d'un changement de version du modèle"""
+        path = str(tmp_path / 'cache.bin')
+        old = SharedPredictionCache(path, 64, 'v1')
+        key = np.ones(8, dtype='float32').tobytes()
+        old.put(key, np.array([1.0, 0.0, 0.0]))
+        new = SharedPredictionCache(path, 64, 'v2')
+        assert new.get(key) is None
+        assert old.get(key) is None
+    
+    def test_segment_never_truncated(self, tmp_path):
+        """Tester qu'un autre nombre d'entrées n'écrase pas un segment mappé"""
+        path = str(tmp_path / 'cache.bin')
+        old = SharedPredictionCache(path, 64, 'v1')
+        key = np.ones(8, dtype='float32').tobytes()
+        old.put(key, np.array([1.0, 0.0, 0.0]))
+        other = SharedPredictionCache(path, 128, 'v1')
+        assert other.path != old.path
+        assert os.path.getsize(old.path) == old.size
+        assert old.get(key) is not None
+        
+        # Segment de taille inattendue sous le nom attendu: cache privé
+        with open(other.path, 'r+b') as f:
+            f.truncate(other.size + 64)
+        fallback = SharedPredictionCache(path, 128, 'v1')
+        assert fallback.private
+        assert os.path.getsize(other.path) == other.size + 64
+        fallback.put(key, np.array([0.0, 1.0, 0.0]))
+        assert np.array_equal(fallback.get(key), [0.0, 1.0, 0.0])
+    
+    def test_bounded_with_eviction(self, tmp_path):
+        """Tester que le nombre d'entrées reste borné"""
+        cache = SharedPredictionCache(str(tmp_path / 'cache.bin'), 16, 'v1')
+        for i in range(200):
+            cache.put(np.full(8, i, dtype='float32').tobytes(), np.array([0.1, 0.2, 0.7]))
+        assert cache.stats()['used'] <= 16
+    
+    def test_service_results_identical_with_cache(self, tmp_path):
+        """Tester que les résultats servis depuis le cache sont identiques"""
+        service = get_prediction_service()
+        expected = service.predict(WARMUP_SAMPLE)
+        service.cache = SharedPredictionCache(
+            str(tmp_path / 'cache.bin'), 64, service.model_version
+        )
+        try:
+            assert service.predict(WARMUP_SAMPLE) == expected  # miss
+            assert service.predict(WARMUP_SAMPLE) == expected  # hit
+            assert service.cache.stats()['used'] == 1
+        finally:
+            service.cache = None
+
+
+class TestCoalescing:
+    """Tests pour le regroupement des requêtes identiques"""
+    
+    def test_concurrent_duplicates_share_one_computation(self):
+        """Tester que des appels concurrents identiques ne calculent qu'une fois"""
+        flight = SingleFlight()
+        calls = []
+        results = []
+        
+        def compute():
+            calls.append(1)
+            time.sleep(0.05)
+            return 42
+        
+        threads = [
+            threading.Thread(target=lambda: results.append(flight.do('k', compute)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert len(calls) == 1
+        assert [value for value, _ in results] == [42] * 8
+        assert sum(shared for _, shared in results) == 7
+    
+    def test_coalesced_predictions_in_metrics(self, client):
+        """Tester que les prédictions coalescées apparaissent dans /metrics"""
+        service = get_prediction_service()
+        original = service._predict_proba
+        
+        def slow_predict_proba(X, raw=None):
+            time.sleep(0.05)
+            return original(X, raw)
+        
+        service._predict_proba = slow_predict_proba
+        try:
+            results = []
+            threads = [
+                threading.Thread(target=lambda: results.append(service.predict(WARMUP_SAMPLE)))
+                for _ in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            del service._predict_proba
+        
+        assert all(result == results[0] for result in results)
+        data = json.loads(client.get('/metrics').data)
+        assert data['counters']['predictions_coalesced'] >= 1
+
+
+class TestAdmissionControl:
+    """Tests pour le contrôle d'admission"""
+    
+    def test_sheds_when_queue_full(self):
+        """Tester le refus immédiat quand la file est pleine"""
+        from app.admission import AdmissionController, Overloaded
+        controller = AdmissionController(max_in_flight=1, max_queue=0, max_wait=1.0)
+        with controller.admit():
+            with pytest.raises(Overloaded) as excinfo:
+                with controller.admit():
+                    pass
+        assert excinfo.value.retry_after >= 1
+    
+    def test_queued_request_runs_when_slot_frees(self):
+        """Tester qu'une requête en file passe dès qu'une place se libère"""
+        from app.admission import AdmissionController
+        controller = AdmissionController(max_in_flight=1, max_queue=4, max_wait=2.0)
+        done = []
+        
+        def worker():
+            with controller.admit():
+                done.append(True)
+        
+        with controller.admit():
+            thread = threading.Thread(target=worker)
+            thread.start()
+            time.sleep(0.05)
+            assert controller.queued == 1
+        thread.join()
+        assert done == [True]
+    
+    def test_predict_returns_429_with_retry_after(self, client):
+        """Tester la réponse 429 de /predict en cas de surcharge"""
+        from app.admission import AdmissionController
+        saved = app.extensions['admission']
+        app.extensions['admission'] = AdmissionController(max_in_flight=1, max_queue=0)
+        try:
+            with app.extensions['admission'].admit():
+                response = client.post(
+                    '/predict',
+                    data=json.dumps(WARMUP_SAMPLE),
+                    content_type='application/json'
+                )
+        finally:
+            app.extensions['admission'] = saved
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) >= 1
+        data = json.loads(client.get('/metrics').data)
+        assert data['counters']['requests_shed'] >= 1
+    
+    def test_gunicorn_defaults_shed_before_threads_exhausted(self, monkeypatch):
+        """Tester les limites par défaut sous Gunicorn: 429 avant d'épuiser les threads"""
+        import runpy
+        from concurrent.futures import ThreadPoolExecutor
+        from app.admission import AdmissionController
+        environ = {key: value for key, value in os.environ.items()
+                   if not key.startswith(('ADMISSION_', 'GUNICORN_', 'INFERENCE_'))}
+        environ['GUNICORN_MODEL_FOOTPRINT_MB'] = '0'
+        monkeypatch.setattr(os, 'environ', environ)
+        conf = runpy.run_path(os.path.join(os.path.dirname(__file__), 'gunicorn.conf.py'))
+        threads = conf['threads']
+        in_flight, queue = int(environ['ADMISSION_MAX_IN_FLIGHT']), int(environ['ADMISSION_MAX_QUEUE'])
+        assert in_flight + queue < threads
+        
+        service = get_prediction_service()
+        original = service._predict_proba
+        
+        def slow_predict_proba(X, raw=None):
+            time.sleep(0.2)
+            return original(X, raw)
+        
+        def post(i):
+            with app.test_client() as client:
+                start = time.perf_counter()
+                response = client.post('/predict', json=dict(WARMUP_SAMPLE, **{'Latence (ms)': 10.5 + i}))
+                return response.status_code, time.perf_counter() - start
+        
+        saved = app.extensions['admission']
+        app.extensions['admission'] = AdmissionController.from_config(
+            {'ADMISSION_MAX_IN_FLIGHT': in_flight, 'ADMISSION_MAX_QUEUE': queue}
+        )
+        service._predict_proba = slow_predict_proba
+        try:
+            # Un worker gthread: au plus threads requêtes exécutées à la fois
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                outcomes = list(pool.map(post, range(3 * threads)))
+        finally:
+            del service._predict_proba
+            app.extensions['admission'] = saved
+        statuses = [status for status, _ in outcomes]
+        assert statuses.count(200) >= in_flight
+        assert 429 in statuses
+        assert max(elapsed for status, elapsed in outcomes if status == 429) < 0.2
+    
+    def test_streamed_response_holds_slot_until_closed(self, client):
+        """Tester qu'un corps produit en flux occupe sa place jusqu'à la fermeture"""
+        from app.admission import AdmissionController
+        saved = app.extensions['admission']
+        controller = app.extensions['admission'] = AdmissionController(max_in_flight=1, max_queue=0)
+        try:
+            response = client.post('/predict/batch', json=[WARMUP_SAMPLE] * 100, buffered=False)
+            assert response.is_streamed
+            assert controller.in_flight == 1
+            assert client.post('/predict', json=WARMUP_SAMPLE).status_code == 429
+            assert json.loads(response.get_data())['count'] == 100
+            assert controller.in_flight == 0
+            response.close()
+            assert controller.in_flight == 0
+        finally:
+            app.extensions['admission'] = saved
+
+
+class TestBatchEndpoint:
+    """Tests pour l'endpoint /predict/batch et la compression"""
+    
+    def test_batch_matches_single_predictions(self, client):
+        """Tester que le lot renvoie les mêmes résultats que /predict"""
+        records = [WARMUP_SAMPLE, dict(WARMUP_SAMPLE, **{"Latence (ms)": 150})]
+        response = client.post('/predict/batch', json={'records': records})
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['count'] == 2
+        for record, result in zip(records, data['results']):
+            single = json.loads(client.post('/predict', json=record).data)
+            assert result == single['result']
+    
+    def test_large_batch_gzip_streamed(self, client):
+        """Tester la compression gzip d'une réponse volumineuse"""
+        import gzip
+        response = client.post(
+            '/predict/batch',
+            json=[WARMUP_SAMPLE] * 100,
+            headers={'Accept-Encoding': 'gzip'}
+        )
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.headers['Content-Encoding'] == 'gzip'
+        data = json.loads(gzip.decompress(response.data))
+        assert data['count'] == 100
+    
+    def test_encoding_negotiated_by_quality(self, monkeypatch):
+        """Tester le choix gzip/zstd selon les valeurs q d'Accept-Encoding"""
+        from app import compression
+        monkeypatch.setattr(compression, 'zstandard', compression.zstandard or object())
+        cases = {
+            'gzip;q=1, zstd;q=0.1': 'gzip',
+            'gzip;q=0.5, zstd': 'zstd',
+            'gzip, zstd': 'zstd',
+            'zstd;q=0, gzip': 'gzip',
+            'br': None,
+        }
+        for header, expected in cases.items():
+            with app.test_request_context(headers={'Accept-Encoding': header}):
+                assert compression.negotiate_encoding() == expected, header
+    
+    def test_small_response_not_compressed(self, client):
+        """Tester qu'une petite réponse n'est pas compressée"""
+        response = client.post(
+            '/predict/batch',
+            json=[WARMUP_SAMPLE],
+            headers={'Accept-Encoding': 'gzip'}
+        )
+        assert 'Content-Encoding' not in response.headers
+    
+    def test_gzip_request_body(self, client):
+        """Tester l'envoi d'un corps de requête compressé"""
+        import gzip
+        body = gzip.compress(json.dumps(WARMUP_SAMPLE).encode('utf-8'))
+        response = client.post(
+            '/predict',
+            data=body,
+            headers={'Content-Encoding': 'gzip', 'Content-Type': 'application/json'}
+        )
+        assert response.status_code == 200
+    
+    def test_deflate_request_body_zlib_and_raw(self, client):
+        """Tester 'deflate' au format zlib comme en deflate brut (sans en-tête)"""
+        import zlib
+        payload = json.dumps({'records': [WARMUP_SAMPLE] * 3}).encode('utf-8')
+        raw = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+        for body in (zlib.compress(payload), raw.compress(payload) + raw.flush()):
+            response = client.post(
+                '/predict/batch',
+                data=body,
+                headers={'Content-Encoding': 'deflate', 'Content-Type': 'application/json'}
+            )
+            assert response.status_code == 200
+            assert json.loads(response.data)['count'] == 3
+        response = client.post(
+            '/predict',
+            data=b'not deflate',
+            headers={'Content-Encoding': 'deflate', 'Content-Type': 'application/json'}
+        )
+        assert response.status_code == 400
+    
+    def test_unsupported_request_encoding(self, client):
+        """Tester le refus d'un encodage de requête inconnu"""
+        response = client.post(
+            '/predict',
+            data=b'xx',
+            headers={'Content-Encoding': 'compress', 'Content-Type': 'application/json'}
+        )
+        assert response.status_code == 415
+
+
+class TestModelExport:
+    """Tests pour l'export du modèle et l'inférence dans le navigateur"""
+    
+    @pytest.fixture
+    def random_inputs(self):
+        """Entrées aléatoires couvrant les catégories connues et inconnues"""
+        rng = np.random.default_rng(0)
+        operators = ["Orange", "Vodafone", "Maroc Telecom", "Opérateur-é"]
+        records = []
+        for _ in range(200):
+            records.append({
+                "Opérateur": str(rng.choice(operators)),
+                "Quartier": str(rng.choice(["Centre", "Tahrir", "Souissi"])),
+                "Type réseau": str(rng.choice(["5G", "4G", "3G", "WiFi"])),
+                "Download (Mbps)": float(rng.uniform(0, 300)),
+                "Upload (Mbps)": float(rng.uniform(0, 200)),
+                "Latence (ms)": float(rng.uniform(1, 250)),
+                "Jitter (ms)": float(rng.uniform(0, 50)),
+                "Loss (%)": float(rng.uniform(0, 10))
+            })
+        return records
+    
+    def test_export_etag(self, client):
+        """Tester l'export et sa revalidation par ETag"""
+        response = client.get('/predict/model')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['format'] == 'nq-forest-v1'
+        assert len(data['trees']) == len(get_prediction_service().model.estimators_)
+        cached = client.get('/predict/model', headers={'If-None-Match': response.headers['ETag']})
+        assert cached.status_code == 304
+    
+    def test_js_parity(self, client, random_inputs, tmp_path):
+        """Tester que forest.js donne exactement les probabilités du serveur"""
+        import shutil
+        import subprocess
+        node = shutil.which('node')
+        if node is None:
+            pytest.skip("Node.js non disponible")
+        
+        (tmp_path / 'model.json').write_bytes(client.get('/predict/model').data)
+        (tmp_path / 'inputs.json').write_text(json.dumps(random_inputs))
+        forest_js = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'js', 'forest.js')
+        script = (
+            "const fs = require('fs');"
+            f"const F = require({json.dumps(forest_js)});"
+            "const m = JSON.parse(fs.readFileSync(process.argv[1]));"
+            "const inputs = JSON.parse(fs.readFileSync(process.argv[2]));"
+            "console.log(JSON.stringify(inputs.map(d => F.predict(m, d))));"
+        )
+        output = subprocess.run(
+            [node, '-e', script, str(tmp_path / 'model.json'), str(tmp_path / 'inputs.json')],
+            capture_output=True, text=True, check=True
+        ).stdout
+        
+        expected = get_prediction_service().predict_batch(random_inputs)
+        assert json.loads(output) == json.loads(json.dumps(expected))
+
+
+class TestDriftMonitoring:
+    """Tests pour les statistiques de dérive des entrées"""
+    
+    def test_out_of_range_and_categories(self):
+        """Tester les compteurs hors plage et les fréquences catégoriques"""
+        from app.drift import DriftMonitor
+        service = get_prediction_service()
+        monitor = DriftMonitor(
+            service.categorical_columns, service.numeric_columns, service.scaler,
+            service.categorical_vocabulary, service._encode_category, buffer_rows=4
+        )
+        outlier = dict(WARMUP_SAMPLE, **{"Latence (ms)": 10000, "Opérateur": "Inconnu"})
+        for record in [WARMUP_SAMPLE] * 9 + [outlier]:
+            monitor.observe(service.preprocess_batch([record]))
+        
+        snapshot = monitor.snapshot()
+        assert snapshot['count'] == 10
+        latency = snapshot['numeric']['Latence (ms)']
+        assert latency['above_training_max'] == 1
+        assert latency['out_of_range_rate'] == pytest.approx(0.1)
+        assert latency['quantiles']['p50'] == pytest.approx(10, abs=1.0)
+        operators = snapshot['categorical']['Opérateur']
+        assert operators['top']['Orange'] == 9
+        assert operators['unknown_rate'] == pytest.approx(0.1)
+    
+    def test_pending_rows_of_all_threads_merged(self):
+        """Tester la fusion par lignes, par snapshot() et par le thread de fond"""
+        from app.drift import DriftMonitor
+        service = get_prediction_service()
+        args = (service.categorical_columns, service.numeric_columns, service.scaler,
+                service.categorical_vocabulary, service._encode_category)
+        
+        # Lot plus grand que buffer_rows: fusionné aussitôt
+        monitor = DriftMonitor(*args, buffer_rows=8, flush_interval=60)
+        monitor.observe(service.preprocess_batch([WARMUP_SAMPLE] * 10))
+        assert monitor.count == 10
+        
+        # Tampons d'autres threads (terminés ou non) vus par snapshot()
+        monitor = DriftMonitor(*args, buffer_rows=1000, flush_interval=60)
+        X = service.preprocess_batch([WARMUP_SAMPLE] * 3)
+        threads = [threading.Thread(target=monitor.observe, args=(X,)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert monitor.count == 0
+        assert monitor.snapshot()['count'] == 12
+        assert monitor._buffers == []
+        
+        # Trafic arrêté: fusion périodique sans nouvel appel
+        monitor = DriftMonitor(*args, buffer_rows=1000, flush_interval=0.02)
+        monitor.observe(X)
+        deadline = time.monotonic() + 2
+        while monitor.count < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert monitor.count == 3
+    
+    def test_drift_endpoint(self, client):
+        """Tester l'endpoint /stats/drift"""
+        client.post('/predict', json=WARMUP_SAMPLE)
+        response = client.get('/stats/drift')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['drift']['count'] >= 1
+        assert set(data['drift']['numeric']) == set(get_prediction_service().numeric_columns)
+
+
+class TestShadowModel:
+    """Tests pour l'évaluation d'un modèle shadow"""
+    
+    def test_identical_shadow_agrees(self):
+        """Tester un shadow identique au modèle principal: accord total"""
+        from app.shadow import ShadowEvaluator
+        service = get_prediction_service()
+        shadow = ShadowEvaluator(service.model, sample_rate=1.0)
+        X = service.preprocess_batch([WARMUP_SAMPLE] * 5)
+        shadow.submit(X, service.model.predict_proba(X))
+        shadow.wait_idle()
+        stats = shadow.stats()
+        assert stats['evaluated'] == 5
+        assert stats['agreement_rate'] == 1.0
+        assert stats['max_abs_delta'] == [0.0, 0.0, 0.0]
+        assert stats['latency_ms_per_row']['mean'] > 0
+    
+    def test_full_queue_drops_instead_of_blocking(self):
+        """Tester l'abandon des copies quand la file est pleine"""
+        from app.shadow import ShadowEvaluator
+        release = threading.Event()
+        
+        class BlockedModel:
+            def predict_proba(self, X):
+                release.wait()
+                return np.zeros((X.shape[0], 3))
+        
+        shadow = ShadowEvaluator(BlockedModel(), sample_rate=1.0, queue_size=1)
+        X = np.zeros((1, 8), dtype='float32')
+        start = time.perf_counter()
+        for _ in range(10):
+            shadow.submit(X, np.zeros((1, 3)))
+        assert time.perf_counter() - start < 0.5
+        assert shadow.dropped >= 8
+        release.set()
+        shadow.wait_idle()
+    
+    def test_concurrent_drops_all_counted(self):
+        """Tester le décompte des abandons par des threads concurrents"""
+        from app.shadow import ShadowEvaluator
+        release = threading.Event()
+        
+        class BlockedModel:
+            def predict_proba(self, X):
+                release.wait()
+                return np.zeros((X.shape[0], 3))
+        
+        shadow = ShadowEvaluator(BlockedModel(), sample_rate=1.0, queue_size=1)
+        X = np.zeros((1, 8), dtype='float32')
+        
+        def submit_many():
+            for _ in range(2000):
+                shadow.submit(X, np.zeros((1, 3)))
+        
+        threads = [threading.Thread(target=submit_many) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        release.set()
+        shadow.wait_idle()
+        stats = shadow.stats()
+        assert stats['dropped'] + stats['evaluated'] == 8 * 2000
+    
+    def test_shadow_endpoint(self, client, tmp_path):
+        """Tester l'endpoint /stats/shadow avec un modèle chargé"""
+        import joblib
+        service = get_prediction_service()
+        path = tmp_path / 'shadow.pkl'
+        joblib.dump(service.model, path)
+        service.load_shadow_model(str(path), sample_rate=1.0)
+        try:
+            client.post('/predict', json=WARMUP_SAMPLE)
+            service.shadow.wait_idle()
+            data = json.loads(client.get('/stats/shadow').data)
+            assert data['shadow']['evaluated'] == 1
+            assert data['shadow']['agreement_rate'] == 1.0
+        finally:
+            service.shadow = None
+        assert client.get('/stats/shadow').status_code == 404
+
+
+class TestModelRouting:
+    """Tests pour le routage entre versions de modèle"""
+    
+    @pytest.fixture
+    def router_service(self, tmp_path):
+        """Service avec une version 'v2' (50 premiers arbres du modèle par défaut)"""
+        import copy
+        import joblib
+        service = get_prediction_service()
+        variant = copy.deepcopy(service.model)
+        variant.estimators_ = variant.estimators_[:50]
+        variant.n_estimators = 50
+        joblib.dump(variant, tmp_path / 'v2.pkl')
+        service.setup_router({'v2': {'model': str(tmp_path / 'v2.pkl'), 'weight': 1.0}})
+        try:
+            yield service
+        finally:
+            service.router = None
+    
+    def test_header_and_sticky_routing(self, router_service):
+        """Tester le choix explicite, la stabilité par client et l'en-tête inconnu"""
+        router = router_service.router
+        assert router.route({'X-Model-Version': 'v2'}) == 'v2'
+        assert len({router.route({'X-Client-Id': 'client-42'}) for _ in range(20)}) == 1
+        chosen = {router.route({'X-Client-Id': f'client-{i}'}) for i in range(200)}
+        assert chosen == {'default', 'v2'}
+        with pytest.raises(ValueError):
+            router.route({'X-Model-Version': 'inconnue'})
+    
+    def test_trees_shared_between_versions(self, router_service):
+        """Tester le partage des arbres communs et la mémoire par version"""
+        router = router_service.router
+        v2 = router.get('v2')
+        assert all(a is b for a, b in zip(v2.model.estimators_, router_service.model.estimators_))
+        stats = router.stats()
+        assert stats['loaded']['v2']['exclusive_bytes'] == 0
+        assert stats['loaded']['default']['shared_bytes'] == stats['loaded']['v2']['memory_bytes']
+        assert stats['memory_bytes'] == stats['loaded']['default']['memory_bytes']
+    
+    def test_concurrent_get_counts_and_lru(self, router_service):
+        """Tester get() concurrent: compteurs exacts et ordre LRU cohérent"""
+        router = router_service.router
+        router.get('v2')
+        before = {name: router._loaded[name].requests for name in ('default', 'v2')}
+        
+        def worker(name):
+            for _ in range(500):
+                router.get(name)
+        
+        threads = [threading.Thread(target=worker, args=(name,))
+                   for name in ('default', 'v2') * 4]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for name in ('default', 'v2'):
+            assert router._loaded[name].requests == before[name] + 2000
+        router.get('default')
+        assert list(router._loaded)[-1] == 'default'
+    
+    def test_cold_load_does_not_block_other_versions(self, router_service, tmp_path, monkeypatch):
+        """Tester un chargement lent: autres versions servies, un seul chargement partagé"""
+        from app import router as router_module
+        from app.router import ModelRouter
+        service = router_service
+        router = ModelRouter({'v2': {'model': str(tmp_path / 'v2.pkl'), 'weight': 1.0}},
+                             default='default')
+        router.register('default', service.model, service.scaler, 'x', pinned=True)
+        release, loads = threading.Event(), []
+        original = router_module.load_model_file
+        
+        def slow_load(path):
+            loads.append(path)
+            release.wait(5)
+            return original(path)
+        
+        monkeypatch.setattr(router_module, 'load_model_file', slow_load)
+        entries = []
+        threads = [threading.Thread(target=lambda: entries.append(router.get('v2')))
+                   for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        while not loads:
+            time.sleep(0.01)
+        start = time.perf_counter()
+        assert router.get('default').name == 'default'
+        assert time.perf_counter() - start < 0.5
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert len(loads) == 1
+        assert len({id(entry) for entry in entries}) == 1
+        assert router._loaded['v2'].requests == 3
+    
+    def test_routed_prediction_endpoint(self, client, router_service):
+        """Tester /predict et /models avec une version choisie par en-tête"""
+        response = client.post('/predict', json=WARMUP_SAMPLE,
+                               headers={'X-Model-Version': 'v2'})
+        assert response.status_code == 200
+        assert response.headers['X-Model-Version'] == 'v2'
+        result = json.loads(response.data)['result']
+        assert result['model_version'] == 'v2'
+        X = router_service.preprocess_batch([WARMUP_SAMPLE])
+        expected = router_service.router.get('v2').model.predict_proba(X)[0]
+        assert result['probabilities']['Bonne'] == pytest.approx(expected[0])
+        
+        bad = client.post('/predict', json=WARMUP_SAMPLE, headers={'X-Model-Version': 'v9'})
+        assert bad.status_code == 400
+        
+        data = json.loads(client.get('/models').data)
+        assert set(data['models']['loaded']) == {'default', 'v2'}
+    
+    def test_lru_eviction_under_memory_cap(self, router_service, tmp_path):
+        """Tester l'éviction de la version la moins récente, jamais du défaut"""
+        import copy
+        import joblib
+        from app.router import ModelRouter
+        service = router_service
+        specs = {}
+        for name, start in (('a', 0), ('b', 50)):
+            variant = copy.deepcopy(service.model)
+            # Arbres distincts du modèle par défaut (seuils décalés)
+            for estimator in variant.estimators_:
+                estimator.tree_.threshold[:] += start + 1
+            joblib.dump(variant, tmp_path / f'{name}.pkl')
+            specs[name] = {'model': str(tmp_path / f'{name}.pkl'), 'weight': 0}
+        base = ModelRouter({}, default='default')
+        base.register('default', service.model, service.scaler, 'x', pinned=True)
+        router = ModelRouter(specs, default='default',
+                             memory_cap_bytes=int(base.memory_bytes() * 2.5))
+        router.register('default', service.model, service.scaler, 'x', pinned=True)
+        router.get('a')
+        router.get('b')
+        loaded = set(router.stats()['loaded'])
+        assert loaded == {'default', 'b'}
+        assert router.get('a').model is not None
+        assert set(router.stats()['loaded']) == {'default', 'a'}
+    
+    def test_models_endpoint_disabled(self, client):
+        """Tester /models sans routeur configuré"""
+        assert client.get('/models').status_code == 404
+
+
+class TestExplanations:
+    """Tests pour les contributions par variable"""
+    
+    def test_contributions_sum_to_probabilities(self):
+        """Tester biais + contributions = predict_proba, ligne par ligne"""
+        from app.explain import ForestExplainer
+        service = get_prediction_service()
+        records = [WARMUP_SAMPLE, dict(WARMUP_SAMPLE, **{"Latence (ms)": 400, "Loss (%)": 8})]
+        X = service.preprocess_batch(records)
+        bias, contributions = ForestExplainer(service.model).explain(X)
+        np.testing.assert_allclose(bias + contributions.sum(axis=1),
+                                   service.model.predict_proba(X), atol=1e-12)
+    
+    def test_predict_with_explanation(self, client):
+        """Tester /predict?explain=true et /predict/batch?explain=true"""
+        response = client.post('/predict?explain=true', json=WARMUP_SAMPLE)
+        result = json.loads(response.data)['result']
+        explanation = result['explanation']
+        service = get_prediction_service()
+        assert set(explanation['contributions']) == set(
+            service.categorical_columns + service.numeric_columns
+        )
+        for label, probability in result['probabilities'].items():
+            total = explanation['base'][label] + sum(
+                c[label] for c in explanation['contributions'].values()
+            )
+            assert total == pytest.approx(probability, abs=1e-9)
+        
+        plain = json.loads(client.post('/predict', json=WARMUP_SAMPLE).data)['result']
+        assert 'explanation' not in plain
+        
+        batch = json.loads(client.post('/predict/batch?explain=1',
+                                       json=[WARMUP_SAMPLE] * 3).data)
+        assert all('explanation' in r for r in batch['results'])
+
+
+class TestReferenceStats:
+    """Tests pour les statistiques de référence mappées"""
+    
+    @pytest.fixture
+    def dataset(self):
+        """Petit jeu de mesures synthétique au format du fichier d'entraînement"""
+        import pandas as pd
+        rng = np.random.default_rng(0)
+        n = 300
+        df = pd.DataFrame({
+            "Opérateur": rng.choice(["Orange", "Vodafone"], n),
+            "Quartier": rng.choice(["Centre", "Tahrir"], n),
+            "Type réseau": rng.choice(["4G", "5G"], n),
+            "Qualite": rng.choice(["Bonne", "Moyenne", "Mauvaise"], n)
+        })
+        for col in get_prediction_service().numeric_columns:
+            df[col] = rng.random(n) * 100
+        return df
+    
+    @pytest.fixture
+    def reference_service(self, dataset, tmp_path):
+        """Service avec une table de référence construite pour le test"""
+        from app.reference import ReferenceStats
+        from build_reference_stats import (
+            CATEGORICAL_COLUMNS, NUMERIC_COLUMNS, TARGET_COLUMN, build_reference_table
+        )
+        path = str(tmp_path / 'reference.bin')
+        build_reference_table(dataset, path, CATEGORICAL_COLUMNS, NUMERIC_COLUMNS, TARGET_COLUMN)
+        service = get_prediction_service()
+        service.reference = ReferenceStats(path)
+        try:
+            yield service
+        finally:
+            service.reference = None
+    
+    def test_lookup_matches_pandas(self, reference_service, dataset):
+        """Tester la table contre une agrégation pandas directe"""
+        reference = reference_service.reference
+        subset = dataset[(dataset["Opérateur"] == "Orange") & (dataset["Quartier"] == "Centre")
+                         & (dataset["Type réseau"] == "5G")]
+        stats = reference.lookup({"Opérateur": "orange", "Quartier": "Centre", "Type réseau": "5G"})
+        assert stats['count'] == len(subset)
+        latency = stats['metrics']['Latence (ms)']
+        assert latency['mean'] == pytest.approx(subset["Latence (ms)"].mean())
+        assert latency['p90'] == pytest.approx(subset["Latence (ms)"].quantile(0.9))
+        assert stats['class_distribution']['Bonne'] == pytest.approx(
+            (subset["Qualite"] == "Bonne").mean()
+        )
+        # Dimensions absentes: toutes les valeurs
+        assert reference.lookup({})['count'] == len(dataset)
+        assert reference.lookup({"Opérateur": "Vodafone"})['count'] == int(
+            (dataset["Opérateur"] == "Vodafone").sum()
+        )
+        assert reference.lookup({"Opérateur": "Inconnu"}) is None
+    
+    def test_reference_endpoint_and_context(self, client, reference_service):
+        """Tester GET /reference et le bloc context de /predict"""
+        response = client.get('/reference?Opérateur=Orange&Type réseau=4G')
+        assert response.status_code == 200
+        assert json.loads(response.data)['reference']['count'] > 0
+        assert client.get('/reference?Opérateur=Inconnu').status_code == 404
+        
+        result = json.loads(client.post('/predict?context=true', json=WARMUP_SAMPLE).data)['result']
+        assert result['context']['count'] > 0
+        assert 'Download (Mbps)' in result['context']['metrics']
+    
+    def test_reference_endpoint_without_table(self, client):
+        """Tester /reference quand la table n'a pas été construite"""
+        service = get_prediction_service()
+        if service.reference is None:
+            assert client.get('/reference').status_code == 404
+
+
+class TestPredictionLog:
+    """Tests pour le journal des prédictions"""
+    
+    def test_roundtrip_with_rotation(self, tmp_path):
+        """Tester l'écriture par lots, la rotation et la relecture en NumPy"""
+        from app.prediction_log import PredictionLog, read_prediction_log, list_segments
+        log = PredictionLog(str(tmp_path), n_features=8, n_classes=3, capacity=512,
+                            flush_rows=64, segment_rows=100, policy='block', block_timeout=1.0)
+        X = np.arange(8, dtype='float32').reshape(1, 8)
+        for i in range(300):
+            log.append(X + i, np.full((1, 3), i / 300), 'v1')
+        log.close()
+        
+        assert log.dropped == 0
+        assert len(list_segments(str(tmp_path))) == 3
+        blocks = list(read_prediction_log(str(tmp_path)))
+        features = np.concatenate([b['features'] for b in blocks])
+        assert features.shape == (300, 8)
+        np.testing.assert_array_equal(features[:, 0], np.arange(300, dtype='float32'))
+        assert set(np.concatenate([b['model_version'] for b in blocks])) == {b'v1'}
+        
+        only = next(read_prediction_log(str(tmp_path), columns=['probabilities']))
+        assert set(only) == {'probabilities'}
+    
+    def test_drop_policy_never_blocks(self, tmp_path):
+        """Tester l'abandon des lignes quand le tampon est plein"""
+        from app.prediction_log import PredictionLog
+        log = PredictionLog(str(tmp_path), n_features=8, n_classes=3, capacity=16,
+                            flush_rows=16, flush_interval=60, policy='drop')
+        # Écrivain bloqué: le tampon ne se vide pas
+        with log._io_lock:
+            start = time.perf_counter()
+            for _ in range(100):
+                log.append(np.zeros((1, 8), dtype='float32'), np.zeros((1, 3)), 'v1')
+            assert time.perf_counter() - start < 0.5
+            assert log.dropped > 0
+        log.close()
+        assert log.written + log.dropped == 100
+    
+    def test_service_logs_predictions(self, client, tmp_path):
+        """Tester l'enregistrement des prédictions de /predict et /predict/batch"""
+        from app.prediction_log import PredictionLog, read_prediction_log
+        service = get_prediction_service()
+        service.prediction_log = PredictionLog(str(tmp_path), n_features=8, n_classes=3)
+        try:
+            client.post('/predict', json=WARMUP_SAMPLE)
+            client.post('/predict/batch', json=[WARMUP_SAMPLE] * 4)
+            service.prediction_log.close()
+        finally:
+            service.prediction_log = None
+        blocks = list(read_prediction_log(str(tmp_path)))
+        versions = np.concatenate([b['model_version'] for b in blocks])
+        assert len(versions) == 5
+        assert versions[0].decode() == service.model_version
+
+
+class TestIncrementalRetraining:
+    """Tests pour le réentraînement incrémental"""
+    
+    @staticmethod
+    def _write_measurements(path, n=240, seed=0):
+        import pandas as pd
+        rng = np.random.default_rng(seed)
+        df = pd.DataFrame({
+            "Opérateur": rng.choice(["Orange", "Vodafone"], n),
+            "Quartier": rng.choice(["Centre", "Tahrir"], n),
+            "Type réseau": rng.choice(["4G", "5G"], n),
+            "Download (Mbps)": rng.random(n) * 100,
+            "Upload (Mbps)": rng.random(n) * 50,
+            "Latence (ms)": rng.random(n) * 200,
+            "Jitter (ms)": rng.random(n) * 20,
+            "Loss (%)": rng.random(n) * 5
+        })
+        df["Qualite"] = np.where(df["Latence (ms)"] < 60, "Bonne",
+                                 np.where(df["Latence (ms)"] < 130, "Moyenne", "Mauvaise"))
+        df.to_csv(path, index=False)
+    
+    def test_grow_retire_and_publish(self, tmp_path):
+        """Tester l'ajout d'arbres, le retrait des plus anciens et la publication"""
+        import joblib
+        from app.retraining import run_increment, latest_artifact
+        base = os.path.join(os.path.dirname(__file__), 'model')
+        data_dir = tmp_path / 'data'
+        data_dir.mkdir()
+        artifacts = str(tmp_path / 'versions')
+        self._write_measurements(data_dir / 'batch1.csv')
+        
+        kwargs = dict(data_dir=str(data_dir), artifact_dir=artifacts,
+                      base_model_path=os.path.join(base, 'modele_non_entraine.pkl'),
+                      base_scaler_path=os.path.join(base, 'scaler.pkl'),
+                      n_new_trees=10, max_trees=105, max_regression=1.0, random_state=0)
+        report = run_increment(**kwargs)
+        assert report['status'] == 'published'
+        assert (report['trees_before'], report['trees_after']) == (100, 105)
+        assert report['training_seconds'] >= 0
+        
+        artifact = latest_artifact(artifacts)
+        model = joblib.load(os.path.join(artifact, 'model.pkl'))
+        original = joblib.load(os.path.join(base, 'modele_non_entraine.pkl'))
+        # Les 5 plus anciens retirés, les suivants conservés à l'identique
+        np.testing.assert_array_equal(model.estimators_[0].tree_.threshold,
+                                      original.estimators_[5].tree_.threshold)
+        
+        # Point de contrôle: rien de nouveau au second passage
+        assert run_increment(**kwargs)['status'] == 'no_data'
+        self._write_measurements(data_dir / 'batch2.csv', seed=1)
+        second = run_increment(**kwargs)
+        assert second['parent'] == os.path.basename(artifact)
+    
+    def test_rejects_regression(self, tmp_path):
+        """Tester le rejet d'un incrément qui dégrade la validation"""
+        from app.retraining import run_increment, latest_artifact
+        base = os.path.join(os.path.dirname(__file__), 'model')
+        data_dir = tmp_path / 'data'
+        data_dir.mkdir()
+        self._write_measurements(data_dir / 'batch.csv')
+        report = run_increment(str(data_dir), str(tmp_path / 'versions'),
+                               os.path.join(base, 'modele_non_entraine.pkl'),
+                               os.path.join(base, 'scaler.pkl'),
+                               n_new_trees=1, max_regression=-1.0, random_state=0)
+        assert report['status'] == 'rejected'
+        assert latest_artifact(str(tmp_path / 'versions')) is None
+        
+        # Lot rejeté noté au point de contrôle: pas de nouvel essai (--loop)
+        # tant que le fichier n'est pas modifié
+        retry = run_increment(str(data_dir), str(tmp_path / 'versions'),
+                              os.path.join(base, 'modele_non_entraine.pkl'),
+                              os.path.join(base, 'scaler.pkl'),
+                              n_new_trees=1, max_regression=1.0)
+        assert retry['status'] == 'no_data'
+    
+    def test_invalid_files_rejected_without_stopping(self, tmp_path):
+        """Tester qu'un fichier illisible ou à classe inconnue est écarté et noté"""
+        import pandas as pd
+        import joblib
+        from app.retraining import run_increment, grow_forest, load_checkpoint
+        base = os.path.join(os.path.dirname(__file__), 'model')
+        data_dir = tmp_path / 'data'
+        data_dir.mkdir()
+        artifacts = str(tmp_path / 'versions')
+        kwargs = dict(data_dir=str(data_dir), artifact_dir=artifacts,
+                      base_model_path=os.path.join(base, 'modele_non_entraine.pkl'),
+                      base_scaler_path=os.path.join(base, 'scaler.pkl'),
+                      n_new_trees=1, max_regression=1.0, random_state=0)
+        
+        # Seulement un fichier illisible: pas d'exception (--loop continue)
+        (data_dir / 'corrompu.xlsx').write_bytes(b'pas un classeur')
+        report = run_increment(**kwargs)
+        assert report['status'] == 'no_data'
+        assert list(report['invalid_files']) == ['corrompu.xlsx']
+        assert len(load_checkpoint(artifacts)['rejected']) == 1
+        
+        self._write_measurements(data_dir / 'bon.csv')
+        self._write_measurements(data_dir / 'inconnue.csv', n=40, seed=2)
+        unknown = pd.read_csv(data_dir / 'inconnue.csv')
+        unknown.loc[0, 'Qualite'] = '7'
+        unknown.to_csv(data_dir / 'inconnue.csv', index=False)
+        report = run_increment(**kwargs)
+        assert report['status'] == 'published'
+        assert report['files'] == ['bon.csv']
+        assert 'inconnues' in report['invalid_files']['inconnue.csv']
+        assert len(load_checkpoint(artifacts)['rejected']) == 2
+        assert run_increment(**kwargs)['status'] == 'no_data'
+        
+        model = joblib.load(os.path.join(base, 'modele_non_entraine.pkl'))
+        y = np.append(np.resize(model.classes_, 29), 7)
+        with pytest.raises(ValueError, match='inconnues'):
+            grow_forest(model, np.zeros((30, 8), dtype='float32'), y, n_new_trees=1)
+
+
+class TestDatasetCache:
+    """Tests pour le cache colonnes des jeux de mesures"""
+    
+    def test_typed_cache_projection_and_invalidation(self, tmp_path):
+        """Tester les types, la projection mappée et l'invalidation par contenu"""
+        from app.dataset import load_columns, load_dataset
+        source = tmp_path / 'mesures.csv'
+        TestIncrementalRetraining._write_measurements(source, n=50)
+        with open(source, 'a') as f:
+            f.write('Orange,Centre,4G,abc,1,1,1,1,Bonne\n')  # métrique invalide
+        cache_dir = str(tmp_path / 'cache')
+        
+        df = load_dataset(str(source), cache_dir=cache_dir)
+        assert len(df) == 50
+        assert str(df['Opérateur'].dtype) == 'category'
+        assert df['Latence (ms)'].dtype == np.float32
+        
+        projected = load_columns(str(source), ['Latence (ms)'], cache_dir=cache_dir)
+        assert list(projected) == ['Latence (ms)']
+        assert isinstance(projected['Latence (ms)'], np.memmap)
+        np.testing.assert_array_equal(projected['Latence (ms)'], df['Latence (ms)'].to_numpy())
+        
+        # Nouveau contenu: nouveau dossier de cache
+        TestIncrementalRetraining._write_measurements(source, n=20, seed=3)
+        os.utime(source, ns=(1, 1))
+        assert len(load_dataset(str(source), cache_dir=cache_dir)) == 20
+        assert len([d for d in os.listdir(cache_dir) if d.startswith('mesures-')]) == 2
+    
+    def test_dataset_columns_not_copied(self, tmp_path, monkeypatch):
+        """Tester que le DataFrame réutilise les colonnes mappées (aucune copie)"""
+        from app import dataset
+        source = tmp_path / 'mesures.csv'
+        TestIncrementalRetraining._write_measurements(source, n=50)
+        mapped = {}
+        original_load = np.load
+        
+        def spy_load(path, *args, **kwargs):
+            array = original_load(path, *args, **kwargs)
+            mapped[os.path.basename(path)[:-len('.npy')]] = array
+            return array
+        
+        monkeypatch.setattr(dataset.np, 'load', spy_load)
+        df = dataset.load_dataset(str(source), cache_dir=str(tmp_path / 'cache'))
+        assert set(mapped) == set(df.columns)
+        for col in dataset.NUMERIC_COLUMNS:
+            assert isinstance(mapped[col], np.memmap)
+            assert np.shares_memory(df[col].to_numpy(), mapped[col])
+        for col in dataset.CATEGORICAL_COLUMNS + [dataset.TARGET_COLUMN]:
+            assert np.shares_memory(df[col].array.codes, mapped[col])
+
+
+class TestANNExport:
+    """Tests pour l'inférence NumPy des poids exportés par train_ann.py"""
+    
+    @staticmethod
+    def _random_ann():
+        from app.ann import ANNModel
+        rng = np.random.default_rng(0)
+        shapes = [(8, 128), (128, 32), (32, 3)]
+        return ANNModel([rng.normal(size=s) for s in shapes],
+                        [rng.normal(size=s[1]) for s in shapes],
+                        ['relu', 'relu', 'softmax'], [0, 1, 2])
+    
+    def test_roundtrip_and_forward_pass(self, tmp_path):
+        """Tester l'export .npz et le passage avant contre un calcul direct"""
+        from app.ann import load_model_file
+        model = self._random_ann()
+        path = str(tmp_path / 'ann.npz')
+        model.save(path)
+        loaded = load_model_file(path)
+        
+        X = get_prediction_service().preprocess_batch([WARMUP_SAMPLE] * 2)
+        hidden = np.maximum(X @ model.kernels[0] + model.biases[0], 0)
+        hidden = np.maximum(hidden @ model.kernels[1] + model.biases[1], 0)
+        logits = hidden @ model.kernels[2] + model.biases[2]
+        expected = np.exp(logits - logits.max(axis=1, keepdims=True))
+        expected /= expected.sum(axis=1, keepdims=True)
+        np.testing.assert_allclose(loaded.predict_proba(X), expected, rtol=1e-5)
+        np.testing.assert_allclose(loaded.predict_proba(X).sum(axis=1), 1.0, rtol=1e-6)
+    
+    def test_ann_as_routed_version(self, client, tmp_path):
+        """Tester un export ANN servi comme version routée"""
+        service = get_prediction_service()
+        path = str(tmp_path / 'ann.npz')
+        self._random_ann().save(path)
+        service.setup_router({'ann': {'model': path, 'weight': 0}})
+        try:
+            response = client.post('/predict', json=WARMUP_SAMPLE,
+                                   headers={'X-Model-Version': 'ann'})
+            result = json.loads(response.data)['result']
+            assert result['model_version'] == 'ann'
+            assert sum(result['probabilities'].values()) == pytest.approx(1.0)
+        finally:
+            service.router = None
+
+
+class TestOnnxBackend:
+    """Tests pour l'export ONNX et le backend ONNX Runtime"""
+    
+    @pytest.fixture
+    def onnx_path(self, tmp_path):
+        pytest.importorskip('onnxruntime')
+        pytest.importorskip('skl2onnx')
+        from app.onnx_backend import export_onnx
+        service = get_prediction_service()
+        path = str(tmp_path / 'model.onnx')
+        export_onnx(service.model, service.scaler, path,
+                    metadata={'model_version': service.model_version})
+        return path
+    
+    @staticmethod
+    def _records(n):
+        rng = np.random.default_rng(0)
+        return [dict(WARMUP_SAMPLE, **{
+            "Opérateur": str(rng.choice(["Orange", "Vodafone", "Maroc Telecom"])),
+            "Download (Mbps)": float(rng.uniform(0, 600)),
+            "Latence (ms)": float(rng.uniform(0, 300)),
+            "Loss (%)": float(rng.uniform(0, 10))
+        }) for _ in range(n)]
+    
+    def test_parity_with_sklearn(self, onnx_path):
+        """Tester les probabilités ONNX (entrées brutes) contre sklearn"""
+        from app.onnx_backend import OnnxBackend
+        service = get_prediction_service()
+        X, raw = service.preprocess_batch(self._records(2000), return_raw=True)
+        backend = OnnxBackend(onnx_path)
+        expected = service.model.predict_proba(X)
+        actual = backend.predict_proba(raw)
+        np.testing.assert_allclose(actual, expected, atol=1e-6)
+        assert (actual.argmax(axis=1) == expected.argmax(axis=1)).all()
+        assert backend.classes_.tolist() == service.model.classes_.tolist()
+    
+    def test_thresholds_rounded_down(self, onnx_path):
+        """Tester les entrées situées exactement sur un seuil arrondi en float32"""
+        from app.onnx_backend import OnnxBackend, affine_scaling
+        service = get_prediction_service()
+        base = service.preprocess_batch([WARMUP_SAMPLE])[0]
+        rows = []
+        for estimator in service.model.estimators_[:20]:
+            tree = estimator.tree_
+            for feature, threshold in zip(tree.feature, tree.threshold):
+                if feature >= 0 and float(np.float32(threshold)) > threshold:
+                    row = base.copy()
+                    row[feature] = np.float32(threshold)
+                    rows.append(row)
+        X = np.array(rows, dtype='float32')
+        scale, offset = affine_scaling(service.scaler, len(service.categorical_columns))
+        raw = (X.astype('float64') - offset) / scale
+        exact = ((raw * scale + offset).astype('float32') == X).all(axis=1)
+        np.testing.assert_allclose(OnnxBackend(onnx_path).predict_proba(raw[exact]),
+                                   service.model.predict_proba(X[exact]), atol=1e-6)
+    
+    def test_ann_export_folds_scaling(self, tmp_path):
+        """Tester l'export ANN: normalisation repliée dans la première couche"""
+        pytest.importorskip('onnxruntime')
+        from app.onnx_backend import OnnxBackend, export_onnx
+        service = get_prediction_service()
+        model = TestANNExport._random_ann()
+        path = str(tmp_path / 'ann.onnx')
+        export_onnx(model, service.scaler, path)
+        X, raw = service.preprocess_batch(self._records(50), return_raw=True)
+        np.testing.assert_allclose(OnnxBackend(path).predict_proba(raw),
+                                   model.predict_proba(X), atol=1e-4)
+    
+    def test_service_uses_onnx_backend(self, client, onnx_path):
+        """Tester /predict et /predict/batch servis par ONNX Runtime"""
+        from app import services
+        service = get_prediction_service()
+        services._settings.update(PREDICTION_BACKEND='onnx', ONNX_MODEL_PATH=onnx_path)
+        try:
+            service._setup_backend()
+            assert service.backend.name == 'onnx'
+            records = self._records(5)
+            X = service.preprocess_batch(records)
+            expected = service.model.predict_proba(X)
+            batch = json.loads(client.post('/predict/batch', json=records).data)
+            for result, proba in zip(batch['results'], expected):
+                assert result['probabilities']['Bonne'] == pytest.approx(proba[0], abs=1e-6)
+            single = json.loads(client.post('/predict', json=records[0]).data)['result']
+            assert single['probabilities']['Mauvaise'] == pytest.approx(expected[0][2], abs=1e-6)
+        finally:
+            services._settings.pop('PREDICTION_BACKEND')
+            services._settings.pop('ONNX_MODEL_PATH')
+            service._setup_backend()
+    
+    def test_stale_export_ignored(self, onnx_path, tmp_path):
+        """Tester qu'un export d'une autre version du modèle n'est pas servi"""
+        from app import services
+        from app.onnx_backend import export_onnx
+        service = get_prediction_service()
+        stale = str(tmp_path / 'stale.onnx')
+        export_onnx(service.model, service.scaler, stale, metadata={'model_version': 'autre'})
+        services._settings.update(PREDICTION_BACKEND='onnx', ONNX_MODEL_PATH=stale)
+        try:
+            service._setup_backend()
+            assert service.backend.name == 'sklearn'
+        finally:
+            services._settings.pop('PREDICTION_BACKEND')
+            services._settings.pop('ONNX_MODEL_PATH')
+            service._setup_backend()
+
+
+class TestInferenceBackends:
+    """Tests pour le registre de backends et la sélection automatique"""
+    
+    @pytest.fixture
+    def extra_backends(self):
+        """Backends de test: un faux (probabilités uniformes), un lent ligne à ligne"""
+        from app import backends
+        
+        class UniformBackend(backends.InferenceBackend):
+            def __init__(self, model):
+                self.classes_ = model.classes_
+            
+            def predict_proba(self, inputs):
+                return np.full((len(inputs), len(self.classes_)), 1 / len(self.classes_))
+        
+        class RowByRowBackend(backends.SklearnBackend):
+            batching = False
+            thread_safe = False
+            
+            def predict_proba(self, inputs):
+                assert len(inputs) == 1
+                return super().predict_proba(inputs)
+        
+        backends.register_backend('uniform')(lambda service, settings: UniformBackend(service.model))
+        backends.register_backend('row')(lambda service, settings: RowByRowBackend(service.model))
+        try:
+            yield
+        finally:
+            backends._factories.pop('uniform')
+            backends._factories.pop('row')
+    
+    def test_declared_capabilities(self, extra_backends):
+        """Tester les lots découpés et la sérialisation selon les capacités"""
+        from app.backends import create_backend
+        service = get_prediction_service()
+        backend = create_backend('row', service, {})
+        assert backend.capabilities() == {'batching': False, 'thread_safe': False,
+                                          'raw_inputs': False}
+        X = service.preprocess_batch([WARMUP_SAMPLE] * 4)
+        classes, probabilities = backend.predict(X)
+        np.testing.assert_allclose(probabilities, service.model.predict_proba(X))
+        assert classes.tolist() == service.model.predict(X).tolist()
+        with pytest.raises(ValueError):
+            create_backend('inconnu', service, {})
+    
+    def test_auto_selection_requires_parity(self, extra_backends):
+        """Tester que le mode auto écarte un backend rapide mais faux"""
+        from app.backends import select_backend
+        service = get_prediction_service()
+        backend, report = select_backend(service, {}, candidates=['sklearn', 'uniform', 'row'],
+                                         batch_sizes=(1, 16), repeat=2)
+        assert report['uniform']['parity_passed'] is False
+        assert 'timings_ms' not in report['uniform']
+        assert report['sklearn']['parity_passed'] and report['row']['parity_passed']
+        assert backend.name in ('sklearn', 'row')
+        assert set(report['sklearn']['timings_ms']) == {'1', '16'}
+    
+    def test_auto_mode_in_service(self, client):
+        """Tester PREDICTION_BACKEND=auto: choix rapporté sur /ready, prédictions inchangées"""
+        from app import services
+        service = get_prediction_service()
+        expected = json.loads(client.post('/predict', json=WARMUP_SAMPLE).data)['result']
+        services._settings['PREDICTION_BACKEND'] = 'auto'
+        try:
+            service._setup_backend()
+            data = json.loads(client.get('/ready').data)
+            assert data['backend'] == service.backend.name
+            assert data['backend_selection']['sklearn']['parity_passed'] is True
+            result = json.loads(client.post('/predict', json=WARMUP_SAMPLE).data)['result']
+            assert result['prediction'] == expected['prediction']
+            for label, probability in expected['probabilities'].items():
+                assert result['probabilities'][label] == pytest.approx(probability, abs=1e-5)
+        finally:
+            services._settings.pop('PREDICTION_BACKEND')
+            service._setup_backend()
+
+
+class TestServiceInitialization:
+    """Tests pour l'initialisation concurrente et le fork du service"""
+    
+    @pytest.fixture
+    def cold_service_class(self):
+        """Singleton remis à zéro, restauré après le test"""
+        from app.services import PredictionService
+        original = PredictionService._instance
+        PredictionService._instance = None
+        try:
+            yield PredictionService
+        finally:
+            PredictionService._instance = original
+    
+    def test_concurrent_cold_requests_load_once(self, cold_service_class, monkeypatch):
+        """Tester 16 premières requêtes simultanées: un seul chargement du modèle"""
+        loads = []
+        original_load = cold_service_class._load_model_and_scaler
+        
+        def slow_load(self):
+            loads.append(threading.get_ident())
+            time.sleep(0.05)
+            original_load(self)
+        
+        monkeypatch.setattr(cold_service_class, '_load_model_and_scaler', slow_load)
+        barrier = threading.Barrier(16)
+        results, errors = [], []
+        
+        def cold_request():
+            barrier.wait()
+            try:
+                service = get_prediction_service()
+                results.append((service, service.predict(WARMUP_SAMPLE)['prediction']))
+            except Exception as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=cold_request) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert errors == []
+        assert len(loads) == 1
+        assert len({id(service) for service, _ in results}) == 1
+        assert len({prediction for _, prediction in results}) == 1
+    
+    def test_footprint_measured_at_load_includes_router_cap(self, cold_service_class, monkeypatch):
+        """Tester l'empreinte mesurée au chargement, versions routées comprises"""
+        from app import services
+        plain = cold_service_class()
+        assert plain.memory_footprint_mb is not None and plain.memory_footprint_mb >= 0
+        cold_service_class._instance = None
+        monkeypatch.setitem(services._settings, 'MODEL_VERSIONS',
+                            {'v2': {'model': '/absent/v2.pkl', 'weight': 0}})
+        monkeypatch.setitem(services._settings, 'MODEL_MEMORY_CAP_MB', 64)
+        routed = cold_service_class()
+        default_mb = routed.router.memory_bytes() / (1024 * 1024)
+        assert routed.memory_footprint_mb >= 64 - default_mb
+    
+    def test_gunicorn_sizes_workers_from_preloaded_footprint(self, monkeypatch):
+        """Tester la réduction des workers d'après l'empreinte mesurée au préchargement"""
+        import runpy
+        import logging
+        environ = {key: value for key, value in os.environ.items()
+                   if not key.startswith(('ADMISSION_', 'GUNICORN_', 'INFERENCE_'))}
+        monkeypatch.setattr(os, 'environ', environ)
+        conf = runpy.run_path(os.path.join(os.path.dirname(__file__), 'gunicorn.conf.py'))
+        assert conf['MEASURE_FOOTPRINT']
+        service = get_prediction_service()
+        monkeypatch.setattr(service, 'memory_footprint_mb', conf['MEMORY_MB'])
+        
+        class Server:
+            log = logging.getLogger('gunicorn.test')
+            num_workers = conf['workers']
+        
+        server = Server()
+        conf['on_starting'](server)
+        assert server.num_workers == 1
+    
+    def test_scratch_buffers_are_per_thread(self):
+        """Tester des prétraitements concurrents de lots différents"""
+        service = get_prediction_service()
+        records = {
+            size: [dict(WARMUP_SAMPLE, **{"Latence (ms)": float(size + i)}) for i in range(size)]
+            for size in (1, 7, 64, 300)
+        }
+        expected = {size: service.preprocess_batch(batch) for size, batch in records.items()}
+        mismatches = []
+        
+        def worker(size):
+            for _ in range(50):
+                X, raw = service.preprocess_batch(records[size], return_raw=True)
+                if not np.array_equal(X, expected[size]) or len(raw) != size:
+                    mismatches.append(size)
+        
+        threads = [threading.Thread(target=worker, args=(size,)) for size in records]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert mismatches == []
+    
+    @pytest.mark.skipif(not hasattr(os, 'fork'), reason="fork indisponible")
+    def test_worker_usable_after_fork(self):
+        """Tester un fork pendant que le verrou d'initialisation est tenu"""
+        from app.lifecycle import run_after_fork_hooks
+        from app.services import PredictionService
+        service = get_prediction_service()
+        with PredictionService._init_lock:
+            pid = os.fork()
+            if pid == 0:
+                status = 1
+                try:
+                    run_after_fork_hooks()
+                    if PredictionService._init_lock.acquire(timeout=1):
+                        PredictionService._init_lock.release()
+                        service.predict(WARMUP_SAMPLE)
+                        service.predict_batch([WARMUP_SAMPLE] * 3)
+                        status = 0
+                finally:
+                    os._exit(status)
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+
+
+class TestThreadBudget:
+    """Tests pour le budget de threads d'inférence par worker"""
+    
+    def test_budget_from_cpus_and_workers(self):
+        """Tester la répartition des cœurs entre workers et threads de requête"""
+        from app.thread_budget import ThreadBudget, compute_budget
+        assert compute_budget(8, 4) == 2
+        assert compute_budget(16, 2, 2) == 4
+        assert compute_budget(2, 4, 2) == 1
+        assert ThreadBudget(workers=4, cpus=8).threads == 2
+        assert ThreadBudget(threads=3, workers=4, cpus=8).threads == 3
+    
+    def test_budget_applied_and_reported(self, client, tmp_path):
+        """Tester n_jobs remplacé (modèle servi et versions routées) et /metrics"""
+        import copy
+        import joblib
+        service = get_prediction_service()
+        budget = service.thread_budget
+        assert service.model.n_jobs == budget.threads
+        
+        variant = copy.deepcopy(service.model)
+        variant.n_jobs = -1
+        joblib.dump(variant, tmp_path / 'v2.pkl')
+        service.setup_router({'v2': {'model': str(tmp_path / 'v2.pkl'), 'weight': 0}})
+        try:
+            assert service.router.get('v2').model.n_jobs == budget.threads
+        finally:
+            service.router = None
+        
+        data = json.loads(client.get('/metrics').data)
+        report = data['thread_budget']
+        assert report['threads'] == budget.threads
+        assert report['cpus'] >= 1 and report['workers'] >= 1
+        assert all(pool['num_threads'] <= budget.threads for pool in report['threadpools'])
+
+
+class TestSweep:
+    """Tests pour le balayage "what-if" d'une ou deux métriques"""
+    
+    def test_surface_matches_individual_predictions(self, client, monkeypatch):
+        """Tester une surface 2D évaluée en un appel, identique aux prédictions unitaires"""
+        service = get_prediction_service()
+        calls = []
+        original = service._infer
+        monkeypatch.setattr(service, '_infer',
+                            lambda X, raw: calls.append(len(X)) or original(X, raw))
+        response = client.post('/predict/sweep', json={
+            'base': WARMUP_SAMPLE,
+            'sweep': [
+                {'feature': 'Latence (ms)', 'start': 5, 'stop': 400, 'steps': 12},
+                {'feature': 'Loss (%)', 'start': 0, 'stop': 10, 'steps': 7}
+            ]
+        })
+        assert response.status_code == 200
+        sweep = json.loads(response.data)['sweep']
+        assert calls == [84]
+        assert sweep['shape'] == [12, 7]
+        assert sweep['axes']['Latence (ms)'][-1] == 400
+        
+        monkeypatch.undo()
+        for i, j in ((0, 0), (5, 3), (11, 6)):
+            record = dict(WARMUP_SAMPLE, **{
+                'Latence (ms)': sweep['axes']['Latence (ms)'][i],
+                'Loss (%)': sweep['axes']['Loss (%)'][j]
+            })
+            expected = service.predict_batch([record])[0]
+            for label, probability in expected['probabilities'].items():
+                assert sweep['probabilities'][label][i][j] == pytest.approx(probability, abs=1e-6)
+            assert sweep['predicted_class'][i][j] == expected['predicted_class']
+    
+    def test_single_axis_curve(self, client):
+        """Tester une courbe 1D (axe donné comme objet)"""
+        response = client.post('/predict/sweep', json={
+            'base': WARMUP_SAMPLE,
+            'sweep': {'feature': 'Download (Mbps)', 'start': 1, 'stop': 500, 'steps': 20}
+        })
+        sweep = json.loads(response.data)['sweep']
+        assert sweep['shape'] == [20]
+        assert all(len(curve) == 20 for curve in sweep['probabilities'].values())
+        totals = np.sum([sweep['probabilities'][label] for label in sweep['classes']], axis=0)
+        np.testing.assert_allclose(totals, 1.0, atol=1e-5)
+    
+    def test_invalid_sweeps_rejected(self, client):
+        """Tester la grille plafonnée et les axes invalides"""
+        too_large = [{'feature': 'Latence (ms)', 'start': 0, 'stop': 1, 'steps': 100},
+                     {'feature': 'Jitter (ms)', 'start': 0, 'stop': 1, 'steps': 100}]
+        invalid = [
+            too_large,
+            [{'feature': 'Opérateur', 'start': 0, 'stop': 1}],
+            [{'feature': 'Latence (ms)', 'start': 0, 'stop': 1}] * 2,
+            [{'feature': 'Latence (ms)', 'start': 0, 'stop': 1, 'steps': 1}],
+            []
+        ]
+        for axes in invalid:
+            response = client.post('/predict/sweep', json={'base': WARMUP_SAMPLE, 'sweep': axes})
+            assert response.status_code == 400
+        assert client.post('/predict/sweep', json={'base': WARMUP_SAMPLE}).status_code == 400
+    
+    def test_oversized_steps_rejected_before_allocation(self, client, monkeypatch):
+        """Tester un nombre de pas démesuré: 400 sans construire la grille"""
+        calls = []
+        original = np.linspace
+        monkeypatch.setattr(np, 'linspace', lambda *args, **kwargs: calls.append(args) or original(*args, **kwargs))
+        for axes in ([{'feature': 'Latence (ms)', 'start': 0, 'stop': 1, 'steps': 10 ** 9}],
+                     [{'feature': 'Latence (ms)', 'start': 0, 'stop': 1, 'steps': 2 ** 40},
+                      {'feature': 'Jitter (ms)', 'start': 0, 'stop': 1, 'steps': 2 ** 40}]):
+            response = client.post('/predict/sweep', json={'base': WARMUP_SAMPLE, 'sweep': axes})
+            assert response.status_code == 400
+        assert calls == []
+
+
+class TestBestConfig:
+    """Tests pour la recherche de la meilleure combinaison catégorique"""
+
+    def test_ranking_matches_individual_predictions(self, client, monkeypatch):
+        """Tester le classement complet évalué en un appel, identique aux prédictions unitaires"""
+        service = get_prediction_service()
+        service.best_config_cache = ResultCache()
+        calls = []
+        original = service._infer
+        monkeypatch.setattr(service, '_infer',
+                            lambda X, raw: calls.append(len(X)) or original(X, raw))
+        base = {k: v for k, v in WARMUP_SAMPLE.items() if k not in ('Opérateur', 'Type réseau')}
+        response = client.post('/predict/best-config', json={'base': base, 'top_k': 100})
+        assert response.status_code == 200
+        result = json.loads(response.data)['best_config']
+        assert calls == [15]
+        assert result['evaluated'] == 15 and len(result['top']) == 15
+        assert result['fixed'] == {'Quartier': 'Centre'}
+        assert not result['cached']
+        scores = [entry['probability'] for entry in result['top']]
+        assert scores == sorted(scores, reverse=True)
+
+        monkeypatch.undo()
+        for entry in result['top']:
+            record = dict(base, **result['metrics'],
+                          **{'Opérateur': entry['Opérateur'], 'Type réseau': entry['Type réseau']})
+            expected = service.predict_batch([record])[0]
+            assert entry['probability'] == pytest.approx(expected['probabilities']['Bonne'], abs=1e-6)
+            assert entry['prediction'] == expected['prediction']
+            assert entry['predicted_class'] == expected['predicted_class']
+
+    def test_cached_per_bucket(self, client, monkeypatch):
+        """Tester le cache: métriques voisines servies sans appel au modèle"""
+        service = get_prediction_service()
+        service.best_config_cache = ResultCache()
+        body = {'base': WARMUP_SAMPLE, 'candidates': {'Type réseau': ['5G', '4G']},
+                'target': 'Mauvaise', 'top_k': 2}
+        first = json.loads(client.post('/predict/best-config', json=body).data)['best_config']
+        calls = []
+        monkeypatch.setattr(service, '_infer', lambda X, raw: calls.append(len(X)))
+        nearby = dict(body, base=dict(WARMUP_SAMPLE, **{'Latence (ms)': 10.0001}))
+        second = json.loads(client.post('/predict/best-config', json=nearby).data)['best_config']
+        assert calls == []
+        assert second['cached'] and second['top'] == first['top']
+        assert first['evaluated'] == 6 and len(first['top']) == 2
+        assert {entry['Type réseau'] for entry in first['top']} <= {'5G', '4G'}
+
+    def test_invalid_requests_rejected(self, client):
+        """Tester les variables, valeurs et classes invalides"""
+        invalid = [
+            {'vary': ['Latence (ms)']},
+            {'vary': ['Opérateur', 'Opérateur']},
+            {'candidates': {'Opérateur': ['Inconnu']}},
+            {'candidates': {'Quartier': ['Centre']}},
+            {'target': 'Excellente'},
+            {'top_k': 0},
+            {'candidates': ['Orange']},
+            {'candidates': 'Orange'},
+            {'vary': 'Opérateur'}
+        ]
+        for extra in invalid:
+            response = client.post('/predict/best-config', json=dict(base=WARMUP_SAMPLE, **extra))
+            assert response.status_code == 400
+        assert client.post('/predict/best-config', json={}).status_code == 400
+
+    def test_non_finite_metrics_rejected(self, client):
+        """Tester une métrique infinie (1e999 en JSON): 400 et non 500"""
+        body = '{"base": {"Opérateur": "Orange", "Quartier": "Centre", "Type réseau": "5G", ' \
+               '"Download (Mbps)": 1e999, "Upload (Mbps)": 50, "Latence (ms)": 10, ' \
+               '"Jitter (ms)": 2, "Loss (%)": 0.1}}'
+        response = client.post('/predict/best-config', data=body.encode('utf-8'),
+                               content_type='application/json')
+        assert response.status_code == 400
+        assert 'finies' in json.loads(response.data)['message']
+
+
+class TestScalerFolding:
+    """Tests pour la normalisation repliée dans le modèle (backend 'folded')"""
+
+    def test_forest_exact_at_thresholds(self):
+        """Tester des probabilités identiques au bit près, entrées sur et autour des seuils"""
+        from app.folding import affine_scaling, fold_model
+        service = get_prediction_service()
+        folded = fold_model(service.model, service.scaler, 3)
+        scale, offset = affine_scaling(service.scaler, 3)
+        _, base = service.preprocess_batch([WARMUP_SAMPLE], return_raw=True)
+        rows = []
+        for estimator in folded.estimators_[:20]:
+            tree = estimator.tree_
+            for node in np.flatnonzero(tree.feature >= 3):
+                threshold = np.float32(tree.threshold[node])
+                for value in (np.nextafter(threshold, np.float32(-np.inf)), threshold,
+                              np.nextafter(threshold, np.float32(np.inf))):
+                    row = base[0].copy()
+                    row[tree.feature[node]] = value
+                    rows.append(row)
+        raw = np.array(rows)
+        expected = service.model.predict_proba((raw * scale + offset).astype('float32'))
+        np.testing.assert_array_equal(folded.predict_proba(raw), expected)
+        assert folded.estimators_[0].tree_.threshold is not service.model.estimators_[0].tree_.threshold
+
+    def test_backend_exact_for_float64_inputs(self):
+        """Tester le backend sur des float64 entre deux float32 autour des seuils"""
+        from app.folding import FoldedBackend
+        service = get_prediction_service()
+        backend = FoldedBackend(service.model, service.scaler, 3)
+        _, base = service.preprocess_batch([WARMUP_SAMPLE], return_raw=True)
+        rows = []
+        for estimator in backend.model.estimators_[:20]:
+            tree = estimator.tree_
+            for node in np.flatnonzero(tree.feature >= 3):
+                low = np.float64(tree.threshold[node])
+                high = np.float64(np.nextafter(np.float32(low), np.float32(np.inf)))
+                for value in (np.nextafter(low, np.inf), (low + high) / 2,
+                              np.nextafter(high, -np.inf)):
+                    row = base[0].copy()
+                    row[tree.feature[node]] = value
+                    rows.append(row)
+        raw = np.array(rows)
+        X = service._scale_raw(raw)
+        assert backend.ambiguous_rows(raw).all()
+        assert not backend.ambiguous_rows(raw.astype('float32').astype('float64')).any()
+        np.testing.assert_array_equal(backend.infer(X, raw), service.model.predict_proba(X))
+
+    def test_scale_raw_matches_transform(self):
+        """Tester la normalisation sans scaler.transform, identique au bit près"""
+        service = get_prediction_service()
+        _, raw = service.preprocess_batch([WARMUP_SAMPLE, dict(WARMUP_SAMPLE, **{'Loss (%)': 250})],
+                                          return_raw=True)
+        expected = np.hstack([raw[:, :3], service.scaler.transform(raw[:, 3:])]).astype('float32')
+        np.testing.assert_array_equal(service._scale_raw(raw), expected)
+
+    def test_ann_folded(self):
+        """Tester le repli dans la première couche d'un ANN"""
+        from app.folding import FoldedBackend
+        service = get_prediction_service()
+        model = TestANNExport._random_ann()
+        X, raw = service.preprocess_batch([WARMUP_SAMPLE] * 2, return_raw=True)
+        backend = FoldedBackend(model, service.scaler)
+        np.testing.assert_allclose(backend.infer(X, raw), model.predict_proba(X), atol=1e-5)
+
+    def test_service_serves_raw_inputs(self, client, monkeypatch):
+        """Tester le backend 'folded' du service: prédictions exactes sans appel au scaler"""
+        from app import services
+        service = get_prediction_service()
+        X = service.preprocess_batch([WARMUP_SAMPLE])
+        expected = service.model.predict_proba(X)[0]
+        monkeypatch.setitem(services._settings, 'PREDICTION_BACKEND', 'folded')
+        service._setup_backend()
+
+        def forbidden(*args, **kwargs):
+            raise AssertionError("scaler.transform appelé")
+
+        try:
+            assert service.backend.name == 'folded' and service.backend.raw_inputs
+            monkeypatch.setattr(service.scaler, 'transform', forbidden)
+            result = json.loads(client.post('/predict', json=WARMUP_SAMPLE).data)['result']
+            assert [result['probabilities'][label] for label in ('Bonne', 'Moyenne', 'Mauvaise')] \
+                == expected.tolist()
+        finally:
+            monkeypatch.undo()
+            service._setup_backend()
+
+
 class TestNotFoundEndpoint:
     """Tests pour les erreurs 404"""
     
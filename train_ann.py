@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+"""
+Entraînement du réseau de neurones (ANN) en ligne de commande
+
+Reprend l'architecture du notebook (Dense 128 relu, Dense 32 relu, Dense
+softmax) avec:
+- un pipeline tf.data: cache, mélange à chaque époque, lots, prefetch;
+- le contrôle des threads TensorFlow (intra-op / inter-op);
+- l'arrêt anticipé sur la perte de validation et la sauvegarde des meilleurs
+  poids à chaque amélioration;
+- l'export des meilleurs poids en .npz, chargeable sans TensorFlow
+  (app/ann.py), avec le même encodage d'entrée que l'API;
+- le débit (échantillons/s) de chaque époque.
+
+Utilisation:
+    python train_ann.py dataset_tp_ml.xlsx --output model/ann.npz --intra-op-threads 4
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import warnings
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+warnings.filterwarnings('ignore')
+
+import joblib
+
+from app.ann import ANNModel
+from app.dataset import CATEGORICAL_COLUMNS, NUMERIC_COLUMNS, load_dataset
+from app.retraining import encode_frame
+
+HIDDEN_LAYERS = (128, 32)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('data', help="Fichier de mesures étiquetées (Excel ou CSV)")
+    parser.add_argument('--scaler', default=os.path.join(BASE_DIR, 'model', 'scaler.pkl'))
+    parser.add_argument('--output', default=os.path.join(BASE_DIR, 'model', 'ann.npz'))
+    parser.add_argument('--checkpoint-dir', default=os.path.join(BASE_DIR, 'model', 'ann_checkpoints'))
+    parser.add_argument('--epochs', type=int, default=45)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--learning-rate', type=float, default=1e-3)
+    parser.add_argument('--validation-split', type=float, default=0.2)
+    parser.add_argument('--patience', type=int, default=5,
+                        help="Époques sans amélioration de val_loss avant arrêt")
+    parser.add_argument('--shuffle-buffer', type=int, default=10000)
+    parser.add_argument('--intra-op-threads', type=int, default=0,
+                        help="Threads par opération (0: choix de TensorFlow)")
+    parser.add_argument('--inter-op-threads', type=int, default=0,
+                        help="Opérations indépendantes en parallèle (0: choix de TensorFlow)")
+    parser.add_argument('--seed', type=int, default=42)
+    return parser.parse_args()
+
+
+def split(X, y, validation_split, seed):
+    """Découpage aléatoire entraînement / validation"""
+    order = np.random.default_rng(seed).permutation(len(y))
+    n_val = int(len(y) * validation_split)
+    return X[order[n_val:]], y[order[n_val:]], X[order[:n_val]], y[order[:n_val]]
+
+
+def make_datasets(tf, X_train, y_train, X_val, y_val, batch_size, shuffle_buffer, seed):
+    """Pipelines tf.data: cache avant le mélange pour ne relire qu'une fois"""
+    autotune = tf.data.AUTOTUNE
+    train = (tf.data.Dataset.from_tensor_slices((X_train, y_train))
+             .cache()
+             .shuffle(min(shuffle_buffer, len(y_train)), seed=seed,
+                      reshuffle_each_iteration=True)
+             .batch(batch_size)
+             .prefetch(autotune))
+    validation = (tf.data.Dataset.from_tensor_slices((X_val, y_val))
+                  .batch(batch_size * 8)
+                  .cache()
+                  .prefetch(autotune))
+    return train, validation
+
+
+def build_model(keras, n_features, n_classes, learning_rate):
+    model = keras.Sequential(
+        [keras.Input(shape=(n_features,))]
+        + [keras.layers.Dense(units, activation='relu') for units in HIDDEN_LAYERS]
+        + [keras.layers.Dense(n_classes, activation='softmax')]
+    )
+    model.compile(
+        optimizer=keras.optimizers.Adam(learning_rate=learning_rate),
+        loss='sparse_categorical_crossentropy',
+        metrics=['accuracy']
+    )
+    return model
+
+
+def export_weights(model, classes, path, extra):
+    """Exporter les couches Dense en .npz (inférence NumPy, voir app/ann.py)"""
+    dense = [layer for layer in model.layers if layer.get_weights()]
+    kernels = [layer.get_weights()[0] for layer in dense]
+    biases = [layer.get_weights()[1] for layer in dense]
+    activations = [layer.get_config()['activation'] for layer in dense]
+    ANNModel(kernels, biases, activations, classes, extra).save(path)
+
+
+def main():
+    args = parse_args()
+
+    import tensorflow as tf
+    from tensorflow import keras
+
+    # Avant toute opération TensorFlow
+    tf.config.threading.set_intra_op_parallelism_threads(args.intra_op_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(args.inter_op_threads)
+    keras.utils.set_random_seed(args.seed)
+
+    scaler = joblib.load(args.scaler)
+    X, y = encode_frame(load_dataset(args.data, mmap=False), scaler)
+    classes = sorted(np.unique(y).tolist())
+    X_train, y_train, X_val, y_val = split(X, y, args.validation_split, args.seed)
+    train, validation = make_datasets(tf, X_train, y_train, X_val, y_val,
+                                      args.batch_size, args.shuffle_buffer, args.seed)
+    print(f"{len(y_train)} lignes d'entraînement, {len(y_val)} de validation; "
+          f"threads intra-op={tf.config.threading.get_intra_op_parallelism_threads()} "
+          f"inter-op={tf.config.threading.get_inter_op_parallelism_threads()}")
+
+    class Throughput(keras.callbacks.Callback):
+        """Débit de chaque époque (échantillons d'entraînement par seconde)"""
+
+        def __init__(self):
+            super().__init__()
+            self.rates = []
+
+        def on_epoch_begin(self, epoch, logs=None):
+            self.start = time.perf_counter()
+
+        def on_epoch_end(self, epoch, logs=None):
+            rate = len(y_train) / (time.perf_counter() - self.start)
+            self.rates.append(rate)
+            print(f"  époque {epoch + 1}: {rate:,.0f} échantillons/s")
+
+    os.makedirs(args.checkpoint_dir, exist_ok=True)
+    throughput = Throughput()
+    model = build_model(keras, X.shape[1], len(classes), args.learning_rate)
+    history = model.fit(
+        train,
+        validation_data=validation,
+        epochs=args.epochs,
+        verbose=2,
+        callbacks=[
+            keras.callbacks.EarlyStopping(monitor='val_loss', patience=args.patience,
+                                          restore_best_weights=True),
+            keras.callbacks.ModelCheckpoint(
+                os.path.join(args.checkpoint_dir, 'best.weights.h5'),
+                monitor='val_loss', save_best_only=True, save_weights_only=True
+            ),
+            throughput
+        ]
+    )
+
+    val_loss = history.history['val_loss']
+    best_epoch = int(np.argmin(val_loss))
+    # La première époque inclut le remplissage du cache et le traçage du graphe
+    steady = throughput.rates[1:] or throughput.rates
+    summary = {
+        'epochs_run': len(val_loss),
+        'best_epoch': best_epoch + 1,
+        'best_val_loss': float(val_loss[best_epoch]),
+        'best_val_accuracy': float(history.history['val_accuracy'][best_epoch]),
+        'samples_per_second': float(np.mean(steady)),
+        'batch_size': args.batch_size,
+        'intra_op_threads': args.intra_op_threads,
+        'inter_op_threads': args.inter_op_threads
+    }
+    export_weights(model, classes, args.output, {
+        'columns': CATEGORICAL_COLUMNS + NUMERIC_COLUMNS,
+        'training': summary
+    })
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    print(f"Poids exportés: {args.output}")
+
+
+if __name__ == '__main__':
+    main()